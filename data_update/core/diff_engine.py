@@ -1,12 +1,18 @@
 import os
 import json
+import sys
 import hashlib
-import tiktoken
 import shutil
 import glob
 from datetime import datetime
 from typing import List, Dict, Optional, Union
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.tool.token_counter import count_tokens as _count_tokens, exceeds_tokens
+
 # ==========================================
 # ⚙️ 設定區
 # ==========================================
@@ -19,11 +25,8 @@ TOKEN_LIMIT = 1800
 # 歷史備份保留份數
 MAX_HISTORY_COUNT = 4
 
-# 初始化 Token 計算器
-try:
-    enc = tiktoken.encoding_for_model("gpt-4o")
-except:
-    enc = tiktoken.get_encoding("cl100k_base")
+# Token 計算器 (與主程式共用 encoding 快取)
+TOKEN_MODEL = "gpt-4o"
 
 # ==========================================
 # 🛠️ 工具函式
@@ -31,7 +34,7 @@ except:
 
 def count_tokens(text: str) -> int:
     """計算字串的 Token 數量"""
-    return len(enc.encode(text))
+    return _count_tokens(text, TOKEN_MODEL)
 
 def calculate_chunk_fingerprint(chunk: Dict) -> str:
     """
@@ -105,7 +108,8 @@ def process_diff_and_save(source_name: str, new_chunks: List[Dict]) -> Optional[
     new_chunk_map = {}
     for chunk in new_chunks:
         # Token 檢查 (僅警告)
-        if count_tokens(chunk.get("content", "")) > TOKEN_LIMIT:
+        # 只是警告，遠低於上限的 chunk 以字元數估算即可
+        if exceeds_tokens(chunk.get("content", ""), TOKEN_LIMIT, TOKEN_MODEL):
             print(f"\033[91m⚠️ [警告] Chunk token 過長: {chunk.get('title', 'Unknown')}\033[0m")
             
         fp = calculate_chunk_fingerprint(chunk)
@@ -1,6 +1,6 @@
-import tiktoken
 from typing import List, Optional
 from config.config import TokenConfig
+from src.tool.token_counter import count_tokens, get_encoding
 
 
 class UnifiedTokenSplitter:
@@ -29,15 +29,9 @@ class UnifiedTokenSplitter:
         self.tolerance = tolerance
         self.debug = debug
 
-        # 改進異常處理：只捕獲特定異常
-        try:
-            self.enc = tiktoken.encoding_for_model(model_name)
-        except (KeyError, ValueError) as e:
-            if self.debug:
-                print(
-                    f"⚠️ 無法載入模型 {model_name} 的 tokenizer，使用預設 cl100k_base: {e}"
-                )
-            self.enc = tiktoken.get_encoding("cl100k_base")
+        # 共用行程內快取的 encoding (不支援的模型會退回 cl100k_base)
+        self.model_name = model_name
+        self.enc = get_encoding(model_name)
 
         # 標點優先級：換行 > 句末標點 > 分號/冒號 > 逗號/頓號
         self.separators = [
@@ -59,9 +53,7 @@ class UnifiedTokenSplitter:
         ]
 
     def count_tokens(self, text: str) -> int:
-        if not text:
-            return 0
-        return len(self.enc.encode(text))
+        return count_tokens(text, self.model_name)
 
     def split_text(self, text: str) -> List[str]:
         """
@@ -0,0 +1,116 @@
+"""
+擬合 embedding 的 PCA 投影並輸出 recall@k 報告
+
+流程:
+1. 讀取 data.json，對 cleaned_content 產生完整維度 (1024) 的 embedding (可快取為 .npy)
+2. 以文件標題作為查詢集合，比較 256 / 384 / 512 維投影與完整維度的 exact top-k 重疊率
+3. 將指定維度的投影矩陣存到 database/projections/{index}_pca{dims}.npz
+
+完成後設定 EMBEDDING_PROJECTION_DIMS=<dims> 並重新寫入索引 (vectorPreprocessing.py 選項 1 + 2)。
+
+用法:
+    python data_update/fit_projection.py --dims 384
+    python data_update/fit_projection.py --dims 256 --cache data_update/corpus_embeddings.npy
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import DATA_JSON, MEILISEARCH_INDEX
+from src.schema.schemas import AnnouncementDoc
+from src.database.vector_utils import get_embeddings_batch
+from src.database.vector_projection import (
+    PCAProjection,
+    SUPPORTED_PROJECTION_DIMS,
+    projection_path,
+    recall_at_k,
+)
+from src.tool.ANSI import print_red, print_green, print_yellow
+
+
+def load_docs(data_json: str, max_docs: int):
+    import json
+
+    with open(data_json, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    docs = []
+    for item in data:
+        try:
+            docs.append(AnnouncementDoc(**item))
+        except Exception:
+            continue
+    if max_docs and len(docs) > max_docs:
+        rng = np.random.default_rng(0)
+        picked = rng.choice(len(docs), size=max_docs, replace=False)
+        docs = [docs[i] for i in sorted(picked)]
+    return docs
+
+
+def embed_texts(texts):
+    results = asyncio.run(get_embeddings_batch(texts))
+    keep = [i for i, r in enumerate(results) if r and r.get("status") == "success"]
+    if len(keep) < len(texts):
+        print_yellow(f"  ⚠ {len(texts) - len(keep)} texts failed to embed and were skipped")
+    return np.asarray([results[i]["result"] for i in keep], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit PCA projection for stored embeddings")
+    parser.add_argument("--dims", type=int, default=384, choices=SUPPORTED_PROJECTION_DIMS)
+    parser.add_argument("--data", default=DATA_JSON)
+    parser.add_argument("--index", default=MEILISEARCH_INDEX)
+    parser.add_argument("--cache", default=None, help="corpus embedding cache (.npy)")
+    parser.add_argument("--max-docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    docs = load_docs(args.data, args.max_docs)
+    if not docs:
+        print_red(f"No documents loaded from {args.data}")
+        return
+    print(f"Loaded {len(docs)} documents from {args.data}")
+
+    if args.cache and os.path.exists(args.cache):
+        corpus = np.load(args.cache)
+        print(f"Loaded cached corpus embeddings {corpus.shape} from {args.cache}")
+    else:
+        start = time.perf_counter()
+        corpus = embed_texts([doc.cleaned_content for doc in docs])
+        print(f"Embedded corpus {corpus.shape} in {time.perf_counter() - start:.1f}s")
+        if args.cache:
+            np.save(args.cache, corpus)
+
+    titles = list(dict.fromkeys(doc.title for doc in docs if doc.title))[: args.queries]
+    queries = embed_texts(titles)
+    print(f"Embedded {len(queries)} title queries")
+
+    print(f"\n{'dims':>6} | {'explained var':>13} | {'recall@' + str(args.k):>9} | {'bytes/vec':>9}")
+    print("-" * 48)
+    full_bytes = corpus.shape[1] * 4
+    print(f"{corpus.shape[1]:>6} | {1.0:>13.3f} | {1.0:>9.3f} | {full_bytes:>9}")
+
+    chosen = None
+    for dims in SUPPORTED_PROJECTION_DIMS:
+        projection = PCAProjection.fit(corpus, dims)
+        recall = recall_at_k(corpus, queries, projection, k=args.k)
+        explained = float(projection.explained_variance_ratio.sum())
+        print(f"{dims:>6} | {explained:>13.3f} | {recall:>9.3f} | {dims * 4:>9}")
+        if dims == args.dims:
+            chosen = projection
+
+    path = projection_path(args.index, args.dims)
+    chosen.save(path)
+    print_green(f"\n✓ Saved projection {chosen.version} to {path}")
+    print(f"  Set EMBEDDING_PROJECTION_DIMS={args.dims} and re-ingest index '{args.index}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import json
 import logging
+import os
 import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List
 from datetime import datetime
 import markdown
 from bs4 import BeautifulSoup
-import tiktoken
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.tool.token_counter import count_tokens
 
 # Configure logging
 logging.basicConfig(
@@ -24,10 +31,6 @@ class DataParser:
         self.files_to_process = files_to_process
         self.output_file = output_file
         self.base_dir = Path(__file__).parent
-        try:
-            self.enc = tiktoken.encoding_for_model("gpt-4o-mini")
-        except Exception:
-            self.enc = tiktoken.get_encoding("cl100k_base")
 
     def clean_content(self, content: str) -> str:
         if not content:
@@ -145,7 +148,7 @@ class DataParser:
         item["year"] = year
         item["content"] = raw_content
         item["cleaned_content"] = json.dumps(cleaned_content, ensure_ascii=False)
-        item["token"] = len(self.enc.encode(raw_content))
+        item["token"] = count_tokens(raw_content)
         item["update_time"] = datetime.now().strftime("%Y-%m-%d-%H-%M")
 
         return item
@@ -1,8 +1,10 @@
 import os
 import sys
 import json
+import time
 import asyncio
 from typing import List, Optional
+import numpy as np
 from dotenv import load_dotenv
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,13 +18,18 @@ from src.config import (
     MEILISEARCH_INDEX,
     MEILISEARCH_TIMEOUT,
 )
+from src.meilisearch_config import EMBEDDING_SOURCE_DIMS
 from src.schema.schemas import AnnouncementDoc
 from src.database.db_adapter_meili import (
     MeiliAdapter,
     transform_doc_for_meilisearch,
     transform_doc_metadata_only,
 )
-from src.database.vector_utils import get_embedding, get_embeddings_batch
+from src.database.vector_utils import (
+    get_embedding,
+    get_embeddings_batch,
+    EMBEDDING_DOC_TIMEOUT,
+)
 from src.database.vector_config import RTX_4050_6G, CPU_16C_64G, LOW_END_2C4T
 from src.tool.ANSI import print_red, print_green, print_yellow
 
@@ -44,6 +51,8 @@ class VectorPreProcessor:
         force_gpu: bool = True,
         timeout: int = MEILISEARCH_TIMEOUT,
         final_retry_count: int = 3,
+        pipeline_queue_size: int = 2,
+        embedding_dims: int = EMBEDDING_SOURCE_DIMS,
     ):
         self.host = host
         self.api_key = api_key
@@ -58,6 +67,8 @@ class VectorPreProcessor:
         self.max_concurrency = max_concurrency
         self.force_gpu = force_gpu
         self.final_retry_count = final_retry_count
+        self.pipeline_queue_size = pipeline_queue_size
+        self.embedding_dims = embedding_dims
 
         self.adapter = MeiliAdapter(
             host=self.host,
@@ -149,7 +160,9 @@ class VectorPreProcessor:
                     str.maketrans("", "", chars_to_remove)
                 )
 
-                res = get_embedding(retry_content)
+                res = get_embedding(
+                    retry_content, timeout=EMBEDDING_DOC_TIMEOUT, hedge=False
+                )
                 if res.get("status") == "success":
                     vector = res.get("result")
                     meili_doc = transform_doc_for_meilisearch(info["doc"], vector)
@@ -168,57 +181,145 @@ class VectorPreProcessor:
 
         return failed_docs_info
 
-    async def _process_and_sync_embeddings(self, docs: List[AnnouncementDoc]):
-        """Internal Pipeline: Batches docs, gets embeddings, and syncs to Meilisearch."""
-        total = len(docs)
-        failed_docs_info = []
-
+    def _log_stage(self, stats: dict, stage: str, batch_no: int, count: int, elapsed: float, queues: dict):
+        """Record per-stage throughput and print the current queue depths."""
+        stats[stage]["docs"] += count
+        stats[stage]["busy"] += elapsed
+        rate = count / elapsed if elapsed > 0 else float("inf")
+        depth = " ".join(f"{name}={q.qsize()}" for name, q in queues.items())
         print(
-            f"Generating embeddings and transforming documents (Batch size: {self.vector_batch_size})..."
+            f"  [{stage:<9}] batch {batch_no}: {count} docs in {elapsed:.2f}s ({rate:.1f} docs/s) | queue depth {depth}"
         )
 
-        for i in range(0, total, self.vector_batch_size):
-            batch_docs = docs[i : i + self.vector_batch_size]
-            texts = [doc.cleaned_content for doc in batch_docs]
-
+    def _display_pipeline_report(self, stats: dict, wall_time: float, total: int):
+        print("\n  Pipeline stage summary:")
+        print(f"  {'STAGE':<10} | {'DOCS':>6} | {'BUSY (s)':>9} | {'DOCS/S':>8} | {'UTIL':>5}")
+        for stage, s in stats.items():
+            rate = s["docs"] / s["busy"] if s["busy"] > 0 else 0.0
+            util = s["busy"] / wall_time if wall_time > 0 else 0.0
             print(
-                f"  Batch {i//self.vector_batch_size + 1}: Generating embeddings for {len(texts)} docs..."
+                f"  {stage:<10} | {s['docs']:>6} | {s['busy']:>9.2f} | {rate:>8.1f} | {util:>5.0%}"
             )
+        overall = total / wall_time if wall_time > 0 else 0.0
+        print(f"  Wall time: {wall_time:.2f}s ({overall:.1f} docs/s overall)")
 
-            embedding_results = await get_embeddings_batch(
-                texts,
-                sub_batch_size=self.sub_batch_size,
-                max_concurrency=self.max_concurrency,
-                force_gpu=self.force_gpu,
-            )
+    async def _process_and_sync_embeddings(self, docs: List[AnnouncementDoc]):
+        """
+        Internal Pipeline: load/validate -> embed -> transform -> upload.
+        Stages are connected by bounded queues so batch N+1 is embedded while batch N uploads.
+        """
+        total = len(docs)
+        failed_docs_info = []
+        stage_names = ["load", "embed", "transform", "upload"]
+        stats = {name: {"docs": 0, "busy": 0.0} for name in stage_names}
+
+        embed_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        transform_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        upload_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        queues = {
+            "embed": embed_queue,
+            "transform": transform_queue,
+            "upload": upload_queue,
+        }
 
-            meili_docs = []
-            for j, res in enumerate(embedding_results):
-                doc = batch_docs[j]
-                if res.get("status") == "success":
-                    vector = res.get("result")
-                    meili_docs.append(transform_doc_for_meilisearch(doc, vector))
-                else:
-                    failed_docs_info.append(
-                        {
-                            "index": i + j,
-                            "doc": doc,
-                            "error": res.get("error", "Unknown error"),
-                        }
-                    )
-                    print_yellow(
-                        f"  ⚠ Failed embedding for index {i+j}, queued for retry."
-                    )
+        print(
+            f"Generating embeddings and transforming documents (Batch size: {self.vector_batch_size}, queue size: {self.pipeline_queue_size})..."
+        )
 
-            if meili_docs:
-                print(
-                    f"  Batch {i//self.vector_batch_size + 1}: Syncing {len(meili_docs)} docs to Meilisearch..."
+        async def load_stage():
+            for i in range(0, total, self.vector_batch_size):
+                start = time.perf_counter()
+                batch_no = i // self.vector_batch_size + 1
+                batch_docs = []
+                for j, doc in enumerate(docs[i : i + self.vector_batch_size]):
+                    if doc.cleaned_content and doc.cleaned_content.strip():
+                        batch_docs.append((i + j, doc))
+                    else:
+                        failed_docs_info.append(
+                            {"index": i + j, "doc": doc, "error": "Empty cleaned_content"}
+                        )
+                self._log_stage(
+                    stats, "load", batch_no, len(batch_docs), time.perf_counter() - start, queues
                 )
-                self.adapter.upsert_documents(meili_docs)
+                if batch_docs:
+                    await embed_queue.put((batch_no, batch_docs))
+            await embed_queue.put(None)
+
+        async def embed_stage():
+            while (item := await embed_queue.get()) is not None:
+                batch_no, batch_docs = item
+                start = time.perf_counter()
+                # 每批預先配置 float32 矩陣，向量直接寫入，後續投影與序列化都使用 row view
+                vectors = np.empty((len(batch_docs), self.embedding_dims), dtype=np.float32)
+                embedding_results = await get_embeddings_batch(
+                    [doc.cleaned_content for _, doc in batch_docs],
+                    sub_batch_size=self.sub_batch_size,
+                    max_concurrency=self.max_concurrency,
+                    force_gpu=self.force_gpu,
+                    out=vectors,
+                )
+                self._log_stage(
+                    stats, "embed", batch_no, len(batch_docs), time.perf_counter() - start, queues
+                )
+                await transform_queue.put((batch_no, batch_docs, embedding_results))
+            await transform_queue.put(None)
 
-            print(f"  Processed {min(i + self.vector_batch_size, total)}/{total}")
+        async def transform_stage():
+            while (item := await transform_queue.get()) is not None:
+                batch_no, batch_docs, embedding_results = item
+                start = time.perf_counter()
+                meili_docs = []
+                for (index, doc), res in zip(batch_docs, embedding_results):
+                    if res.get("status") == "success":
+                        vector = res.get("result")
+                        meili_docs.append(transform_doc_for_meilisearch(doc, vector))
+                    else:
+                        failed_docs_info.append(
+                            {
+                                "index": index,
+                                "doc": doc,
+                                "error": res.get("error", "Unknown error"),
+                            }
+                        )
+                        print_yellow(
+                            f"  ⚠ Failed embedding for index {index}, queued for retry."
+                        )
+                self._log_stage(
+                    stats, "transform", batch_no, len(meili_docs), time.perf_counter() - start, queues
+                )
+                if meili_docs:
+                    await upload_queue.put((batch_no, meili_docs))
+            await upload_queue.put(None)
+
+        async def upload_stage():
+            uploaded = 0
+            while (item := await upload_queue.get()) is not None:
+                batch_no, meili_docs = item
+                start = time.perf_counter()
+                # Meilisearch client 為同步 I/O，放到 worker thread 以免阻塞 embedding
+                await asyncio.to_thread(self.adapter.upsert_documents, meili_docs)
+                uploaded += len(meili_docs)
+                self._log_stage(
+                    stats, "upload", batch_no, len(meili_docs), time.perf_counter() - start, queues
+                )
+                print(f"  Uploaded {uploaded}/{total}")
+
+        wall_start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(stage())
+            for stage in (load_stage, embed_stage, transform_stage, upload_stage)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        self._display_pipeline_report(stats, time.perf_counter() - wall_start, total)
 
         # Final retry stage
+        failed_docs_info.sort(key=lambda info: info["index"])
         failed_docs_info = await self._handle_retry_logic(failed_docs_info)
 
         # Display final errors if any
@@ -1,6 +1,8 @@
 import re
 import json
-from typing import Dict, Any, List
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from src.agents.tool import SearchTool
 from src.llm.client import LLMClient
 from src.tool.ANSI import print_red
@@ -9,7 +11,46 @@ from src.llm.prompts.check_retry_search import (
     CHECK_RETRY_SEARCH_USER_TEMPLATE,
 )
 from src.schema.schemas import RetrySearchDecision
-from src.config import SEARCH_MAX_RETRIES
+from src.services.merged_results import MergedResults
+from src.config import (
+    SEARCH_MAX_RETRIES,
+    STREAM_SUMMARY,
+    COMBINED_RELEVANCE_SUMMARY,
+    SPECULATIVE_RETRY_SEARCH,
+    DEADLINE_RETRY_MIN,
+    DEADLINE_SUMMARY_MIN,
+)
+from src.tool.deadline import Deadline
+
+# 時間預算不足時套用的降級，以 degraded 階段與 complete 的 degradations 回報
+_DEGRADATION_MESSAGES = {
+    "intent_skipped": "剩餘時間不足，略過 AI 查詢解析，直接使用原始查詢",
+    "retry_skipped": "剩餘時間不足，略過品質評估與重搜索，直接總結現有結果",
+    "summary_skipped": "剩餘時間不足，略過總結，僅回傳搜尋結果",
+    "summary_timeout": "總結逾時，僅回傳搜尋結果",
+}
+
+# 推測性重搜索：與相關性判斷同時執行，判斷為相關時直接捨棄結果
+_speculative_executor = ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="speculative-retry"
+)
+_speculative_stats = {"launched": 0, "used": 0, "discarded": 0, "errors": 0}
+_speculative_lock = threading.Lock()
+
+
+def _count_speculative(key: str) -> None:
+    with _speculative_lock:
+        _speculative_stats[key] += 1
+
+
+def get_speculative_retry_stats() -> Dict[str, Any]:
+    with _speculative_lock:
+        stats = dict(_speculative_stats)
+    stats["enabled"] = SPECULATIVE_RETRY_SEARCH
+    stats["hit_rate"] = (
+        round(stats["used"] / stats["launched"], 3) if stats["launched"] else None
+    )
+    return stats
 
 
 class SrhSumAgent:
@@ -18,7 +59,9 @@ class SrhSumAgent:
         self.llm_client = LLMClient()
         self.max_retries = SEARCH_MAX_RETRIES
 
-    def _check_retry_search(self, query: str, results: List[Dict]) -> Dict[str, Any]:
+    def _check_retry_search(
+        self, query: str, results: List[Dict], deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
         if not results:
             return {
                 "relevant": False,
@@ -42,6 +85,7 @@ class SrhSumAgent:
             ],
             response_model=RetrySearchDecision,
             temperature=0.0,
+            timeout=deadline.cap(None) if deadline else None,
         )
 
         if llm_response.get("status") == "success":
@@ -59,9 +103,249 @@ class SrhSumAgent:
                 "decision": "評估失敗，採用現有內容",
             }
 
-    def _add_results(
+    def _summarize(self, query: str, final_results: List[Dict], deadline: Deadline):
+        """
+        產生摘要。串流模式下先逐段 yield summary_delta，
+        回傳值 (以 `yield from` 取得) 與 SearchTool.summarize 相同，最後仍由 complete 階段送出完整結果。
+        """
+        timeout = deadline.cap(None)
+        if not STREAM_SUMMARY:
+            return self.tool.summarize(query, final_results, timeout=timeout)
+
+        stream = self.tool.summarize_stream(query, final_results, timeout=timeout)
+        while True:
+            try:
+                event = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            yield {"status": "success", "stage": "summary_delta", **event}
+
+    def _judge_and_summarize(
+        self, query: str, final_results: List[Dict], deadline: Deadline
+    ):
+        """
+        相關性判斷與總結合併為一次呼叫。串流模式下判斷為相關時先 yield summarizing，再逐段 yield summary_delta；
+        回傳值 (以 `yield from` 取得) 與 SearchTool.judge_and_summarize 相同。
+        已送出 summary_delta 後串流才失敗時 yield summary_reset，前端清除不完整的總結再接收另外產生的總結。
+        """
+        timeout = deadline.cap(None)
+        if not STREAM_SUMMARY:
+            return self.tool.judge_and_summarize(query, final_results, timeout=timeout)
+
+        stream = self.tool.judge_and_summarize_stream(
+            query, final_results, timeout=timeout
+        )
+        streamed = False
+        while True:
+            try:
+                event = next(stream)
+            except StopIteration as stop:
+                if streamed and stop.value.get("summary_response") is None:
+                    yield {"status": "success", "stage": "summary_reset"}
+                return stop.value
+            if "relevant" in event:
+                if event["relevant"]:
+                    yield {
+                        "status": "success",
+                        "stage": "summarizing",
+                        "message": f"{event.get('decision') or '搜尋結果高度相關'}，正在為您生成公告總結...",
+                    }
+                continue
+            streamed = True
+            yield {"status": "success", "stage": "summary_delta", **event}
+
+    def _evaluate(
         self,
+        query: str,
         collected_results: Dict[str, Any],
+        limit: int,
+        deadline: Deadline,
+        degradations: List[str],
+    ):
+        """
+        評估目前結果是否足以回答問題，回傳 (relevance_result, final_results, summary_response)。
+        合併模式下總結與判斷同一次產生；summary_response 為 None 表示相關時仍需另外呼叫 _summarize。
+        剩餘時間已不足以重搜索時不做判斷，直接視為相關。
+        """
+        final_results = self._rank_results(collected_results, limit)
+        if not deadline.has(DEADLINE_RETRY_MIN):
+            yield self._degrade(degradations, "retry_skipped")
+            relevance_result = {
+                "relevant": True,
+                "search_direction": "",
+                "decision": "剩餘時間不足",
+            }
+            return relevance_result, final_results, None
+
+        if not COMBINED_RELEVANCE_SUMMARY:
+            relevance_result = self._check_retry_search(
+                query, list(collected_results.values()), deadline
+            )
+            return relevance_result, final_results, None
+
+        relevance_result = yield from self._judge_and_summarize(
+            query, final_results, deadline
+        )
+        return relevance_result, final_results, relevance_result.get("summary_response")
+
+    def _retry_search(
+        self,
+        query: str,
+        limit: int,
+        exclude_ids: List[str],
+        history: List[str],
+        direction: str,
+        search_args: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return self.tool.search(
+            query=query,
+            limit=limit,
+            exclude_ids=exclude_ids,
+            history=history,
+            direction=direction,
+            is_retry_search=True,
+            **search_args,
+        )
+
+    def _launch_speculative_retry(
+        self,
+        query: str,
+        limit: int,
+        exclude_ids: List[str],
+        history: List[str],
+        search_args: Dict[str, Any],
+    ) -> Optional[Future]:
+        """
+        在相關性判斷進行時預先送出第一次重搜索 (排除已看過的 id、放大 limit)。
+        此時尚未取得判斷給出的 search_direction，因此以查詢歷史擴大搜尋範圍。
+        """
+        if not SPECULATIVE_RETRY_SEARCH or self.max_retries < 1:
+            return None
+        if not search_args["deadline"].has(DEADLINE_RETRY_MIN):
+            return None
+        _count_speculative("launched")
+        return _speculative_executor.submit(
+            self._retry_search, query, limit, exclude_ids, history, "", search_args
+        )
+
+    def _discard_speculative(self, speculative: Optional[Future]) -> None:
+        if speculative is None:
+            return
+        # 已開始執行的搜尋無法中斷，只能忽略其結果
+        speculative.cancel()
+        _count_speculative("discarded")
+
+    def _speculative_result(self, speculative: Future) -> Optional[Dict[str, Any]]:
+        try:
+            search_response = speculative.result()
+        except Exception as e:
+            print_red(f"Speculative retry search failed: {e}")
+            _count_speculative("errors")
+            return None
+        _count_speculative("used")
+        return search_response
+
+    def _rank_results(self, collected_results: Dict[str, Any], limit: int) -> List[Dict]:
+        return sorted(
+            list(collected_results.values()),
+            key=lambda x: x.get("_rerank_score", x.get("_rankingScore", 0)),
+            reverse=True,
+        )[:limit]
+
+    def _degrade(self, degradations: List[str], name: str) -> Dict[str, Any]:
+        degradations.append(name)
+        print_red(f"Degraded: {name}")
+        return {
+            "status": "success",
+            "stage": "degraded",
+            "degradation": name,
+            "message": _DEGRADATION_MESSAGES[name],
+        }
+
+    def _report_degradations(
+        self, search_response: Dict[str, Any], degradations: List[str]
+    ):
+        """回報搜尋服務內部套用的降級 (例如略過意圖解析)"""
+        for name in search_response.get("degradations", []):
+            if name not in degradations:
+                yield self._degrade(degradations, name)
+
+    def _finish(
+        self,
+        query: str,
+        final_results: List[Dict],
+        final_intent: Dict[str, Any],
+        deadline: Deadline,
+        degradations: List[str],
+        summary_response: Optional[Dict[str, Any]] = None,
+        message: str = None,
+    ):
+        """
+        產生 (或沿用合併模式已產生的) 總結並送出 complete。
+        時間不足或總結逾時時只回傳搜尋結果。
+        """
+        if summary_response is None:
+            if not deadline.has(DEADLINE_SUMMARY_MIN):
+                yield self._degrade(degradations, "summary_skipped")
+                yield self._results_only_step(final_results, final_intent, degradations)
+                return
+            if message:
+                yield {"status": "success", "stage": "summarizing", "message": message}
+            summary_response = yield from self._summarize(query, final_results, deadline)
+
+        if summary_response.get("status") != "success" and deadline.expired():
+            yield self._degrade(degradations, "summary_timeout")
+            yield self._results_only_step(final_results, final_intent, degradations)
+            return
+        yield self._summary_step(
+            summary_response, final_results, final_intent, degradations
+        )
+
+    def _results_only_step(
+        self,
+        final_results: List[Dict],
+        final_intent: Dict[str, Any],
+        degradations: List[str],
+    ) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "stage": "complete",
+            "summary": None,
+            "link_mapping": {},
+            "results": final_results,
+            "intent": final_intent,
+            "degradations": list(degradations),
+        }
+
+    def _summary_step(
+        self,
+        summary_response: Dict[str, Any],
+        final_results: List[Dict],
+        final_intent: Dict[str, Any],
+        degradations: List[str],
+    ) -> Dict[str, Any]:
+        if summary_response.get("status") == "success":
+            return {
+                "status": "success",
+                "stage": "complete",
+                "summary": summary_response.get("summary"),
+                "link_mapping": summary_response.get("link_mapping"),
+                "summarized_count": summary_response.get("summarized_count", 0),
+                "total_tokens": summary_response.get("total_tokens", 0),
+                "discarded_tokens": summary_response.get("discarded_tokens", 0),
+                "results": final_results,
+                "intent": final_intent,
+                "degradations": list(degradations),
+            }
+        return {
+            "status": "failed",
+            "stage": "summarizing",
+            "error": summary_response.get("error"),
+        }
+
+    def _add_results(
+        self,
+        collected_results: MergedResults,
         all_seen_ids: set,
         new_results: List[Dict],
     ):
@@ -83,43 +367,17 @@ class SrhSumAgent:
             if not key:
                 continue
 
-            # 3. 執行合併邏輯
-            if key in collected_results:
-                existing = collected_results[key]
-
-                # 合併 all_ids
-                if "all_ids" not in existing:
-                    existing["all_ids"] = (
-                        [existing.get("id")] if existing.get("id") else []
-                    )
-                for rid in ids_to_record:
-                    if rid and rid not in existing["all_ids"]:
-                        existing["all_ids"].append(rid)
-
-                # 合併內容 (檢查內容是否重複)
-                new_content = r.get("content", "")
-                existing_content = existing.get("content", "")
-                if new_content and new_content not in existing_content:
-                    existing["content"] = (
-                        f"{existing_content}\n\n --- \n\n{new_content}"
-                    )
-                    
-                    # 合併 token 計數
-                    existing_token = existing.get("token", 0)
-                    new_token = r.get("token", 0)
-                    existing["token"] = existing_token + new_token
-
-                # 保留最高分
-                new_score = r.get("_rankingScore", 0)
-                if new_score > existing.get("_rankingScore", 0):
-                    existing["_rankingScore"] = new_score
-                    if "_rerank_score" in r:
-                        existing["_rerank_score"] = r["_rerank_score"]
-            else:
-                # 新結果：初始化
-                if "all_ids" not in r:
-                    r["all_ids"] = ids_to_record
-                collected_results[key] = r
+            # 3. 合併 all_ids 與內容 (以 chunk id / 內容去重，content 在取出時才組合)
+            merged, is_new = collected_results.add(key, r)
+            if is_new:
+                continue
+
+            # 保留最高分
+            new_score = r.get("_rankingScore", 0)
+            if new_score > merged.get("_rankingScore", 0):
+                merged["_rankingScore"] = new_score
+                if "_rerank_score" in r:
+                    merged["_rerank_score"] = r["_rerank_score"]
 
     def run(
         self,
@@ -132,11 +390,29 @@ class SrhSumAgent:
         end_date: str = None,
         website: List[str] = None,
         is_retry_search: bool = False,
+        deadline: Optional[Deadline] = None,
     ):
+        """
+        deadline 為整個請求的時間預算 (傳遞給每個階段)；剩餘時間低於門檻時依序
+        略過重搜索、略過總結，並以 degraded 階段回報。
+        """
 
         from src.config import MAX_SEARCH_LIMIT
 
-        collected_results = {}
+        deadline = deadline or Deadline()
+        degradations: List[str] = []
+        search_args = {
+            "deadline": deadline,
+            "semantic_ratio": semantic_ratio,
+            "enable_llm": enable_llm,
+            "manual_semantic_ratio": manual_semantic_ratio,
+            "start_date": start_date,
+            "end_date": end_date,
+            "website": website,
+        }
+        retry_limit = min(int(limit * 1.5), MAX_SEARCH_LIMIT)
+        speculative = None
+        collected_results = MergedResults()
         all_seen_ids = set()
         query_history = [query]
         all_sub_queries = []
@@ -158,6 +434,7 @@ class SrhSumAgent:
             end_date=end_date,
             website=website,
             is_retry_search=is_retry_search,
+            deadline=deadline,
         )
         if search_response.get("status") == "failed":
             yield {
@@ -168,6 +445,7 @@ class SrhSumAgent:
             }
             return
         initial_results = search_response.get("results", [])
+        yield from self._report_degradations(search_response, degradations)
 
         final_intent = search_response.get("intent", {})
         if final_intent:
@@ -200,40 +478,25 @@ class SrhSumAgent:
         }
         search_direction = ""
         if collected_results:
-            results_list = list(collected_results.values())
-
-            relevance_result = self._check_retry_search(query, results_list)
+            speculative = self._launch_speculative_retry(
+                query, retry_limit, list(all_seen_ids), list(query_history), search_args
+            )
+            relevance_result, final_results, summary_response = yield from self._evaluate(
+                query, collected_results, limit, deadline, degradations
+            )
             search_direction = relevance_result.get("search_direction", "")
 
             if relevance_result["relevant"]:
-                yield {
-                    "status": "success",
-                    "stage": "summarizing",
-                    "message": f"{relevance_result.get('decision', '搜尋結果高度相關')}，正在為您生成公告總結...",
-                }
-                final_results = sorted(
-                    list(collected_results.values()),
-                    key=lambda x: x.get("_rerank_score", x.get("_rankingScore", 0)),
-                    reverse=True,
-                )[:limit]
-                summary_response = self.tool.summarize(query, final_results)
-                if summary_response.get("status") == "success":
-                    yield {
-                        "status": "success",
-                        "stage": "complete",
-                        "summary": summary_response.get("summary"),
-                        "link_mapping": summary_response.get("link_mapping"),
-                        "summarized_count": summary_response.get("summarized_count", 0),
-                        "total_tokens": summary_response.get("total_tokens", 0),
-                        "results": final_results,
-                        "intent": final_intent,
-                    }
-                else:
-                    yield {
-                        "status": "failed",
-                        "stage": "summarizing",
-                        "error": summary_response.get("error"),
-                    }
+                self._discard_speculative(speculative)
+                yield from self._finish(
+                    query,
+                    final_results,
+                    final_intent,
+                    deadline,
+                    degradations,
+                    summary_response,
+                    f"{relevance_result.get('decision', '搜尋結果高度相關')}，正在為您生成公告總結...",
+                )
                 return
             else:
                 decision_msg = relevance_result.get("decision", "初始結果品質不足")
@@ -254,21 +517,25 @@ class SrhSumAgent:
         retry_count = 0
         current_limit = limit
         while retry_count < self.max_retries:
-            current_limit = min(int(limit * 1.5), MAX_SEARCH_LIMIT)
-            search_response = self.tool.search(
-                query=query,
-                limit=current_limit,
-                semantic_ratio=semantic_ratio,
-                enable_llm=enable_llm,
-                manual_semantic_ratio=manual_semantic_ratio,
-                exclude_ids=list(all_seen_ids),
-                history=query_history,
-                direction=search_direction,
-                start_date=start_date,
-                end_date=end_date,
-                website=website,
-                is_retry_search=True,
-            )
+            if not deadline.has(DEADLINE_RETRY_MIN):
+                self._discard_speculative(speculative)
+                speculative = None
+                yield self._degrade(degradations, "retry_skipped")
+                break
+            current_limit = retry_limit
+            search_response = None
+            if speculative is not None:
+                search_response = self._speculative_result(speculative)
+                speculative = None
+            if search_response is None:
+                search_response = self._retry_search(
+                    query,
+                    current_limit,
+                    list(all_seen_ids),
+                    query_history,
+                    search_direction,
+                    search_args,
+                )
 
             if search_response.get("status") == "success":
                 intent = search_response.get("intent", {})
@@ -294,6 +561,7 @@ class SrhSumAgent:
 
             if search_response.get("status") == "success":
                 new_results = search_response.get("results", [])
+                yield from self._report_degradations(search_response, degradations)
                 if kw:
                     yield {
                         "status": "success",
@@ -321,9 +589,9 @@ class SrhSumAgent:
                 "message": "正在評估重新搜尋結果的品質...",
             }
             if collected_results:
-                results_list = list(collected_results.values())
-
-                relevance_result = self._check_retry_search(query, results_list)
+                relevance_result, final_results, summary_response = yield from self._evaluate(
+                    query, collected_results, current_limit, deadline, degradations
+                )
             else:
                 relevance_result = {
                     "relevant": False,
@@ -334,34 +602,15 @@ class SrhSumAgent:
 
             if relevance_result["relevant"]:
                 decision_msg = relevance_result.get("decision", "找到相關資訊")
-                yield {
-                    "status": "success",
-                    "stage": "summarizing",
-                    "message": f"{decision_msg}，正在為您生成總結內容...",
-                }
-                final_results = sorted(
-                    list(collected_results.values()),
-                    key=lambda x: x.get("_rerank_score", x.get("_rankingScore", 0)),
-                    reverse=True,
-                )[:current_limit]
-                summary_response = self.tool.summarize(query, final_results)
-                if summary_response.get("status") == "success":
-                    yield {
-                        "status": "success",
-                        "stage": "complete",
-                        "summary": summary_response.get("summary"),
-                        "link_mapping": summary_response.get("link_mapping"),
-                        "summarized_count": summary_response.get("summarized_count", 0),
-                        "total_tokens": summary_response.get("total_tokens", 0),
-                        "results": final_results,
-                        "intent": final_intent,
-                    }
-                else:
-                    yield {
-                        "status": "failed",
-                        "stage": "summarizing",
-                        "error": summary_response.get("error"),
-                    }
+                yield from self._finish(
+                    query,
+                    final_results,
+                    final_intent,
+                    deadline,
+                    degradations,
+                    summary_response,
+                    f"{decision_msg}，正在為您生成總結內容...",
+                )
                 return
             retry_count += 1
             if retry_count < self.max_retries:
@@ -371,30 +620,11 @@ class SrhSumAgent:
                     "message": f"結果品質仍可優化，正在進行最後一次嘗試（方向：{search_direction}）...",
                 }
 
-        final_results = sorted(
-            list(collected_results.values()),
-            key=lambda x: x.get("_rerank_score", x.get("_rankingScore", 0)),
-            reverse=True,
-        )[:current_limit]
+        final_results = self._rank_results(collected_results, current_limit)
         if final_results:
-            summary_response = self.tool.summarize(query, final_results)
-            if summary_response.get("status") == "success":
-                yield {
-                    "status": "success",
-                    "stage": "complete",
-                    "summary": summary_response.get("summary"),
-                    "link_mapping": summary_response.get("link_mapping"),
-                    "summarized_count": summary_response.get("summarized_count", 0),
-                    "total_tokens": summary_response.get("total_tokens", 0),
-                    "results": final_results,
-                    "intent": final_intent,
-                }
-            else:
-                yield {
-                    "status": "failed",
-                    "stage": "summarizing",
-                    "error": summary_response.get("error"),
-                }
+            yield from self._finish(
+                query, final_results, final_intent, deadline, degradations
+            )
         else:
             yield {
                 "status": "success",
@@ -407,4 +637,5 @@ class SrhSumAgent:
                 "link_mapping": {},
                 "results": [],
                 "intent": final_intent,
+                "degradations": list(degradations),
             }
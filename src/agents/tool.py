@@ -1,9 +1,19 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Generator, Optional, Tuple
 from src.services.search_service import SearchService
 from src.llm.client import LLMClient
+from src.services.context_compressor import get_context_compressor
+from src.tool.context_packer import pack_context, render_document
+from src.config import CONTEXT_COMPRESSION
 from src.llm.prompts.summary import SUMMARY_SYSTEM_INSTRUCTION, SUMMARY_USER_TEMPLATE
+from src.llm.prompts.relevance_summary import (
+    RELEVANCE_SUMMARY_SYSTEM_INSTRUCTION,
+    RELEVANCE_SUMMARY_USER_TEMPLATE,
+)
 import re
 
+_CITATION_BRACKETS = str.maketrans({"【": "[", "】": "]", "［": "[", "］": "]"})
+_SUMMARY_FIELDS = ("brief_answer", "detailed_answer", "general_summary")
+
 
 class SearchTool:
     def __init__(self):
@@ -32,9 +42,11 @@ class SearchTool:
         end_date: str = None,
         website: List[str] = None,
         is_retry_search: bool = False,
+        deadline=None,
     ) -> Dict[str, Any]:
         """
         Executes a search using the SearchService.
+        deadline (src.tool.deadline.Deadline) bounds every call made by the search.
         """
         return self.search_service.search(
             user_query=query,
@@ -49,88 +61,285 @@ class SearchTool:
             end_date=end_date,
             website=website,
             is_retry_search=is_retry_search,
+            deadline=deadline,
         )
 
-    def summarize(self, user_query: str, search_results: List[Dict]) -> Dict[str, Any]:
+    def summarize(
+        self,
+        user_query: str,
+        search_results: List[Dict],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
         """
         Summarizes the provided search results relevant to the user query.
         Returns structured summary with hyperlink mapping.
         """
         from src.schema.schemas import StructuredSummary
-        from src.tool.ANSI import print_red
-        from src.config import SUMMARIZE_TOKEN_LIMIT
 
         if not search_results:
+            return self._empty_summary()
+
+        messages, link_mapping, packing = (
+            self._build_summary_request(user_query, search_results)
+        )
+        llm_response = self.llm_client.call_with_schema(
+            messages=messages,
+            response_model=StructuredSummary,
+            temperature=0.1,
+            timeout=timeout,
+        )
+        return self._format_summary_response(
+            llm_response, link_mapping, packing
+        )
+
+    def summarize_stream(
+        self,
+        user_query: str,
+        search_results: List[Dict],
+        timeout: Optional[float] = None,
+    ) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """
+        串流版本的 summarize。
+        brief_answer 完整生成後 yield 一次 {"field", "value"}，detailed_answer / general_summary 則逐段
+        yield {"field", "delta"}；第一個事件附帶 link_mapping 以便前端即時轉換引用。
+        generator 的回傳值與 summarize 相同 (以 `yield from` 取得)。
+        """
+        from src.schema.schemas import StructuredSummary
+
+        if not search_results:
+            return self._empty_summary()
+
+        messages, link_mapping, packing = (
+            self._build_summary_request(user_query, search_results)
+        )
+        stream = self.llm_client.stream_with_schema(
+            messages=messages,
+            response_model=StructuredSummary,
+            temperature=0.1,
+            timeout=timeout,
+        )
+        llm_response = yield from self._summary_events(stream, link_mapping)
+        return self._format_summary_response(
+            llm_response, link_mapping, packing
+        )
+
+    def judge_and_summarize(
+        self,
+        user_query: str,
+        search_results: List[Dict],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        相關性判斷與總結合併為一次 LLM 呼叫 (RelevanceSummary)。
+        回傳 {"relevant", "search_direction", "decision", "summary_response"}；
+        summary_response 與 summarize 的回傳格式相同，不相關或呼叫失敗時為 None (由呼叫端決定是否另外總結)。
+        """
+        from src.schema.schemas import RelevanceSummary
+
+        if not search_results:
+            return self._no_results_verdict()
+
+        messages, link_mapping, packing = (
+            self._build_summary_request(
+                user_query,
+                search_results,
+                RELEVANCE_SUMMARY_SYSTEM_INSTRUCTION,
+                RELEVANCE_SUMMARY_USER_TEMPLATE,
+            )
+        )
+        llm_response = self.llm_client.call_with_schema(
+            messages=messages,
+            response_model=RelevanceSummary,
+            temperature=0.1,
+            timeout=timeout,
+        )
+        return self._format_relevance_response(
+            llm_response, link_mapping, packing
+        )
+
+    def judge_and_summarize_stream(
+        self,
+        user_query: str,
+        search_results: List[Dict],
+        timeout: Optional[float] = None,
+    ) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """
+        串流版本的 judge_and_summarize。
+        判斷完成時先 yield {"relevant", "decision"}，相關時接著 yield 與 summarize_stream 相同的總結事件；
+        generator 的回傳值與 judge_and_summarize 相同。
+        """
+        from src.schema.schemas import RelevanceSummary
+
+        if not search_results:
+            return self._no_results_verdict()
+
+        messages, link_mapping, packing = (
+            self._build_summary_request(
+                user_query,
+                search_results,
+                RELEVANCE_SUMMARY_SYSTEM_INSTRUCTION,
+                RELEVANCE_SUMMARY_USER_TEMPLATE,
+            )
+        )
+        stream = self.llm_client.stream_with_schema(
+            messages=messages,
+            response_model=RelevanceSummary,
+            temperature=0.1,
+            timeout=timeout,
+        )
+        llm_response = yield from self._summary_events(stream, link_mapping, gated=True)
+        return self._format_relevance_response(
+            llm_response, link_mapping, packing
+        )
+
+    def _summary_events(
+        self, stream: Generator, link_mapping: Dict[str, str], gated: bool = False
+    ) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """
+        將 stream_with_schema 的解析事件轉為前端使用的總結事件，回傳值為 LLM 結果。
+        gated=True (RelevanceSummary) 時，relevant 解析完成後 yield {"relevant", "decision"}，
+        且只有 relevant 為 true 才轉送總結欄位。
+        """
+        first = True
+        forwarding = not gated
+        decision = ""
+        while True:
+            try:
+                kind, field, text = next(stream)
+            except StopIteration as stop:
+                return stop.value
+
+            if gated and field == "decision" and kind == "done":
+                decision = text
+                continue
+            if gated and field == "relevant" and kind == "value":
+                forwarding = bool(text)
+                yield {"relevant": forwarding, "decision": decision}
+                continue
+            if not forwarding or field not in _SUMMARY_FIELDS:
+                continue
+
+            if field == "brief_answer":
+                if kind != "done":
+                    continue
+                event = {"field": field, "value": self._clean_citation_chars(text)}
+            elif kind == "delta":
+                event = {"field": field, "delta": self._clean_citation_chars(text)}
+            else:
+                continue
+
+            if first:
+                event["link_mapping"] = link_mapping
+                first = False
+            yield event
+
+    def _no_results_verdict(self) -> Dict[str, Any]:
+        return {
+            "relevant": False,
+            "search_direction": "無任何結果，請嘗試搜尋更通用的關鍵字",
+            "decision": "無搜尋結果",
+            "summary_response": None,
+        }
+
+    def _format_relevance_response(
+        self,
+        llm_response: Dict[str, Any],
+        link_mapping: Dict[str, str],
+        packing: Dict[str, int],
+    ) -> Dict[str, Any]:
+        from src.tool.ANSI import print_red
+
+        if llm_response.get("status") != "success":
+            # 與單獨的相關性檢查相同：評估失敗時採用現有內容，由呼叫端另外總結
+            print_red(f"Relevance summary failed: {llm_response.get('error')}")
             return {
-                "status": "success",
-                "summary": {
-                    "brief_answer": "沒有參考資料",
-                    "detailed_answer": "",
-                    "general_summary": "",
-                },
-                "link_mapping": {},
-                "summarized_count": 0,
-                "total_tokens": 0,
+                "relevant": True,
+                "search_direction": "",
+                "decision": "評估失敗，採用現有內容",
+                "summary_response": None,
             }
 
-        # 1. 根據 token 限制選擇要摘要的文檔
-        selected_docs = []
-        cumulative_tokens = 0
-        
-        for doc in search_results:
-            doc_tokens = doc.get("token", 0)
-            if cumulative_tokens + doc_tokens <= SUMMARIZE_TOKEN_LIMIT:
-                selected_docs.append(doc)
-                cumulative_tokens += doc_tokens
-            else:
-                # 已達到 token 限制，停止添加
-                break
-        
-        # 如果沒有任何文檔符合條件，至少取第一篇
+        verdict = llm_response.get("result")
+        summary_response = None
+        if verdict.relevant:
+            summary_response = self._format_summary_response(
+                llm_response, link_mapping, packing
+            )
+        return {
+            "relevant": verdict.relevant,
+            "search_direction": verdict.search_direction,
+            "decision": verdict.decision,
+            "summary_response": summary_response,
+        }
+
+    def _clean_citation_chars(self, text: str) -> str:
+        """串流片段可能把 【1】 切成兩半，因此逐字元轉換全角括號"""
+        return text.translate(_CITATION_BRACKETS) if text else ""
+
+    def _empty_summary(self) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "summary": {
+                "brief_answer": "沒有參考資料",
+                "detailed_answer": "",
+                "general_summary": "",
+            },
+            "link_mapping": {},
+            "summarized_count": 0,
+            "total_tokens": 0,
+        }
+
+    def _build_summary_request(
+        self,
+        user_query: str,
+        search_results: List[Dict],
+        system_instruction: str = SUMMARY_SYSTEM_INSTRUCTION,
+        user_template: str = SUMMARY_USER_TEMPLATE,
+    ) -> Tuple[List[Dict[str, str]], Dict[str, str], Dict[str, int]]:
+        from src.config import SUMMARIZE_TOKEN_LIMIT
+
+        # 1. 依相關性 / token 比在限制內挑選文件，放不下的文件在句子邊界截斷
+        if CONTEXT_COMPRESSION:
+            search_results = get_context_compressor().compress(user_query, search_results)
+        packed = pack_context(search_results, SUMMARIZE_TOKEN_LIMIT)
+        selected_docs = [doc for _, doc in packed["documents"]]
+        # 預算小到放不下任何截斷文件 (低於 MIN_TRUNCATED_TOKENS) 時，至少放入截斷到預算內的第一篇
         if not selected_docs and search_results:
-            selected_docs = [search_results[0]]
-            cumulative_tokens = search_results[0].get("token", 0)
-        
-        summarized_count = len(selected_docs)
+            first = pack_context(search_results[:1], SUMMARIZE_TOKEN_LIMIT, min_truncated_tokens=1)
+            selected_docs = [doc for _, doc in first["documents"]]
+            packed["packed_tokens"] = first["packed_tokens"]
+            packed["discarded_tokens"] = max(0, packed["discarded_tokens"] - first["packed_tokens"])
+
+        packing = {
+            "summarized_count": len(selected_docs),
+            "total_tokens": packed["packed_tokens"],
+            "discarded_tokens": packed["discarded_tokens"],
+        }
 
         # 2. Prepare Context with XML tags
         context_text = ""
         link_mapping = {}
 
         for idx, doc in enumerate(selected_docs, 1):
-            title = doc.get("title", "No Title")
-            link = doc.get("heading_link") or doc.get("link", "")
-            content = doc.get("content") or doc.get("cleaned_content") or ""
-            year = doc.get("year", "")
-            year_month = doc.get("year_month", "")
-            website = doc.get("website", "")
-
-            # if len(content) > 1200:
-            #     content = content[:1200] + "..."
-
-            context_text += f'<document index="{idx}">\n'
-            context_text += f"<title>{title}</title>\n"
-            context_text += f"<year_month>{year_month}</year_month>\n"
-            context_text += f"<year>{year}</year>\n"
-            context_text += f"<website>{website}</website>\n"
-            context_text += f"<content>{content}</content>\n"
-            context_text += f"</document>\n\n"
-            link_mapping[str(idx)] = link
+            context_text += render_document(idx, doc)
+            link_mapping[str(idx)] = doc.get("heading_link") or doc.get("link", "")
 
         # 3. Build Prompt
-        system_msg = SUMMARY_SYSTEM_INSTRUCTION
-        user_msg = SUMMARY_USER_TEMPLATE.format(context=context_text, query=user_query)
+        system_msg = system_instruction
+        user_msg = user_template.format(context=context_text, query=user_query)
         messages = [
             {"role": "system", "content": system_msg},
             {"role": "user", "content": user_msg},
         ]
+        return messages, link_mapping, packing
 
-        # 4. Call LLM with schema
-        llm_response = self.llm_client.call_with_schema(
-            messages=messages,
-            response_model=StructuredSummary,
-            temperature=0.1,
-        )
+    def _format_summary_response(
+        self,
+        llm_response: Dict[str, Any],
+        link_mapping: Dict[str, str],
+        packing: Dict[str, int],
+    ) -> Dict[str, Any]:
+        from src.tool.ANSI import print_red
 
         if llm_response.get("status") == "success":
             validated_result = llm_response.get("result")
@@ -148,8 +357,7 @@ class SearchTool:
                     ),
                 },
                 "link_mapping": link_mapping,
-                "summarized_count": summarized_count,
-                "total_tokens": cumulative_tokens,
+                **packing,
             }
         else:
             print_red(f"Summary generation failed: {llm_response.get('error')}")
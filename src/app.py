@@ -21,7 +21,7 @@ from dotenv import load_dotenv
 from typing import Dict, Any
 
 from src.database.db_adapter_meili import MeiliAdapter
-from src.agents.srhSumAgent import SrhSumAgent
+from src.agents.srhSumAgent import SrhSumAgent, get_speculative_retry_stats
 from src.config import (
     APP_VERSION,
     ADMIN_TOKEN,
@@ -43,11 +43,24 @@ from src.config import (
     AVAILABLE_SOURCES,
     MEILISEARCH_TIMEOUT,
     PROXY_MODEL_NAME,
-    MAX_CHAT_HISTORY
+    MAX_CHAT_HISTORY,
+    SEARCH_DEADLINE,
+    MAX_SEARCH_DEADLINE,
 )
 from src.tool.ANSI import print_red
+from src.database import vector_utils
+from src.llm.scheduler import get_llm_scheduler
+from src.llm.response_cache import get_response_cache
+from src.llm.router import get_model_router
+from src.llm.telemetry import get_llm_telemetry
 from src.services.rag_service import RAGService
+from src.services.context_compressor import get_context_compressor
+from src.services.result_sessions import get_result_session_store
+from src.services.rank_fusion import get_fetch_tuner
+from src.services.candidate_fetch import get_candidate_fetch_stats
+from src.tool.token_counter import get_token_counter
 from src.log.logManager import LogManager
+from src.tool.deadline import Deadline
 
 # Load environment variables
 load_dotenv()
@@ -138,6 +151,18 @@ def get_config():
     )
 
 
+def _chat_context_doc(rank: int, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """與前端 prepareContext 相同的對話參考資料格式 (標題前加上結果排名)"""
+    return {
+        "title": f"[No.{rank}] {doc.get('title', '')}",
+        "content": doc.get("content") or doc.get("cleaned_content") or "",
+        "link": doc.get("link"),
+        "year_month": doc.get("year_month"),
+        "year": doc.get("year") or "",
+        "website": doc.get("website") or "",
+    }
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat_endpoint():
     """
@@ -145,9 +170,12 @@ def chat_endpoint():
     處理前端傳來的聊天請求，包含上下文與歷史紀錄
     Request JSON: {
         "message": "user question",
-        "context": [...],
+        "result_set_id": "...",   # /api/search complete 階段回傳的 id
+        "doc_ids": [...],         # 選取的文件 id (依引用編號順序)
+        "context": [...],         # 未提供 result_set_id 時使用的完整搜尋結果
         "history": [...]
     }
+    result_set_id 過期或不存在時回傳 410
     """
     try:
         print("\n" + "=" * 60)
@@ -170,11 +198,32 @@ def chat_endpoint():
                 400,
             )
 
-        # 接收前端傳來的 Context (搜尋結果)
-        provided_context = data.get("context", [])
+        # 接收前端傳來的 Context：result_set_id + doc_ids (server-side session)，或完整的搜尋結果
+        result_set_id = data.get("result_set_id")
+        if result_set_id:
+            doc_ids = data.get("doc_ids", [])
+            if not isinstance(doc_ids, list):
+                return jsonify({"error": "Invalid 'doc_ids' value. Must be a list."}), 400
+            selected = get_result_session_store().select(result_set_id, doc_ids)
+            if selected is None:
+                # session 過期或不在此行程，前端會改為傳送完整 context
+                return (
+                    jsonify(
+                        {
+                            "status": "failed",
+                            "error_stage": "result_set_expired",
+                            "error": "Result set expired or unknown. Resend the full context.",
+                        }
+                    ),
+                    410,
+                )
+            provided_context = [_chat_context_doc(rank, doc) for rank, doc in selected]
+        else:
+            provided_context = data.get("context", [])
         # 接收前端傳來的 History (對話紀錄)
         chat_history = data.get("history", [])
         print(f"  Message: {user_message}")
+        print(f"  Result set: {result_set_id}")
         print(f"  Context items: {len(provided_context)}")
         print(f"  History items: {len(chat_history)}")
         if not user_message:
@@ -191,11 +240,18 @@ def chat_endpoint():
             history=chat_history,
         )
 
+        # references 為完整文件，紀錄中只保留標題與連結
+        log_response = dict(response)
+        if "references" in log_response:
+            log_response["references"] = [
+                {"title": ref.get("title"), "link": ref.get("link")}
+                for ref in log_response["references"]
+            ]
         LogManager.log_chat(
             ip=client_ip,
             headers=request_headers,
             request_data=request_data,
-            response_data=response,
+            response_data=log_response,
         )
 
         print("Chat response generated")
@@ -229,6 +285,7 @@ def search_endpoint():
         start_date = data.get("start_date")
         end_date = data.get("end_date")
         selected_website = data.get("selected_website", [])
+        deadline_seconds = data.get("deadline", SEARCH_DEADLINE)
 
         if not query:
             return jsonify({"error": "Query is required"}), 400
@@ -254,6 +311,7 @@ def search_endpoint():
         print(f"  Start Date: {start_date}")
         print(f"  End Date: {end_date}")
         print(f"  Selected website: {selected_website}")
+        print(f"  Deadline: {deadline_seconds}s")
         # Validate parameters
         if not isinstance(limit, int) or limit < 1 or limit > MAX_SEARCH_LIMIT:
             return (
@@ -278,6 +336,23 @@ def search_endpoint():
                 400,
             )
 
+        if (
+            isinstance(deadline_seconds, bool)
+            or not isinstance(deadline_seconds, (int, float))
+            or deadline_seconds <= 0
+            or deadline_seconds > MAX_SEARCH_DEADLINE
+        ):
+            return (
+                jsonify(
+                    {
+                        "error": f"Invalid 'deadline' value. Must be seconds between 0 and {MAX_SEARCH_DEADLINE}."
+                    }
+                ),
+                400,
+            )
+        # 從收到請求開始計時，涵蓋串流回應期間的所有階段
+        deadline = Deadline(float(deadline_seconds))
+
         client_ip = request.remote_addr
         request_headers = dict(request.headers)
         request_data = data.copy()
@@ -295,8 +370,16 @@ def search_endpoint():
                 start_date=start_date,
                 end_date=end_date,
                 website=selected_website,
+                deadline=deadline,
             ):
-                response_steps.append(step)
+                # 最終結果登記為 server-side session，對話時只需傳回 result_set_id 與文件 id
+                if step.get("stage") == "complete" and step.get("results"):
+                    step["result_set_id"] = get_result_session_store().register(
+                        step["results"]
+                    )
+                # summary_delta 只是 complete 的逐段預覽，不寫入搜尋紀錄
+                if step.get("stage") != "summary_delta":
+                    response_steps.append(step)
                 yield json.dumps(step, ensure_ascii=False) + "\n"
 
             LogManager.log_search(
@@ -307,7 +390,9 @@ def search_endpoint():
             )
 
         return Response(
-            stream_with_context(generate()), mimetype="application/x-ndjson"
+            stream_with_context(generate()),
+            mimetype="application/x-ndjson",
+            headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
         )
     except Exception as e:
         print_red(f"Search Endpoint Error: {e}")
@@ -333,6 +418,33 @@ def get_stats():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/metrics")
+def get_metrics():
+    """
+    Runtime metrics for tuning (process-local counters)
+
+    Returns:
+        JSON response with embedding client and LLM scheduler / cache / router / telemetry statistics
+    """
+    return jsonify(
+        {
+            "query_embedding": vector_utils.get_query_embedding_stats(),
+            "llm_scheduler": get_llm_scheduler().get_stats(),
+            "llm_response_cache": (
+                get_response_cache().get_stats() if get_response_cache() else None
+            ),
+            "llm_router": get_model_router().get_stats(),
+            "llm_telemetry": get_llm_telemetry().get_stats(),
+            "speculative_retry": get_speculative_retry_stats(),
+            "context_compression": get_context_compressor().get_stats(),
+            "result_sessions": get_result_session_store().get_stats(),
+            "adaptive_fetch": get_fetch_tuner().get_stats(),
+            "candidate_fetch": get_candidate_fetch_stats().get_stats(),
+            "tokenizer": get_token_counter().get_stats(),
+        }
+    )
+
+
 @app.route("/api/health")
 def health_check():
     """Health check endpoint"""
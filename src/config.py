@@ -77,9 +77,44 @@ def get_pre_search_limit(limit):
     )  # 根據使用者選擇的篇數動態返回 > 的數量並進行現有演算法處理 (merge,key_alg, sort, multi_search)
 
 
+def get_candidate_window(limit):
+    return max(
+        10, round(limit * 2.5)
+    )  # 兩階段 fetch 的第一階段視窗 (只取 id / 分數)，不足時才擴大到 get_pre_search_limit
+
+
+TWO_PHASE_FETCH = True  # 先取小視窗候選，rerank 後只取回選中文件的完整內容
+CANDIDATE_FLAT_SPREAD = 0.02  # 第 limit 名與視窗最後一名的分數差小於此值時視為平坦，擴大視窗
 RETRY_SEARCH_LIMIT_MULTIPLIER = (
     1.5  # 重試後的擴大範圍，也會影響上面的，假設 is_retry_search 為 true
 )
 NO_HIT_PENALTY_FACTOR = 0.15
 KEYWORD_HIT_BOOST_FACTOR = 0.60
+RRF_K = 60  # reciprocal-rank fusion 的平滑常數，1 / (RRF_K + 名次)
+FUSION_BOOST_FACTOR = 0.3  # 多個子查詢都命中時補足分數的比重 (只有一個子查詢時不影響分數)
+ADAPTIVE_FETCH_LIMIT = True  # 依實際用到的名次深度自動縮小 / 放大每個子查詢的 fetch limit (最多縮到 0.4 倍；兩階段 fetch 時只影響擴大後的視窗)
+VECTOR_RERANK = False  # 以候選的儲存向量 (retrieveVectors) 計算精確 cosine 並混入 rerank 分數，會增加搜尋回應大小
+VECTOR_RERANK_WEIGHT = 0.3  # cosine 在最終 rerank 分數中的比重
 SEARCH_MAX_RETRIES = 1  # 重搜索的次數
+STREAM_SUMMARY = True  # 串流生成總結，以 summary_delta 階段逐段回傳 brief / detailed answer
+COMBINED_RELEVANCE_SUMMARY = True  # 相關性判斷與總結合併為一次 LLM 呼叫 (RelevanceSummary)，不相關時才重搜
+SPECULATIVE_RETRY_SEARCH = False  # 相關性判斷同時預先執行第一次重搜索，不相關時直接採用 (會多耗用一次搜尋)
+
+# 總結 / 對話前的查詢導向壓縮：每篇文件只保留與查詢 embedding 最相似的段落 (需額外計算段落 embedding)
+CONTEXT_COMPRESSION = False
+CONTEXT_COMPRESSION_RATIO = 0.4  # 每篇保留的段落總長度上限 (佔原文比例)
+CONTEXT_COMPRESSION_MIN_CHARS = 1200  # 短於此字數的文件不壓縮
+CONTEXT_PASSAGE_CHARS = 300  # 段落長度上限 (以句子為單位合併)
+PASSAGE_EMBEDDING_CACHE_SIZE = 20000  # 段落 embedding 的 LRU 快取筆數
+
+# Token 計算：encoder 行程內共用，長文字的 token 數以內容 hash 記憶；遠低於上限時以字元數估算
+TOKEN_MEMO_SIZE = 20000  # token 數記憶的 LRU 筆數
+TOKEN_MEMO_MIN_CHARS = 256  # 短於此字數的文字直接計算，不進記憶
+TOKEN_ESTIMATE_SAFE_RATIO = 0.5  # 估算值低於上限的此比例時視為「遠低於上限」，不做精確計算
+
+# 請求總時間預算 (秒)：/api/search 可用 deadline 參數覆寫，剩餘時間低於門檻時依序降級
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", 45))
+MAX_SEARCH_DEADLINE = 120
+DEADLINE_INTENT_MIN = 4  # 低於此秒數：略過 LLM 意圖解析，直接使用原始查詢
+DEADLINE_RETRY_MIN = 20  # 低於此秒數：不再重搜索 (也不做相關性判斷)，直接總結現有結果
+DEADLINE_SUMMARY_MIN = 6  # 低於此秒數：略過總結，只回傳搜尋結果
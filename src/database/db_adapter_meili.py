@@ -1,5 +1,5 @@
 import meilisearch
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from src.schema.schemas import AnnouncementDoc
 from src.meilisearch_config import (
     RANKING_RULES,
@@ -9,6 +9,13 @@ from src.meilisearch_config import (
     DEFAULT_SEMANTIC_RATIO,
 )
 import json
+import numpy as np
+from src.database.vector_projection import (
+    embedding_version,
+    get_active_projection,
+    project_vector,
+)
+from src.services.keyword_alg import build_keyword_signature
 from src.tool.ANSI import print_red
 
 
@@ -23,6 +30,8 @@ class MeiliAdapter:
         self.client = meilisearch.Client(host, api_key, timeout=timeout)
         self.collection_name = collection_name
         self.index = self.client.index(collection_name)
+        self._embedding_version_checked = False
+        self._embedding_version_error: Optional[str] = None
         self._configure_index()
 
     def _configure_index(self):
@@ -34,16 +43,56 @@ class MeiliAdapter:
             print(
                 f"✓ Meilisearch index '{self.collection_name}' configured successfully."
             )
+            projection = get_active_projection()
+            if projection:
+                print(f"  Embedding projection: {projection.version}")
         except Exception as e:
             print_red(f"Warning: Error configuring Meilisearch index: {e}")
             print_red("Index may need manual configuration via Meilisearch dashboard.")
 
+    def check_embedding_version(self) -> Optional[str]:
+        """
+        比對索引文件記錄的 embedding_version 與目前的投影設定 (每個 adapter 只檢查一次)。
+        不一致時回傳錯誤訊息：查詢向量與索引向量不在同一空間，向量搜尋結果沒有意義。
+        """
+        if self._embedding_version_checked:
+            return self._embedding_version_error
+        expected = embedding_version()
+        try:
+            hits = self.index.search(
+                "", {"limit": 1, "attributesToRetrieve": ["embedding_version"]}
+            )["hits"]
+        except Exception as e:
+            print_red(f"Warning: Could not check embedding version: {e}")
+            return None
+
+        stored = hits[0].get("embedding_version") if hits else None
+        if stored and stored != expected:
+            self._embedding_version_error = (
+                f"Index '{self.collection_name}' vectors were written with {stored}, "
+                f"but queries use {expected}. Re-ingest the index or fix EMBEDDING_PROJECTION_DIMS."
+            )
+            print_red(self._embedding_version_error)
+        elif hits and not stored:
+            print_red(
+                f"Warning: Index '{self.collection_name}' has no embedding_version; "
+                f"assuming {expected}. Re-ingest to record it."
+            )
+        self._embedding_version_checked = True
+        return self._embedding_version_error
+
     def upsert_documents(self, documents: List[Dict[str, Any]]) -> None:
         if not documents:
             print("No documents to upsert.")
             return
         try:
-            task_info = self.index.add_documents(documents, primary_key="id")
+            if any(_has_array_vectors(doc) for doc in documents):
+                # float32 向量直接由 buffer 格式化成 NDJSON，避免先轉成 Python float list
+                task_info = self.index.add_documents_ndjson(
+                    serialize_documents_ndjson(documents), primary_key="id"
+                )
+            else:
+                task_info = self.index.add_documents(documents, primary_key="id")
             print(f"✓ Upserted {len(documents)} documents to Meilisearch.")
             print(f"  Task UID: {task_info.task_uid}")
         except Exception as e:
@@ -101,11 +150,15 @@ class MeiliAdapter:
                 "stage": "meilisearch_search",
             }
 
-    def multi_search(self, queries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def multi_search(
+        self, queries: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Execute multiple searches in a single HTTP request using Meilisearch multi-search.
         Args:
             queries: List of search parameters. Each dict must include 'indexUid' and 'q'.
+            timeout: Per-call timeout in seconds (e.g. the request's remaining deadline).
+                     Defaults to the adapter's client timeout.
         """
         try:
             # ensure indexUid is present in each query
@@ -113,7 +166,13 @@ class MeiliAdapter:
                 if "indexUid" not in q:
                     q["indexUid"] = self.collection_name
 
-            results = self.client.multi_search(queries)
+            client = self.client
+            if timeout is not None:
+                # meilisearch client 只有建構時的 timeout，且不共用連線，建立臨時 client 成本很低
+                client = meilisearch.Client(
+                    self.client.config.url, self.client.config.api_key, timeout=timeout
+                )
+            results = client.multi_search(queries)
             return {"status": "success", "result": results}
         except Exception as e:
             print_red(f"Meilisearch multi-search error: {e}")
@@ -211,10 +270,11 @@ def build_meili_filter(intent) -> Optional[str]:
 
 
 def transform_doc_for_meilisearch(
-    doc: AnnouncementDoc, embedding_vector: List[float]
+    doc: AnnouncementDoc, embedding_vector: Union[List[float], np.ndarray]
 ) -> Dict[str, Any]:
     doc_dict = transform_doc_metadata_only(doc)
-    doc_dict["_vectors"] = {"default": embedding_vector}
+    doc_dict["_vectors"] = {"default": project_vector(embedding_vector)}
+    doc_dict["embedding_version"] = embedding_version()
     return doc_dict
 
 
@@ -222,5 +282,50 @@ def transform_doc_metadata_only(doc: AnnouncementDoc) -> Dict[str, Any]:
     """
     Convert AnnouncementDoc to dictionary for Meilisearch.
     Uses model_dump() to preserve all fields including extra fields.
+    Adds keyword_signature (a Bloom filter of the title / content terms) so
+    query-time keyword reranking is a lookup instead of a full-text transform;
+    it is not a searchable attribute.
+    """
+    doc_dict = doc.model_dump(by_alias=True, exclude_none=False)
+    doc_dict["keyword_signature"] = build_keyword_signature(doc.title, doc.content)
+    return doc_dict
+
+
+def _has_array_vectors(doc: Dict[str, Any]) -> bool:
+    vectors = doc.get("_vectors")
+    return isinstance(vectors, dict) and any(
+        isinstance(v, np.ndarray) for v in vectors.values()
+    )
+
+
+def _format_vector(vector: Union[List[float], np.ndarray]) -> str:
+    """
+    float32 向量以 %.9g 格式化 (足以無損還原 float32)，比 json.dumps(list) 快且輸出較短。
+    """
+    if not isinstance(vector, np.ndarray):
+        return json.dumps(vector)
+    if not np.isfinite(vector).all():
+        raise ValueError("Embedding vector contains NaN or Inf")
+    return "[" + ",".join(map("{:.9g}".format, vector.tolist())) + "]"
+
+
+def serialize_documents_ndjson(documents: List[Dict[str, Any]]) -> bytes:
+    """
+    將文件序列化成 Meilisearch 可接受的 NDJSON (每行一筆)。
+    metadata 仍由 json.dumps 處理，_vectors 則直接由 float32 buffer 格式化後接在同一個物件內。
     """
-    return doc.model_dump(by_alias=True, exclude_none=False)
+    lines = []
+    for doc in documents:
+        vectors = doc.get("_vectors")
+        if not isinstance(vectors, dict):
+            lines.append(json.dumps(doc, ensure_ascii=False))
+            continue
+        meta = {k: v for k, v in doc.items() if k != "_vectors"}
+        body = json.dumps(meta, ensure_ascii=False)[:-1]
+        vector_json = ",".join(
+            f"{json.dumps(name)}:{_format_vector(vector)}"
+            for name, vector in vectors.items()
+        )
+        separator = "," if meta else ""
+        lines.append(f'{body}{separator}"_vectors":{{{vector_json}}}}}')
+    return ("\n".join(lines) + "\n").encode("utf-8")
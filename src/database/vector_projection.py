@@ -0,0 +1,195 @@
+"""
+Corpus-fitted PCA projection for stored embeddings.
+
+bge-m3 產生 1024 維向量；啟用 EMBEDDING_PROJECTION_DIMS 後，寫入 (transform_doc_for_meilisearch)
+與查詢 (_build_single_query_params) 兩端都會先投影到較低維度，以縮小 Meilisearch 索引與向量搜尋成本。
+投影矩陣以 index 名稱命名存放，並帶有 version 以便與索引一起管理；
+寫入的每份文件都記錄 embedding_version，查詢端以此確認索引向量與目前的投影一致。
+"""
+
+import os
+import hashlib
+import threading
+from typing import List, Optional, Sequence, Union
+import numpy as np
+
+from src.config import DATABASE_DIR, MEILISEARCH_INDEX
+from src.meilisearch_config import EMBEDDING_PROJECTION_DIMS, EMBEDDING_SOURCE_DIMS
+
+PROJECTION_DIR = os.path.join(DATABASE_DIR, "projections")
+SUPPORTED_PROJECTION_DIMS = (256, 384, 512)
+
+
+class PCAProjection:
+    """以 NumPy 擬合的 PCA 投影：(x - mean) @ components.T，輸出再做 L2 正規化。"""
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        explained_variance_ratio: Optional[np.ndarray] = None,
+    ):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.explained_variance_ratio = (
+            np.asarray(explained_variance_ratio, dtype=np.float32)
+            if explained_variance_ratio is not None
+            else None
+        )
+        digest = hashlib.sha1(self.mean.tobytes() + self.components.tobytes())
+        self.version = f"pca{self.dims}-{digest.hexdigest()[:12]}"
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def source_dims(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dims: int) -> "PCAProjection":
+        """
+        以語料的 embedding 矩陣 (n, d) 擬合 PCA。
+        使用 d x d 共變異數矩陣的特徵分解，記憶體只與維度有關，不隨文件數成長。
+        """
+        x = np.asarray(embeddings, dtype=np.float64)
+        if x.ndim != 2:
+            raise ValueError(f"Expected a 2-D embedding matrix, got shape {x.shape}")
+        if not 0 < dims < x.shape[1]:
+            raise ValueError(f"dims must be between 1 and {x.shape[1] - 1}, got {dims}")
+
+        mean = x.mean(axis=0)
+        centered = x - mean
+        cov = centered.T @ centered / max(len(x) - 1, 1)
+        eigvals, eigvecs = np.linalg.eigh(cov)
+        order = np.argsort(eigvals)[::-1][:dims]
+        components = eigvecs[:, order].T
+        total = eigvals.sum()
+        ratio = eigvals[order] / total if total > 0 else np.zeros(dims)
+        return cls(mean, components, ratio)
+
+    def transform(self, vectors: Union[np.ndarray, Sequence[Sequence[float]]]) -> np.ndarray:
+        """投影一批向量 (n, source_dims) -> (n, dims)，回傳 float32 且已 L2 正規化。"""
+        x = np.asarray(vectors, dtype=np.float32)
+        single = x.ndim == 1
+        if single:
+            x = x[None, :]
+        if x.shape[1] != self.source_dims:
+            raise ValueError(
+                f"Projection {self.version} expects {self.source_dims}-dim vectors, got {x.shape[1]}"
+            )
+        projected = (x - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        projected /= np.maximum(norms, 1e-12)
+        return projected[0] if single else projected
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            mean=self.mean,
+            components=self.components,
+            explained_variance_ratio=(
+                self.explained_variance_ratio
+                if self.explained_variance_ratio is not None
+                else np.array([], dtype=np.float32)
+            ),
+            version=np.array(self.version),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        with np.load(path) as data:
+            ratio = data["explained_variance_ratio"]
+            projection = cls(
+                data["mean"], data["components"], ratio if ratio.size else None
+            )
+            stored_version = str(data["version"])
+        if stored_version != projection.version:
+            raise ValueError(
+                f"Projection file {path} is corrupted (version {stored_version} != {projection.version})"
+            )
+        return projection
+
+
+def projection_path(index_name: str = MEILISEARCH_INDEX, dims: int = EMBEDDING_PROJECTION_DIMS) -> str:
+    """投影矩陣與索引一起版本化：database/projections/{index}_pca{dims}.npz"""
+    return os.path.join(PROJECTION_DIR, f"{index_name}_pca{dims}.npz")
+
+
+_active_projection: Optional[PCAProjection] = None
+_active_projection_lock = threading.Lock()
+
+
+def get_active_projection() -> Optional[PCAProjection]:
+    """依設定載入目前索引使用的投影；EMBEDDING_PROJECTION_DIMS=0 時回傳 None (使用完整維度)。"""
+    global _active_projection
+    if not EMBEDDING_PROJECTION_DIMS:
+        return None
+    if _active_projection is None:
+        with _active_projection_lock:
+            if _active_projection is None:
+                path = projection_path()
+                if not os.path.exists(path):
+                    raise FileNotFoundError(
+                        f"EMBEDDING_PROJECTION_DIMS={EMBEDDING_PROJECTION_DIMS} but projection file "
+                        f"'{path}' was not found. Run data_update/fit_projection.py first."
+                    )
+                projection = PCAProjection.load(path)
+                if projection.source_dims != EMBEDDING_SOURCE_DIMS:
+                    raise ValueError(
+                        f"Projection {projection.version} expects {projection.source_dims}-dim input, "
+                        f"but the embedding model produces {EMBEDDING_SOURCE_DIMS}"
+                    )
+                if projection.dims != EMBEDDING_PROJECTION_DIMS:
+                    raise ValueError(
+                        f"Projection {projection.version} has {projection.dims} dims, "
+                        f"expected {EMBEDDING_PROJECTION_DIMS}"
+                    )
+                print(f"✓ Loaded embedding projection {projection.version} from {path}")
+                _active_projection = projection
+    return _active_projection
+
+
+def embedding_version() -> str:
+    """目前寫入 / 查詢使用的向量版本：投影的 version，未啟用投影時為 full{EMBEDDING_SOURCE_DIMS}"""
+    projection = get_active_projection()
+    return projection.version if projection is not None else f"full{EMBEDDING_SOURCE_DIMS}"
+
+
+def project_vector(
+    vector: Union[List[float], np.ndarray]
+) -> Union[List[float], np.ndarray]:
+    """
+    對單一向量套用目前的投影 (未啟用時原樣回傳)。
+    輸入為 ndarray 時回傳 float32 ndarray，輸入為 list 時回傳 list。
+    """
+    projection = get_active_projection()
+    if projection is None or vector is None:
+        return vector
+    projected = projection.transform(vector)
+    return projected if isinstance(vector, np.ndarray) else projected.tolist()
+
+
+def recall_at_k(
+    corpus_full: np.ndarray,
+    queries_full: np.ndarray,
+    projection: PCAProjection,
+    k: int = 10,
+) -> float:
+    """
+    以完整維度的 exact cosine top-k 為基準，計算投影後 top-k 的平均重疊率 (recall@k)。
+    """
+    def _normalize(m):
+        m = np.asarray(m, dtype=np.float32)
+        return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+    k = min(k, len(corpus_full))
+    full_scores = _normalize(queries_full) @ _normalize(corpus_full).T
+    proj_scores = projection.transform(queries_full) @ projection.transform(corpus_full).T
+
+    full_top = np.argpartition(-full_scores, k - 1, axis=1)[:, :k]
+    proj_top = np.argpartition(-proj_scores, k - 1, axis=1)[:, :k]
+    hits = [len(set(a).intersection(b)) for a, b in zip(full_top, proj_top)]
+    return float(np.mean(hits) / k)
@@ -1,6 +1,13 @@
 import os
+import math
+import time
 import asyncio
-from typing import List, Dict, Any, Union
+import itertools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Union, Optional, Sequence
+import numpy as np
 import ollama
 from collections import deque
 from dotenv import load_dotenv
@@ -15,6 +22,492 @@ load_dotenv()
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 ollama_client = ollama.Client(host=OLLAMA_HOST)
 
+# Query embedding: 每次呼叫的 deadline 與 hedged request 設定
+# OLLAMA_HEDGE_HOSTS 為額外的 Ollama 端點 (逗號分隔)，未設定時 hedge 會送往同一端點
+OLLAMA_HEDGE_HOSTS = [
+    h.strip() for h in os.getenv("OLLAMA_HEDGE_HOSTS", "").split(",") if h.strip()
+]
+EMBEDDING_QUERY_TIMEOUT = float(os.getenv("EMBEDDING_QUERY_TIMEOUT", 5))
+EMBEDDING_DOC_TIMEOUT = float(os.getenv("EMBEDDING_DOC_TIMEOUT", 120))
+EMBEDDING_HEDGE_MIN_DELAY = float(os.getenv("EMBEDDING_HEDGE_MIN_DELAY", 0.05))
+EMBEDDING_HEDGE_MIN_SAMPLES = 20  # 樣本數不足時，以 deadline 的一半作為 hedge 時機
+
+# Embedding backend configuration
+# ollama: 透過 HTTP 呼叫 Ollama (預設)
+# local:  在行程內以 sentence-transformers (ONNX Runtime / torch) 執行 bge-m3，適合 CPU-only 部署
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "ollama").lower()
+EMBEDDING_LOCAL_MODEL = os.getenv("EMBEDDING_LOCAL_MODEL", "BAAI/bge-m3")
+EMBEDDING_LOCAL_RUNTIME = os.getenv("EMBEDDING_LOCAL_RUNTIME", "onnx").lower()
+EMBEDDING_LOCAL_INT8 = os.getenv("EMBEDDING_LOCAL_INT8", "false").lower() == "true"
+EMBEDDING_LOCAL_ONNX_FILE = os.getenv("EMBEDDING_LOCAL_ONNX_FILE") or None
+EMBEDDING_LOCAL_BATCH_SIZE = int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", 16))
+EMBEDDING_LOCAL_THREADS = int(os.getenv("EMBEDDING_LOCAL_THREADS", 0)) or None
+EMBEDDING_LOCAL_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_LOCAL_MAX_SEQ_LENGTH", 8192))
+
+# export_dynamic_quantized_onnx_model 產出的預設檔名
+DEFAULT_INT8_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+class EmbeddingBackend:
+    """
+    Embedding 後端介面。
+    embed() 接收一批文字並回傳同順序的向量 (list 或 float32 ndarray)；in_process 表示是否在本行程內推論。
+    aembed() 為批次匯入使用的 async 版本，預設在 worker thread 中執行 embed()。
+    """
+
+    name = "base"
+    in_process = False
+
+    def embed(self, texts: List[str]) -> Union[List[List[float]], np.ndarray]:
+        raise NotImplementedError
+
+    async def aembed(
+        self, texts: List[str], model: Optional[str] = None, force_gpu: bool = True
+    ) -> Union[List[List[float]], np.ndarray]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OllamaBackend(EmbeddingBackend):
+    """透過 Ollama HTTP API 產生 embedding。"""
+
+    name = "ollama"
+    in_process = False
+
+    def __init__(self, host: str = OLLAMA_HOST, model: str = "bge-m3"):
+        self.host = host
+        self.model = model
+        self.client = ollama.Client(host=host)
+        # AsyncClient 的連線綁定 event loop，每個 loop 各建一個並共用連線
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embed(
+            model=self.model, input=texts, options={"num_ctx": 8192}
+        )
+        return list(response["embeddings"])
+
+    async def aembed(
+        self, texts: List[str], model: Optional[str] = None, force_gpu: bool = True
+    ) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            async_client = self._async_clients[loop] = ollama.AsyncClient(host=self.host)
+        response = await async_client.embed(
+            model=model or self.model,
+            input=texts,
+            options={"num_ctx": 8192, "num_gpu": 999 if force_gpu else 0},
+        )
+        embeddings = getattr(response, "embeddings", [])
+        if not embeddings and isinstance(response, dict):
+            embeddings = response.get("embeddings", [])
+        return list(embeddings)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    在行程內以 sentence-transformers 執行 embedding 模型。
+    runtime="onnx" 使用 ONNX Runtime (CPU)，runtime="torch" 使用 PyTorch。
+    quantize_int8=True 時：onnx 載入動態量化後的 ONNX 檔，torch 則對 Linear 層做動態 int8 量化。
+    """
+
+    name = "local"
+    in_process = True
+
+    def __init__(
+        self,
+        model_name_or_path: str = EMBEDDING_LOCAL_MODEL,
+        runtime: str = EMBEDDING_LOCAL_RUNTIME,
+        quantize_int8: bool = EMBEDDING_LOCAL_INT8,
+        onnx_file_name: Optional[str] = EMBEDDING_LOCAL_ONNX_FILE,
+        batch_size: int = EMBEDDING_LOCAL_BATCH_SIZE,
+        num_threads: Optional[int] = EMBEDDING_LOCAL_THREADS,
+        max_seq_length: int = EMBEDDING_LOCAL_MAX_SEQ_LENGTH,
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=local requires sentence-transformers "
+                "(pip install 'sentence-transformers[onnx]')"
+            ) from e
+
+        if runtime not in ("onnx", "torch"):
+            raise ValueError(f"Unsupported embedding runtime: {runtime}")
+
+        self.model_name_or_path = model_name_or_path
+        self.runtime = runtime
+        self.quantize_int8 = quantize_int8
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        # encode() 本身已使用多執行緒，串行化呼叫以避免 CPU 過度訂閱
+        self._lock = threading.Lock()
+
+        if runtime == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            file_name = onnx_file_name or (
+                DEFAULT_INT8_ONNX_FILE if quantize_int8 else None
+            )
+            if file_name:
+                model_kwargs["file_name"] = file_name
+            if num_threads:
+                import onnxruntime
+
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = num_threads
+                session_options.inter_op_num_threads = 1
+                model_kwargs["session_options"] = session_options
+            self.model = SentenceTransformer(
+                model_name_or_path,
+                device="cpu",
+                backend="onnx",
+                model_kwargs=model_kwargs,
+            )
+        else:
+            import torch
+
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            self.model = SentenceTransformer(model_name_or_path, device="cpu")
+            if quantize_int8:
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+
+        print(
+            f"✓ Local embedding backend ready: {model_name_or_path} "
+            f"(runtime={runtime}, int8={quantize_int8}, threads={num_threads or 'auto'})"
+        )
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return vectors.astype(np.float32, copy=False)
+
+
+def export_quantized_onnx(
+    model_name_or_path: str, quantization_config: str = "avx512_vnni"
+) -> str:
+    """
+    將本地模型匯出為動態 int8 量化的 ONNX 檔 (存放於模型目錄的 onnx/ 之下)，回傳檔名。
+    """
+    from sentence_transformers import (
+        SentenceTransformer,
+        export_dynamic_quantized_onnx_model,
+    )
+
+    model = SentenceTransformer(model_name_or_path, device="cpu", backend="onnx")
+    export_dynamic_quantized_onnx_model(
+        model, quantization_config, model_name_or_path
+    )
+    return f"onnx/model_qint8_{quantization_config}.onnx"
+
+
+class HedgedEmbeddingClient:
+    """
+    Query-time embedding client：每次呼叫都有 deadline，
+    當等待時間超過觀測到的 p95 延遲時，送出一個重複請求 (hedge) 到下一個端點，取最先完成者。
+    worker pool 已滿時不送 hedge (只會排在 pool 後面，還會拖慢其他請求)。
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        timeout: float = EMBEDDING_QUERY_TIMEOUT,
+        min_hedge_delay: float = EMBEDDING_HEDGE_MIN_DELAY,
+        window: int = 200,
+        max_workers: int = 16,
+    ):
+        self.hosts = hosts
+        self.timeout = timeout
+        self.min_hedge_delay = min_hedge_delay
+        self.max_workers = max_workers
+        # 依 (端點, deadline 秒數無條件進位) 快取 ollama.Client：被放棄的請求最多再佔用 worker 到 deadline
+        self._clients: Dict[tuple, ollama.Client] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="embed-hedge"
+        )
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "hedge_skipped": 0,
+            "cancelled": 0,
+            "abandoned": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+    def _incr(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    def hedge_delay(self, timeout: float) -> float:
+        with self._lock:
+            sample_count = len(self._latencies)
+        if sample_count < EMBEDDING_HEDGE_MIN_SAMPLES:
+            return max(self.min_hedge_delay, timeout / 2)
+        return max(self.min_hedge_delay, self._percentile(95))
+
+    def _client(self, client_idx: int, timeout: float) -> ollama.Client:
+        key = (client_idx, math.ceil(timeout))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = ollama.Client(
+                    host=self.hosts[client_idx], timeout=key[1]
+                )
+        return client
+
+    def _call(self, client_idx: int, model: str, text: str, timeout: float) -> List[float]:
+        response = self._client(client_idx, timeout).embed(
+            model=model, input=text, options={"num_ctx": 8192}
+        )
+        return response["embeddings"][0]
+
+    def _run(self, client_idx: int, model: str, text: str, timeout: float) -> List[float]:
+        try:
+            return self._call(client_idx, model, text, timeout)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _submit(self, client_idx: int, model: str, text: str, timeout: float):
+        with self._lock:
+            self._in_flight += 1
+        return self._executor.submit(self._run, client_idx, model, text, timeout)
+
+    def _saturated(self) -> bool:
+        with self._lock:
+            return self._in_flight >= self.max_workers
+
+    def embed(
+        self,
+        text: str,
+        model: str = "bge-m3",
+        timeout: Optional[float] = None,
+        hedge: bool = True,
+    ) -> List[float]:
+        timeout = timeout or self.timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        hedge_at = start + self.hedge_delay(timeout) if hedge else None
+        self._incr("requests")
+
+        primary_idx = next(self._round_robin) % len(self.hosts)
+        pending = {self._submit(primary_idx, model, text, timeout): False}
+        hedged = False
+        last_error = None
+        result = None
+        winner_is_hedge = False
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._incr("timeouts")
+                    raise TimeoutError(
+                        f"Query embedding exceeded deadline of {timeout:.2f}s"
+                    )
+                wait_until = deadline
+                if hedge_at and not hedged:
+                    wait_until = min(deadline, hedge_at)
+                done, _ = wait(
+                    pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED
+                )
+
+                for future in done:
+                    is_hedge = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        result = future.result()
+                        winner_is_hedge = is_hedge
+                        break
+                    last_error = error
+                    self._incr("errors")
+                if result is not None:
+                    break
+
+                # 主請求超過 p95 或已失敗時送出 hedge (最多一次)；pool 已滿時只等主請求
+                if hedge_at and not hedged and (
+                    time.monotonic() >= hedge_at or not pending
+                ):
+                    hedged = True
+                    if pending and self._saturated():
+                        self._incr("hedge_skipped")
+                        continue
+                    self._incr("hedged")
+                    hedge_idx = (primary_idx + 1) % len(self.hosts)
+                    remaining = max(deadline - time.monotonic(), 0.001)
+                    pending[self._submit(hedge_idx, model, text, remaining)] = True
+
+            if result is None:
+                raise last_error or RuntimeError("No embedding returned")
+        finally:
+            # 取消尚未開始的請求；已在執行的請求無法中斷，放棄結果並由 HTTP timeout 結束
+            cancelled = sum(1 for future in pending if future.cancel())
+            if cancelled:
+                # 取消的請求不會執行 _run，由這裡歸還 in-flight 名額
+                with self._lock:
+                    self._in_flight -= cancelled
+                self._incr("cancelled", cancelled)
+            if len(pending) > cancelled:
+                self._incr("abandoned", len(pending) - cancelled)
+
+        if winner_is_hedge:
+            self._incr("hedge_wins")
+        if hedge:
+            with self._lock:
+                self._latencies.append(time.monotonic() - start)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+        p50 = self._percentile(50)
+        p95 = self._percentile(95)
+        stats.update(
+            {
+                "hosts": self.hosts,
+                "timeout_s": self.timeout,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "hedge_delay_ms": round(self.hedge_delay(self.timeout) * 1000, 1),
+            }
+        )
+        return stats
+
+
+_query_embedding_client: Optional[HedgedEmbeddingClient] = None
+_query_embedding_client_lock = threading.Lock()
+
+
+def get_query_embedding_client() -> HedgedEmbeddingClient:
+    """取得行程共用的 hedged query embedding client。"""
+    global _query_embedding_client
+    if _query_embedding_client is None:
+        with _query_embedding_client_lock:
+            if _query_embedding_client is None:
+                _query_embedding_client = HedgedEmbeddingClient(
+                    [OLLAMA_HOST] + OLLAMA_HEDGE_HOSTS
+                )
+    return _query_embedding_client
+
+
+def get_query_embedding_stats() -> Dict[str, Any]:
+    """Query embedding 的 hedge / cancel / timeout 統計 (供調校使用)。"""
+    if _query_embedding_client is None:
+        return {}
+    return _query_embedding_client.get_stats()
+
+
+_embedding_backend: Optional[EmbeddingBackend] = None
+_embedding_backend_lock = threading.Lock()
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """依 EMBEDDING_BACKEND 延遲建立並快取目前行程使用的 embedding 後端。"""
+    global _embedding_backend
+    if _embedding_backend is None:
+        with _embedding_backend_lock:
+            if _embedding_backend is None:
+                if EMBEDDING_BACKEND == "local":
+                    _embedding_backend = SentenceTransformerBackend()
+                else:
+                    _embedding_backend = OllamaBackend()
+    return _embedding_backend
+
+
+def set_embedding_backend(backend: Optional[EmbeddingBackend]) -> None:
+    """替換目前使用的 embedding 後端 (測試或基準測試用)，傳入 None 則回到設定值。"""
+    global _embedding_backend
+    with _embedding_backend_lock:
+        _embedding_backend = backend
+
+
+async def _get_embeddings_batch_in_process(
+    backend: EmbeddingBackend,
+    texts: List[str],
+    model: str,
+    sub_batch_size: int,
+    max_retries: int,
+    out: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """
+    In-process 版本的批次 embedding：模型推論在 worker thread 中執行以免阻塞 event loop，
+    失敗時沿用 Ollama 路徑的策略，拆成單筆重試以隔離錯誤。
+    """
+    results = [None] * len(texts)
+    task_queue = deque(
+        (i, texts[i : i + sub_batch_size], 0)
+        for i in range(0, len(texts), sub_batch_size)
+    )
+
+    while task_queue:
+        start_idx, chunk_texts, retry_count = task_queue.popleft()
+        try:
+            cleaned_texts = [t.replace("\n", " ") for t in chunk_texts]
+            embeddings = await asyncio.to_thread(backend.embed, cleaned_texts)
+            for i, emb in enumerate(embeddings[: len(chunk_texts)]):
+                results[start_idx + i] = {
+                    "status": "success",
+                    "result": _store_row(out, start_idx + i, emb),
+                }
+            for i in range(len(chunk_texts)):
+                if results[start_idx + i] is None:
+                    results[start_idx + i] = {
+                        "status": "failed",
+                        "error": "No embedding returned",
+                        "stage": "embedding_generation",
+                    }
+        except Exception as e:
+            if len(chunk_texts) > 1:
+                for i, t in enumerate(chunk_texts):
+                    task_queue.append((start_idx + i, [t], retry_count))
+                continue
+
+            if retry_count < max_retries:
+                task_queue.append((start_idx, chunk_texts, retry_count + 1))
+                continue
+
+            t = chunk_texts[0]
+            logger.error(
+                f"Embedding Failed at Index [{start_idx}] | Backend: {backend.name} | Error: {str(e)}"
+            )
+            results[start_idx] = {
+                "status": "failed",
+                "error": str(e),
+                "text_preview": t[:100],
+                "stage": "embedding_generation",
+            }
+            LogManager.log_embedding(text=t, error=str(e), model=model, index=start_idx)
+
+    return results
+
 
 async def get_embeddings_batch(
     texts: List[str],
@@ -23,16 +516,28 @@ async def get_embeddings_batch(
     max_concurrency: int = 4,
     force_gpu: bool = True,
     max_retries: int = 3,
+    out: Optional[np.ndarray] = None,
 ) -> List[Dict[str, Any]]:
     """
     Generate embeddings for a list of texts using sub-batching and high concurrency.
     Includes retry logic: if a batch fails, it's decomposed into individual items
     and added back to the queue to isolate the error.
+    Sub-batches are sent through the configured embedding backend (get_embedding_backend);
+    in-process backends run sequentially, remote backends (Ollama) run concurrently via aembed().
+    If `out` (a preallocated float32 matrix of shape (len(texts), dims)) is given, vectors are
+    written into it in place and each successful "result" is a row view of that buffer.
     """
     if not texts:
         return []
+    if out is not None and out.shape[0] != len(texts):
+        raise ValueError(f"Output buffer has {out.shape[0]} rows for {len(texts)} texts")
+
+    backend = get_embedding_backend()
+    if backend.in_process:
+        return await _get_embeddings_batch_in_process(
+            backend, texts, model, sub_batch_size, max_retries, out
+        )
 
-    async_client = ollama.AsyncClient(host=OLLAMA_HOST)
     results = [None] * len(texts)
 
     # Task queue: (start_index, list_of_texts, current_retry_count)
@@ -50,23 +555,17 @@ async def get_embeddings_batch(
         async with semaphore:
             try:
                 cleaned_texts = [t.replace("\n", " ") for t in chunk_texts]
-                response = await async_client.embed(
-                    model=model,
-                    input=cleaned_texts,
-                    options={
-                        "num_ctx": 8192,
-                        "num_gpu": 999 if force_gpu else 0,
-                    },
+                embeddings = await backend.aembed(
+                    cleaned_texts, model=model, force_gpu=force_gpu
                 )
 
-                embeddings = getattr(response, "embeddings", [])
-                if not embeddings and isinstance(response, dict):
-                    embeddings = response.get("embeddings", [])
-
                 for i, emb in enumerate(embeddings):
                     if i < len(chunk_texts):
                         idx = start_idx + i
-                        results[idx] = {"status": "success", "result": emb}
+                        results[idx] = {
+                            "status": "success",
+                            "result": _store_row(out, idx, emb),
+                        }
 
                 # Completion check
                 for i in range(len(chunk_texts)):
@@ -118,24 +617,57 @@ async def get_embeddings_batch(
     return results
 
 
-def get_embedding(text: str, model: str = "bge-m3") -> Dict[str, Any]:
+def get_embedding(
+    text: str,
+    model: str = "bge-m3",
+    timeout: Optional[float] = None,
+    hedge: bool = True,
+) -> Dict[str, Any]:
     """
-    Original sync function for compatibility.
+    Sync single-text embedding used at query time.
+    Ollama calls go through the hedged client with a per-call deadline
+    (timeout defaults to EMBEDDING_QUERY_TIMEOUT); pass hedge=False for long document texts.
     """
     try:
         text = text.replace("\n", " ")
 
-        response = ollama_client.embeddings(
-            model=model,
-            prompt=text,
-            options={"num_ctx": 8192},
+        backend = get_embedding_backend()
+        if backend.in_process:
+            vector = backend.embed([text])[0]
+            if isinstance(vector, np.ndarray):
+                vector = vector.tolist()
+            return {"status": "success", "result": vector}
+
+        vector = get_query_embedding_client().embed(
+            text, model=model, timeout=timeout, hedge=hedge
         )
-        return {"status": "success", "result": response["embedding"]}
+        return {"status": "success", "result": vector}
     except Exception as e:
         error_info = {
             "status": "failed",
-            "error": f"Error generating embedding from {OLLAMA_HOST}: {str(e)}",
+            "error": f"Error generating embedding from {_backend_label()}: {str(e)}",
             "stage": "embedding_generation",
         }
         LogManager.log_embedding(text=text, error=str(e), model=model)
         return error_info
+
+
+def _store_row(
+    out: Optional[np.ndarray], idx: int, vector: Sequence[float]
+) -> Union[Sequence[float], np.ndarray]:
+    """將向量寫入預先配置的 float32 矩陣並回傳該列 (view)；未提供 out 時原樣回傳。"""
+    if out is None:
+        return vector
+    if len(vector) != out.shape[1]:
+        raise ValueError(
+            f"Embedding has {len(vector)} dims, buffer expects {out.shape[1]}"
+        )
+    out[idx] = vector
+    return out[idx]
+
+
+def _backend_label() -> str:
+    backend = _embedding_backend
+    if backend is not None and backend.in_process:
+        return f"local model {getattr(backend, 'model_name_or_path', backend.name)}"
+    return OLLAMA_HOST
@@ -2,12 +2,35 @@ import os
 import json
 import sys
 import datetime
-from typing import Type, TypeVar, List, Dict, Any
-from openai import AzureOpenAI, APIError, APIStatusError
+import asyncio
+import threading
+import weakref
+import time
+from typing import Type, TypeVar, List, Dict, Any, Generator, Optional
+import httpx
+from openai import (
+    APITimeoutError,
+    RateLimitError,
+    AzureOpenAI,
+    AsyncAzureOpenAI,
+    APIError,
+    APIStatusError,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+)
 from dotenv import load_dotenv
 from pydantic import BaseModel, ValidationError
 from src.tool.ANSI import print_red
 from src.log.logManager import LogManager
+from src.llm.stream_parser import IncrementalJSONFieldParser
+from src.llm.response_cache import get_response_cache, make_cache_key
+from src.llm.router import get_model_router
+from src.llm.telemetry import get_llm_telemetry, stage_from_response_format, usage_to_dict
+from src.llm.scheduler import (
+    LLMUnavailableError,
+    estimate_request_tokens,
+    get_llm_scheduler,
+)
 
 load_dotenv()
 
@@ -17,6 +40,109 @@ if project_root not in sys.path:
 
 T = TypeVar("T", bound=BaseModel)
 
+# 連線池設定：所有 LLMClient 共用同一組 HTTP 連線，避免每個請求重新建立 TLS 連線
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 30))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 60))
+
+_shared_clients: Dict[tuple, AzureOpenAI] = {}
+# httpx.AsyncClient 綁定建立時的 event loop，因此 async client 依 loop 分別快取
+_shared_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncAzureOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def get_shared_client(endpoint: str, api_key: str, api_version: str) -> AzureOpenAI:
+    """取得行程共用的同步 AzureOpenAI client (httpx.Client 可跨執行緒使用)。"""
+    key = (endpoint, api_key, api_version)
+    client = _shared_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                client = AzureOpenAI(
+                    azure_endpoint=endpoint,
+                    api_key=api_key,
+                    api_version=api_version,
+                    timeout=_http_timeout(),
+                    max_retries=0,  # 重試由 LLMScheduler 統一處理 (含 429 退避與熔斷)
+                    http_client=DefaultHttpxClient(limits=_http_limits()),
+                )
+                _shared_clients[key] = client
+                print(
+                    f"✓ Created shared Azure OpenAI client (pool={LLM_MAX_CONNECTIONS}, "
+                    f"keepalive={LLM_MAX_KEEPALIVE_CONNECTIONS})"
+                )
+    return client
+
+
+def get_shared_async_client(
+    endpoint: str, api_key: str, api_version: str
+) -> AsyncAzureOpenAI:
+    """取得目前 event loop 共用的 AsyncAzureOpenAI client；必須在 running loop 中呼叫。"""
+    loop = asyncio.get_running_loop()
+    key = (endpoint, api_key, api_version)
+    with _clients_lock:
+        clients = _shared_async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncAzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                timeout=_http_timeout(),
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+            )
+            clients[key] = client
+    return client
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """串流輸出超過呼叫端的時間預算 (httpx 的 timeout 只限制單次讀取，無法限制整個串流)"""
+
+
+def _min_timeout(*timeouts: Optional[float]) -> Optional[float]:
+    values = [t for t in timeouts if t is not None]
+    return min(values) if values else None
+
+
+def _is_capped_timeout(timeout: Optional[float]) -> bool:
+    """timeout 是否被呼叫端縮短到低於伺服器端預設值 (此類逾時不計入熔斷)"""
+    return timeout is not None and timeout < LLM_REQUEST_TIMEOUT
+
+
+def _time_left(end: Optional[float]) -> Optional[float]:
+    return max(0.5, end - time.monotonic()) if end is not None else None
+
+
+def _call_outcome(error: Optional[Exception]) -> str:
+    """telemetry 用的呼叫結果分類"""
+    if error is None:
+        return "success"
+    if isinstance(error, (APITimeoutError, LLMDeadlineExceeded)):
+        return "timeout"
+    if isinstance(error, RateLimitError):
+        return "rate_limited"
+    if isinstance(error, LLMUnavailableError):
+        return "unavailable"
+    return "error"
+
 
 class LLMClient:
     def __init__(
@@ -42,11 +168,14 @@ class LLMClient:
         if not self.api_key:
             print_red("Warning: PROXY_API_KEY not found in environment variables.")
 
-        self.client = AzureOpenAI(
-            azure_endpoint=self.endpoint,
-            api_key=self.api_key,
-            api_version=self.api_version,
-        )
+        self.client = get_shared_client(self.endpoint, self.api_key, self.api_version)
+        self.scheduler = get_llm_scheduler()
+        self.router = get_model_router()
+
+    @property
+    def aclient(self) -> AsyncAzureOpenAI:
+        """目前 event loop 的共用 async client"""
+        return get_shared_async_client(self.endpoint, self.api_key, self.api_version)
 
     def _add_additional_properties(self, schema: dict) -> dict:
         if isinstance(schema, dict):
@@ -67,6 +196,7 @@ class LLMClient:
         temperature: float,
         response_format: dict,
         model: str,
+        telemetry: Optional[Dict[str, Any]] = None,
     ):
         LogManager.log_client(
             messages=messages,
@@ -74,94 +204,439 @@ class LLMClient:
             temperature=temperature,
             response_format=response_format,
             model=model or self.model,
+            telemetry=telemetry,
         )
 
-    def call_gemini(
+    def _record_call(
+        self,
+        response_format: dict,
+        model: str,
+        start: float,
+        call_stats: Dict[str, Any],
+        error: Optional[Exception],
+        ttfb: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """彙總單次呼叫的延遲 / usage / 重試次數到 telemetry，並回傳寫入 client log 的摘要"""
+        latency = time.perf_counter() - start
+        usage = call_stats.get("usage") or {}
+        stage = stage_from_response_format(response_format)
+        outcome = _call_outcome(error)
+        get_llm_telemetry().record(
+            stage,
+            model,
+            latency,
+            outcome,
+            # 非串流呼叫在完整回應後才返回，TTFB 即總延遲
+            ttfb=latency if ttfb is None and error is None else ttfb,
+            usage=usage,
+            attempts=call_stats.get("attempts", 1),
+        )
+        if usage:
+            print(
+                f"  Prompt tokens: {usage['prompt_tokens']} (cached {usage['cached_tokens']}), "
+                f"completion {usage['completion_tokens']}, {latency:.2f}s [{stage} @ {model}]"
+            )
+        return {
+            "stage": stage,
+            "outcome": outcome,
+            "latency_ms": round(latency * 1000, 1),
+            "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+            "attempts": call_stats.get("attempts"),
+            "queue_wait_ms": round(call_stats.get("queue_wait", 0.0) * 1000, 1),
+            "usage": usage or None,
+        }
+
+    def _create_completion(self, call_stats: Optional[Dict[str, Any]] = None, **kwargs):
+        """
+        經由 scheduler 送出請求：RPM/TPM 排隊、429/5xx 退避重試、熔斷。錯誤會直接拋出。
+        call_stats 會寫入 attempts / queue_wait 與 (非串流時) usage。
+        """
+        call_stats = call_stats if call_stats is not None else {}
+        estimated = estimate_request_tokens(kwargs["messages"])
+        raw = self.scheduler.execute(
+            lambda: self.client.chat.completions.with_raw_response.create(**kwargs),
+            estimated,
+            stats=call_stats,
+            timeout_capped=_is_capped_timeout(kwargs.get("timeout")),
+        )
+        response = raw.parse()
+        if not kwargs.get("stream"):
+            usage = getattr(response, "usage", None)
+            self.scheduler.record_usage(estimated, getattr(usage, "total_tokens", None))
+            call_stats["usage"] = usage_to_dict(usage)
+        return response
+
+    async def _acreate_completion(
+        self, call_stats: Optional[Dict[str, Any]] = None, **kwargs
+    ):
+        call_stats = call_stats if call_stats is not None else {}
+        estimated = estimate_request_tokens(kwargs["messages"])
+        aclient = self.aclient
+        raw = await self.scheduler.aexecute(
+            lambda: aclient.chat.completions.with_raw_response.create(**kwargs),
+            estimated,
+            stats=call_stats,
+            timeout_capped=_is_capped_timeout(kwargs.get("timeout")),
+        )
+        response = raw.parse()
+        usage = getattr(response, "usage", None)
+        self.scheduler.record_usage(estimated, getattr(usage, "total_tokens", None))
+        call_stats["usage"] = usage_to_dict(usage)
+        return response
+
+    def _call_text(
         self,
         messages: list,
-        temperature: float = 0.0,
-        response_format: dict = None,
-        model: str = None,
-    ) -> str:
+        temperature: float,
+        response_format: dict,
+        model: str,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        """回傳 (content, error)；error 為 None 表示呼叫成功"""
         response_content = None
+        error = None
+        call_stats: Dict[str, Any] = {}
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            kwargs = {}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            response = self._create_completion(
+                call_stats=call_stats,
                 model=model or self.model,
                 messages=messages,
                 temperature=temperature,
                 stream=False,
                 response_format=response_format,
+                **kwargs,
             )
             response_content = response.choices[0].message.content
         except Exception as e:
             print_red(f"Error calling LLM: {e}")
-            response_content = None
+            error = e
 
+        telemetry = self._record_call(
+            response_format, model or self.model, start, call_stats, error
+        )
         self._log_request(
-            messages, response_content, temperature, response_format, model
+            messages, response_content, temperature, response_format, model, telemetry
         )
+        return response_content, error
 
+    def _call_routed(
+        self,
+        stage: str,
+        messages: list,
+        temperature: float,
+        response_format: dict,
+        model: str = None,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        """
+        依 stage 的路由表呼叫：偏好的 deployment 以延遲預算為 timeout，逾時改用 fallback。
+        明確指定 model 時不做路由。timeout 為呼叫端的剩餘時間，受其限制而逾時的呼叫不再改用 fallback。
+        """
+        if model:
+            return self._call_text(
+                messages, temperature, response_format, model, timeout=timeout
+            )
+
+        for deployment, budget in self.router.plan(stage, self.model):
+            call_timeout = _min_timeout(budget, timeout)
+            start = time.perf_counter()
+            text, error = self._call_text(
+                messages, temperature, response_format, deployment, timeout=call_timeout
+            )
+            outcome = self._route_outcome(
+                error, budget if call_timeout == budget else None
+            )
+            self.router.record(stage, deployment, time.perf_counter() - start, outcome)
+            if outcome != "budget_exceeded":
+                break
+            print_red(
+                f"{stage}: {deployment} exceeded {budget:.1f}s budget, falling back"
+            )
+        return text, error
+
+    async def _acall_routed(
+        self,
+        stage: str,
+        messages: list,
+        temperature: float,
+        response_format: dict,
+        model: str = None,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        if model:
+            return await self._acall_text(
+                messages, temperature, response_format, model, timeout=timeout
+            )
+
+        for deployment, budget in self.router.plan(stage, self.model):
+            call_timeout = _min_timeout(budget, timeout)
+            start = time.perf_counter()
+            text, error = await self._acall_text(
+                messages, temperature, response_format, deployment, timeout=call_timeout
+            )
+            outcome = self._route_outcome(
+                error, budget if call_timeout == budget else None
+            )
+            self.router.record(stage, deployment, time.perf_counter() - start, outcome)
+            if outcome != "budget_exceeded":
+                break
+            print_red(
+                f"{stage}: {deployment} exceeded {budget:.1f}s budget, falling back"
+            )
+        return text, error
+
+    def _route_outcome(self, error: Optional[Exception], timeout: Optional[float]) -> str:
+        if error is None:
+            return "success"
+        if timeout is not None and isinstance(error, APITimeoutError):
+            return "budget_exceeded"
+        return "error"
+
+    def call_gemini(
+        self,
+        messages: list,
+        temperature: float = 0.0,
+        response_format: dict = None,
+        model: str = None,
+    ) -> str:
+        response_content, _ = self._call_text(
+            messages, temperature, response_format, model
+        )
         return response_content
 
-    def call_with_schema(
+    def stream_gemini(
+        self,
+        messages: list,
+        temperature: float = 0.0,
+        response_format: dict = None,
+        model: str = None,
+        timeout: Optional[float] = None,
+    ) -> Generator[str, None, None]:
+        """
+        串流版本的 call_gemini：逐段 yield 模型輸出的文字。
+        與 call_gemini 不同，錯誤會直接拋出，由呼叫端決定是否退回非串流呼叫。
+        timeout 為整個串流的時間預算：超過時關閉串流並拋出 LLMDeadlineExceeded。
+        """
+        parts = []
+        call_stats: Dict[str, Any] = {}
+        start = time.perf_counter()
+        end = time.monotonic() + timeout if timeout is not None else None
+        ttfb = None
+        error = None
+        stream = None
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        try:
+            stream = self._create_completion(
+                call_stats=call_stats,
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                response_format=response_format,
+                **kwargs,
+            )
+            for chunk in stream:
+                if end is not None and time.monotonic() >= end:
+                    raise LLMDeadlineExceeded(
+                        f"LLM stream exceeded {timeout:.1f}s deadline"
+                    )
+                if not chunk.choices:
+                    # include_usage 時最後一個 chunk 只帶 usage
+                    call_stats["usage"] = usage_to_dict(getattr(chunk, "usage", None))
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                # 提前結束 (逾時或呼叫端停止讀取) 時釋放連線
+                stream.close()
+            telemetry = self._record_call(
+                response_format, model or self.model, start, call_stats, error, ttfb=ttfb
+            )
+            self._log_request(
+                messages,
+                "".join(parts) or None,
+                temperature,
+                response_format,
+                model,
+                telemetry,
+            )
+
+    def stream_with_schema(
         self,
         messages: list,
         response_model: Type[T],
         temperature: float = 0.0,
         model: str = None,
         max_retries: int = 1,
-    ) -> Dict[str, Any]:
-        schema = response_model.model_json_schema()
+        timeout: Optional[float] = None,
+    ) -> Generator[tuple, None, Dict[str, Any]]:
+        """
+        串流版本的 call_with_schema。
+        逐段 yield IncrementalJSONFieldParser 的事件 ("delta" / "done", field, text)，
+        generator 的回傳值與 call_with_schema 相同 (以 `yield from` 取得)。
+        串流或驗證失敗時退回 call_with_schema，以其結果為準。
+        """
         schema_name = response_model.__name__
+        response_format = self._schema_response_format(response_model)
+
+        # 串流一旦開始輸出就無法改換模型，因此只使用偏好的 deployment 並記錄延遲
+        deployment = model or self.router.preferred(schema_name, self.model)
+        parser = IncrementalJSONFieldParser()
+        parts = []
+        start = time.perf_counter()
+        try:
+            for delta in self.stream_gemini(
+                messages=messages,
+                temperature=temperature,
+                response_format=response_format,
+                model=deployment,
+                timeout=timeout,
+            ):
+                parts.append(delta)
+                yield from parser.feed(delta)
 
-        schema = self._add_additional_properties(schema)
+            clean_text = "".join(parts).strip().replace("【", "[").replace("】", "]")
+            validated = response_model.model_validate(json.loads(clean_text))
+            print(f"✓ Schema 驗證成功 ({schema_name}, streamed)")
+            self.router.record(
+                schema_name, deployment, time.perf_counter() - start, "success"
+            )
+            return {"status": "success", "result": validated}
+        except LLMDeadlineExceeded as e:
+            # 時間預算已用完，不再退回非串流呼叫；由呼叫端走降級路徑
+            print_red(f"{schema_name}: {e}")
+            return {
+                "status": "failed",
+                "error": str(e),
+                "stage": "llm_deadline",
+            }
+        except (json.JSONDecodeError, ValidationError) as e:
+            print_red(f"串流結果解析失敗，改用非串流呼叫: {e}")
+            get_llm_telemetry().count(schema_name, "invalid_response")
+        except Exception as e:
+            print_red(f"Error streaming LLM, falling back to non-streaming call: {e}")
+        elapsed = time.perf_counter() - start
+        self.router.record(schema_name, deployment, elapsed, "error")
 
-        response_format = {
+        return self.call_with_schema(
+            messages=messages,
+            response_model=response_model,
+            temperature=temperature,
+            model=model,
+            max_retries=max_retries,
+            timeout=max(0.5, timeout - elapsed) if timeout is not None else None,
+        )
+
+    def _schema_response_format(self, response_model: Type[T]) -> dict:
+        schema = self._add_additional_properties(response_model.model_json_schema())
+        return {
             "type": "json_schema",
-            "json_schema": {"name": schema_name, "strict": True, "schema": schema},
+            "json_schema": {
+                "name": response_model.__name__,
+                "strict": True,
+                "schema": schema,
+            },
         }
 
-        for attempt in range(max_retries + 1):
-            try:
-                response_text = self.call_gemini(
-                    messages=messages,
-                    temperature=temperature,
-                    response_format=response_format,
-                    model=model,
-                )
+    def _parse_schema_response(
+        self, response_text: str, response_model: Type[T], attempt: int
+    ) -> Optional[Dict[str, Any]]:
+        """解析並驗證 LLM 回傳的 JSON；失敗時回傳 None 讓呼叫端重試。"""
+        schema_name = response_model.__name__
+        try:
+            if not response_text:
+                print_red(f"Empty response from LLM (attempt {attempt + 1})")
+                get_llm_telemetry().count(schema_name, "invalid_response")
+                return None
 
-                if not response_text:
-                    print_red(f"Empty response from LLM (attempt {attempt + 1})")
-                    continue
+            clean_text = response_text.strip()
+            if clean_text.startswith("```json"):
+                clean_text = clean_text[7:]
+            if clean_text.startswith("```"):
+                clean_text = clean_text[3:]
+            if clean_text.endswith("```"):
+                clean_text = clean_text[:-3]
+            clean_text = clean_text.strip()
+            # Normalize full-width brackets to half-width to ensure citations are correctly formatted
+            clean_text = clean_text.replace("【", "[").replace("】", "]")
 
-                clean_text = response_text.strip()
-                if clean_text.startswith("```json"):
-                    clean_text = clean_text[7:]
-                if clean_text.startswith("```"):
-                    clean_text = clean_text[3:]
-                if clean_text.endswith("```"):
-                    clean_text = clean_text[:-3]
-                clean_text = clean_text.strip()
-                # Normalize full-width brackets to half-width to ensure citations are correctly formatted
-                clean_text = clean_text.replace("【", "[").replace("】", "]")
-
-                data = json.loads(clean_text)
-                validated = response_model.model_validate(data)
-
-                print(f"✓ Schema 驗證成功 ({schema_name})")
-                return {"status": "success", "result": validated}
-
-            except json.JSONDecodeError as e:
-                print_red(f"JSON 解析錯誤 (attempt {attempt + 1}): {e}")
-                print_red(f"Raw text: {response_text[:200]}...")
-            except ValidationError as e:
-                print_red(f"Pydantic 驗證錯誤 (attempt {attempt + 1}): {e}")
-            except Exception as e:
-                print_red(f"未預期的錯誤 (attempt {attempt + 1}): {e}")
+            data = json.loads(clean_text)
+            validated = response_model.model_validate(data)
 
-            if attempt < max_retries:
-                print(f"重試中... ({attempt + 1}/{max_retries})")
+            print(f"✓ Schema 驗證成功 ({schema_name})")
+            return {"status": "success", "result": validated}
+
+        except json.JSONDecodeError as e:
+            get_llm_telemetry().count(schema_name, "invalid_response")
+            print_red(f"JSON 解析錯誤 (attempt {attempt + 1}): {e}")
+            print_red(f"Raw text: {response_text[:200]}...")
+        except ValidationError as e:
+            get_llm_telemetry().count(schema_name, "invalid_response")
+            print_red(f"Pydantic 驗證錯誤 (attempt {attempt + 1}): {e}")
+        except Exception as e:
+            print_red(f"未預期的錯誤 (attempt {attempt + 1}): {e}")
+        return None
+
+    def _cache_lookup(
+        self,
+        messages: list,
+        response_model: Type[T],
+        response_format: dict,
+        temperature: float,
+        model: str,
+    ) -> tuple:
+        """
+        只有 temperature 0 的呼叫是決定性的，才使用快取。
+        回傳 (cache_key, 命中結果)；不適用快取時 cache_key 為 None。
+        """
+        cache = get_response_cache()
+        if cache is None or temperature != 0:
+            return None, None
+        key = make_cache_key(model or self.model, messages, response_format, temperature)
+        value = cache.get(key, response_model)
+        if value is None:
+            return key, None
+        print(f"✓ LLM cache hit ({response_model.__name__})")
+        get_llm_telemetry().count(response_model.__name__, "cache_hit")
+        return key, {"status": "success", "result": value, "cached": True}
+
+    def _cache_store(self, cache_key: Optional[str], result: Dict[str, Any]) -> None:
+        if cache_key is not None:
+            get_response_cache().set(cache_key, result["result"])
 
+    def _unavailable_failure(self) -> Dict[str, Any]:
+        return {
+            "status": "failed",
+            "error": "LLM temporarily unavailable (circuit open or rate limited)",
+            "stage": "llm_unavailable",
+        }
+
+    def _request_failure(self, error: Exception) -> Dict[str, Any]:
+        """請求層級的錯誤已由 scheduler 退避重試過，這裡不再重送"""
+        if isinstance(error, LLMUnavailableError):
+            return self._unavailable_failure()
+        return {
+            "status": "failed",
+            "error": f"LLM request failed: {error}",
+            "stage": "llm_request",
+        }
+
+    def _schema_failure(self, max_retries: int) -> Dict[str, Any]:
         print_red(f"✗ Schema 驗證失敗，已達最大重試次數")
         return {
             "status": "failed",
@@ -169,6 +644,151 @@ class LLMClient:
             "stage": "llm_schema_validation",
         }
 
+    def call_with_schema(
+        self,
+        messages: list,
+        response_model: Type[T],
+        temperature: float = 0.0,
+        model: str = None,
+        max_retries: int = 1,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        結構化輸出呼叫。timeout 為呼叫端的總時間預算 (秒)，涵蓋 schema 驗證失敗後的重試。
+        """
+        response_format = self._schema_response_format(response_model)
+        end = time.monotonic() + timeout if timeout is not None else None
+
+        stage = response_model.__name__
+        cache_key, cached = self._cache_lookup(
+            messages,
+            response_model,
+            response_format,
+            temperature,
+            model or self.router.preferred(stage, self.model),
+        )
+        if cached is not None:
+            return cached
+
+        if not self.scheduler.available():
+            get_llm_telemetry().count(stage, "unavailable")
+            return self._unavailable_failure()
+
+        for attempt in range(max_retries + 1):
+            response_text, error = self._call_routed(
+                stage, messages, temperature, response_format, model, _time_left(end)
+            )
+            if error is not None:
+                return self._request_failure(error)
+            result = self._parse_schema_response(response_text, response_model, attempt)
+            if result is not None:
+                self._cache_store(cache_key, result)
+                return result
+
+            if attempt < max_retries:
+                if end is not None and time.monotonic() >= end:
+                    break
+                print(f"重試中... ({attempt + 1}/{max_retries})")
+
+        return self._schema_failure(max_retries)
+
+    async def _acall_text(
+        self,
+        messages: list,
+        temperature: float,
+        response_format: dict,
+        model: str,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        response_content = None
+        error = None
+        call_stats: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            kwargs = {}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            response = await self._acreate_completion(
+                call_stats=call_stats,
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=False,
+                response_format=response_format,
+                **kwargs,
+            )
+            response_content = response.choices[0].message.content
+        except Exception as e:
+            print_red(f"Error calling LLM: {e}")
+            error = e
+
+        telemetry = self._record_call(
+            response_format, model or self.model, start, call_stats, error
+        )
+        self._log_request(
+            messages, response_content, temperature, response_format, model, telemetry
+        )
+        return response_content, error
+
+    async def acall_gemini(
+        self,
+        messages: list,
+        temperature: float = 0.0,
+        response_format: dict = None,
+        model: str = None,
+    ) -> str:
+        """call_gemini 的 async 版本，使用行程共用的 AsyncAzureOpenAI 連線池。"""
+        response_content, _ = await self._acall_text(
+            messages, temperature, response_format, model
+        )
+        return response_content
+
+    async def acall_with_schema(
+        self,
+        messages: list,
+        response_model: Type[T],
+        temperature: float = 0.0,
+        model: str = None,
+        max_retries: int = 1,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """call_with_schema 的 async 版本，回傳格式相同。"""
+        response_format = self._schema_response_format(response_model)
+        end = time.monotonic() + timeout if timeout is not None else None
+
+        stage = response_model.__name__
+        cache_key, cached = self._cache_lookup(
+            messages,
+            response_model,
+            response_format,
+            temperature,
+            model or self.router.preferred(stage, self.model),
+        )
+        if cached is not None:
+            return cached
+
+        if not self.scheduler.available():
+            get_llm_telemetry().count(stage, "unavailable")
+            return self._unavailable_failure()
+
+        for attempt in range(max_retries + 1):
+            response_text, error = await self._acall_routed(
+                stage, messages, temperature, response_format, model, _time_left(end)
+            )
+            if error is not None:
+                return self._request_failure(error)
+            result = self._parse_schema_response(response_text, response_model, attempt)
+            if result is not None:
+                self._cache_store(cache_key, result)
+                return result
+
+            if attempt < max_retries:
+                if end is not None and time.monotonic() >= end:
+                    break
+                print(f"重試中... ({attempt + 1}/{max_retries})")
+
+        return self._schema_failure(max_retries)
+
 
 if __name__ == "__main__":
     client = LLMClient()
@@ -0,0 +1,28 @@
+from src.llm.prompts.summary import SUMMARY_SYSTEM_INSTRUCTION, SUMMARY_USER_TEMPLATE
+
+RELEVANCE_SUMMARY_SYSTEM_INSTRUCTION = (
+    """# 任務概要 (Overview)
+你需要在一次回應中完成兩件事：先判斷搜尋結果是否足以回答使用者的問題，足以回答時再產生公告總結。
+
+# 第一步：相關性判斷 (decision / relevant / search_direction)
+以下任一情況成立時，"relevant" 必須為 false：
+1. 搜尋結果只有主題的一般性資訊，缺少使用者要求的具體答案或細節。
+2. 搜尋結果與查詢的核心意圖無關或離題。
+3. 查詢要求具體的數據、技術細節或事件，但搜尋結果中沒有。
+4. 搜尋結果只是高層次的摘要或入口頁面，沒有實質內容。
+
+- "decision"：以**繁體中文** 10-20 字說明判斷理由。
+- "search_direction"：relevant 為 false 時，提供具體、可執行的**繁體中文**搜尋方向，補足缺少的資訊；relevant 為 true 時輸出空字串 ("")。
+- 查詢無意義 (過短、僅打招呼) 時視為 relevant = true，並依下方總結指令引導使用者。
+
+# 第二步：總結 (brief_answer / detailed_answer / general_summary)
+- relevant 為 false 時，三個欄位一律輸出空字串 ("")，不要產生任何總結內容。
+- relevant 為 true 時，依照以下總結指令產生內容。
+
+---
+
+"""
+    + SUMMARY_SYSTEM_INSTRUCTION
+)
+
+RELEVANCE_SUMMARY_USER_TEMPLATE = SUMMARY_USER_TEMPLATE
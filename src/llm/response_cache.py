@@ -0,0 +1,183 @@
+"""
+Content-addressed cache for deterministic (temperature 0) structured LLM calls.
+
+Key = sha256(model, messages, response_format, temperature)。
+- 記憶體層：LRU，存放驗證後的 pydantic 物件 (取出時回傳 deep copy，避免呼叫端修改到快取內容)
+- 磁碟層 (選用)：LLM_CACHE_DIR 設定時啟用，以 JSON 存放 model_dump() 與到期時間
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from src.tool.ANSI import print_red
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1024))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")  # 留空 = 不使用磁碟層
+
+
+def make_cache_key(
+    model: str, messages: list, response_format: Optional[dict], temperature: float
+) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "response_format": response_format,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL,
+        disk_dir: Optional[str] = LLM_CACHE_DIR,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, BaseModel]]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, key: str, response_model: Type[BaseModel]) -> Optional[BaseModel]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now and isinstance(value, response_model):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value.model_copy(deep=True)
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+        value = self._disk_get(key, response_model, now)
+        if value is not None:
+            self._count("disk_hits")
+            return value.model_copy(deep=True)
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: BaseModel) -> None:
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, expires_at, value.model_copy(deep=True))
+        self._count("stores")
+        self._disk_set(key, expires_at, value)
+
+    def _memory_set(self, key: str, expires_at: float, value: BaseModel) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # --- disk tier ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(
+        self, key: str, response_model: Type[BaseModel], now: float
+    ) -> Optional[BaseModel]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print_red(f"LLM cache read failed ({path}): {e}")
+            return None
+
+        if record.get("expires_at", 0) <= now or record.get("schema") != response_model.__name__:
+            self._count("expired")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            value = response_model.model_validate(record["data"])
+        except (KeyError, ValidationError):
+            return None
+        self._memory_set(key, record["expires_at"], value)
+        return value
+
+    def _disk_set(self, key: str, expires_at: float, value: BaseModel) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "expires_at": expires_at,
+                        "schema": type(value).__name__,
+                        "data": value.model_dump(),
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print_red(f"LLM cache write failed ({path}): {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else None
+        )
+        stats["disk_enabled"] = bool(self.disk_dir)
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """行程共用的快取；LLM_CACHE_ENABLED=false 時回傳 None"""
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,149 @@
+"""
+Per-stage model routing with latency budgets.
+
+每個 LLM 階段 (以 response_model 名稱識別) 對應一個 deployment 與延遲預算：
+- 有設定 fallback 時，偏好的 deployment 以預算作為單次呼叫 timeout，逾時改呼叫較快的 fallback
+- 偏好 deployment 近期 p90 延遲超過預算時，直接改走 fallback，並每隔 LLM_ROUTE_PROBE_EVERY 次試探一次
+- 每個階段 / deployment 的延遲與結果都會記錄，供 /api/metrics 調校
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+AZURE_DEPLOYMENT = os.getenv("AZURE_DEPLOYMENT", "gpt-4o-mini")
+# 較快 (較小) 的 deployment；留空表示沒有可退回的模型，只記錄不做 fallback
+AZURE_FAST_DEPLOYMENT = os.getenv("AZURE_FAST_DEPLOYMENT", "")
+LLM_ROUTE_WINDOW = int(os.getenv("LLM_ROUTE_WINDOW", 50))
+LLM_ROUTE_MIN_SAMPLES = int(os.getenv("LLM_ROUTE_MIN_SAMPLES", 10))
+LLM_ROUTE_PROBE_EVERY = int(os.getenv("LLM_ROUTE_PROBE_EVERY", 20))
+
+
+def _stage_route(stage_env: str, budget: float, prefer_fast: bool) -> Dict[str, Any]:
+    """
+    LLM_ROUTE_{STAGE}_DEPLOYMENT / LLM_ROUTE_{STAGE}_BUDGET 可覆寫預設值。
+    prefer_fast 的階段 (短的結構化輸出) 預設直接使用 fast deployment。
+    """
+    default_deployment = (AZURE_FAST_DEPLOYMENT if prefer_fast else "") or AZURE_DEPLOYMENT
+    deployment = os.getenv(f"LLM_ROUTE_{stage_env}_DEPLOYMENT", default_deployment)
+    fallback = AZURE_FAST_DEPLOYMENT if AZURE_FAST_DEPLOYMENT != deployment else ""
+    return {
+        "deployment": deployment,
+        "budget": float(os.getenv(f"LLM_ROUTE_{stage_env}_BUDGET", budget)),
+        "fallback": fallback or None,
+    }
+
+
+# stage (response_model 名稱) -> deployment / 延遲預算 (秒) / fallback deployment
+LLM_ROUTES: Dict[str, Dict[str, Any]] = {
+    "SearchIntent": _stage_route("INTENT", 4.0, prefer_fast=True),
+    "RetrySearchDecision": _stage_route("RETRY_CHECK", 4.0, prefer_fast=True),
+    "StructuredSummary": _stage_route("SUMMARY", 25.0, prefer_fast=False),
+    "RelevanceSummary": _stage_route("RELEVANCE_SUMMARY", 25.0, prefer_fast=False),
+    "ChatResponse": _stage_route("CHAT", 20.0, prefer_fast=False),
+}
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        routes: Dict[str, Dict[str, Any]] = None,
+        window: int = LLM_ROUTE_WINDOW,
+        min_samples: int = LLM_ROUTE_MIN_SAMPLES,
+        probe_every: int = LLM_ROUTE_PROBE_EVERY,
+    ):
+        self.routes = routes if routes is not None else LLM_ROUTES
+        self.window = window
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], deque] = {}
+        self._counters: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._demoted_calls: Dict[str, int] = {}
+
+    def preferred(self, stage: str, default: str) -> str:
+        route = self.routes.get(stage)
+        return route["deployment"] if route else default
+
+    def _p90(self, stage: str, deployment: str) -> Optional[float]:
+        samples = self._latencies.get((stage, deployment))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+    def plan(self, stage: str, default: str) -> List[Tuple[str, Optional[float]]]:
+        """
+        回傳依序嘗試的 [(deployment, timeout)]。
+        最後一個選項不設 timeout (使用 client 預設)，避免所有選項都因預算而失敗。
+        """
+        route = self.routes.get(stage)
+        if not route:
+            return [(default, None)]
+        deployment, budget, fallback = route["deployment"], route["budget"], route["fallback"]
+        if not fallback:
+            return [(deployment, None)]
+
+        with self._lock:
+            p90 = self._p90(stage, deployment)
+            if p90 is not None and p90 > budget:
+                calls = self._demoted_calls.get(stage, 0) + 1
+                self._demoted_calls[stage] = calls
+                if calls % self.probe_every != 0:
+                    self._counter(stage, fallback)["routed_direct"] += 1
+                    return [(fallback, None)]
+            else:
+                self._demoted_calls.pop(stage, None)
+        return [(deployment, budget), (fallback, None)]
+
+    def _counter(self, stage: str, deployment: str) -> Dict[str, int]:
+        return self._counters.setdefault(
+            (stage, deployment),
+            {"calls": 0, "errors": 0, "budget_exceeded": 0, "routed_direct": 0},
+        )
+
+    def record(self, stage: str, deployment: str, latency: float, outcome: str) -> None:
+        """outcome: success / error / budget_exceeded"""
+        with self._lock:
+            counter = self._counter(stage, deployment)
+            counter["calls"] += 1
+            if outcome == "error":
+                counter["errors"] += 1
+            elif outcome == "budget_exceeded":
+                counter["budget_exceeded"] += 1
+            if outcome != "error":
+                # 逾時樣本 (約等於預算) 也計入，讓 p90 反映實際上會超時
+                self._latencies.setdefault(
+                    (stage, deployment), deque(maxlen=self.window)
+                ).append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = {}
+            for (stage, deployment), counter in self._counters.items():
+                samples = sorted(self._latencies.get((stage, deployment), ()))
+                entry = dict(counter)
+                entry["p50_ms"] = (
+                    round(samples[len(samples) // 2] * 1000, 1) if samples else None
+                )
+                p90 = self._p90(stage, deployment)
+                entry["p90_ms"] = round(p90 * 1000, 1) if p90 is not None else None
+                stage_stats = stats.setdefault(
+                    stage, {"route": self.routes.get(stage), "deployments": {}}
+                )
+                stage_stats["deployments"][deployment] = entry
+            return stats
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
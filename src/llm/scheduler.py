@@ -0,0 +1,406 @@
+"""
+Client-side scheduler for Azure OpenAI calls.
+
+- Token bucket：依 RPM / TPM 排隊，額度由回應的 x-ratelimit-* header 校正
+- 429 / 5xx：jittered exponential backoff (優先採用 retry-after)
+- Circuit breaker：連續失敗達門檻後直接拒絕呼叫，讓呼叫端立即改走非 LLM 路徑
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from src.tool.ANSI import print_red, print_yellow
+
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", 0))  # 0 = 由 header 學習
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", 0))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", 10))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", 800))
+
+
+class LLMUnavailableError(Exception):
+    """熔斷中或排隊時間超過上限，呼叫端應改走非 LLM 路徑。"""
+
+
+def estimate_request_tokens(
+    messages: list, completion_tokens: int = LLM_COMPLETION_TOKEN_ESTIMATE
+) -> int:
+    """
+    以 UTF-8 位元組數 / 3 粗估 prompt token (中文約 1 字 1 token，英文偏保守)，再加上預估輸出量。
+    排程只需要量級，回應後會以 usage 校正。
+    """
+    prompt_bytes = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_bytes += len(content.encode("utf-8"))
+    return prompt_bytes // 3 + completion_tokens
+
+
+class TokenBucket:
+    """每分鐘額度的 token bucket；capacity=0 表示尚未得知上限 (不限制)。"""
+
+    def __init__(self, capacity: float = 0):
+        self._lock = threading.Lock()
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    @property
+    def refill_per_sec(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.capacity:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self._updated) * self.refill_per_sec
+            )
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """預扣額度並回傳需要等待的秒數 (額度允許為負，代表排隊中的請求)。"""
+        with self._lock:
+            if not self.capacity:
+                return 0.0
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.refill_per_sec)
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            if self.capacity:
+                self._refill()
+                self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, remaining: Optional[float], limit: Optional[float] = None) -> None:
+        """以伺服器回報的剩餘額度校正 (只往保守方向調整)。"""
+        with self._lock:
+            if limit:
+                self.capacity = float(limit)
+            elif remaining is not None and remaining > self.capacity:
+                self.capacity = float(remaining)
+            self._refill()
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+
+
+class CircuitBreaker:
+    """closed -> (連續失敗) -> open -> (reset_timeout) -> half_open -> 成功則 closed"""
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_THRESHOLD,
+        reset_timeout: float = LLM_BREAKER_RESET,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """不佔用 half-open 試探名額的狀態查詢"""
+        with self._lock:
+            return self._state() == "open"
+
+    def release_probe(self) -> None:
+        """試探請求未實際送出時歸還名額"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print_red(
+                        f"✗ LLM circuit breaker opened after {self._failures} consecutive failures"
+                    )
+                self._opened_at = time.monotonic()
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        value = headers.get(name) if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        backoff_max: float = LLM_BACKOFF_MAX,
+        max_queue_wait: float = LLM_MAX_QUEUE_WAIT,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_queue_wait = max_queue_wait
+        self.breaker = breaker or CircuitBreaker()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "capped_timeouts": 0,
+            "retries": 0,
+            "circuit_rejections": 0,
+            "queue_rejections": 0,
+            "queue_wait_s": 0.0,
+        }
+
+    # --- bookkeeping ---
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def available(self) -> bool:
+        """熔斷開啟時回傳 False，讓呼叫端直接改走非 LLM 路徑"""
+        return not self.breaker.is_open()
+
+    def _admit(self, estimated_tokens: int) -> float:
+        """通過熔斷與排隊檢查，回傳需等待的秒數"""
+        if not self.breaker.allow():
+            self._count("circuit_rejections")
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if wait > self.max_queue_wait:
+            self.requests.refund(1)
+            self.tokens.refund(estimated_tokens)
+            self.breaker.release_probe()
+            self._count("queue_rejections")
+            raise LLMUnavailableError(
+                f"LLM rate limit queue wait {wait:.1f}s exceeds {self.max_queue_wait:.1f}s"
+            )
+        if wait:
+            self._count("queue_wait_s", wait)
+        return wait
+
+    def _sync_headers(self, headers) -> None:
+        self.requests.sync(
+            _header_float(headers, "x-ratelimit-remaining-requests"),
+            _header_float(headers, "x-ratelimit-limit-requests"),
+        )
+        self.tokens.sync(
+            _header_float(headers, "x-ratelimit-remaining-tokens"),
+            _header_float(headers, "x-ratelimit-limit-tokens"),
+        )
+
+    def _retry_delay(
+        self, error: Exception, attempt: int, timeout_capped: bool = False
+    ) -> Optional[float]:
+        """
+        判斷錯誤是否可重試並回傳等待秒數；不可重試時回傳 None。
+        逾時不重試：呼叫端的時間預算已耗盡，重試只會讓使用者等更久。
+        timeout_capped 表示 timeout 被呼叫端 (請求 deadline / 路由延遲預算) 縮短，
+        這類逾時不代表服務異常，不計入熔斷 (否則少數極短 deadline 的請求就能讓所有人熔斷)。
+        """
+        if isinstance(error, APITimeoutError):
+            self._count("timeouts")
+            if timeout_capped:
+                self._count("capped_timeouts")
+                self.breaker.release_probe()
+            else:
+                self.breaker.record_failure()
+            return None
+        if isinstance(error, RateLimitError):
+            self._count("throttled")
+        elif isinstance(error, APIStatusError) and error.status_code >= 500:
+            self._count("server_errors")
+        elif isinstance(error, APIConnectionError):
+            self._count("server_errors")
+        else:
+            # 不可重試的錯誤：4xx 代表服務有正常回應 (視為成功，關閉熔斷)；
+            # 其他例外 (解析 / 驗證等) 無法判斷服務狀態，只歸還 half-open 試探名額
+            if isinstance(error, APIStatusError):
+                self.breaker.record_success()
+            else:
+                self.breaker.release_probe()
+            return None
+
+        self.breaker.record_failure()
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            self._sync_headers(headers)
+        if attempt + 1 >= self.max_attempts or self.breaker.is_open():
+            return None
+
+        retry_after_ms = _header_float(headers, "retry-after-ms")
+        retry_after = (
+            retry_after_ms / 1000.0
+            if retry_after_ms is not None
+            else _header_float(headers, "retry-after")
+        )
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        delay = max(retry_after or 0.0, backoff)
+        if delay > self.backoff_max * 2:
+            return None
+        self._count("retries")
+        print_yellow(
+            f"  LLM request failed ({type(error).__name__}), retrying in {delay:.2f}s "
+            f"(attempt {attempt + 2}/{self.max_attempts})"
+        )
+        return delay
+
+    def _on_success(self, raw: Any) -> None:
+        self.breaker.record_success()
+        headers = getattr(raw, "headers", None)
+        if headers is not None:
+            self._sync_headers(headers)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """以實際 usage 校正預扣的 TPM 額度"""
+        if actual_tokens is None:
+            return
+        diff = estimated_tokens - actual_tokens
+        if diff > 0:
+            self.tokens.refund(diff)
+        elif diff < 0:
+            self.tokens.reserve(-diff)
+
+    # --- execution ---
+
+    def execute(
+        self,
+        fn: Callable[[], Any],
+        estimated_tokens: int,
+        stats: Optional[Dict[str, Any]] = None,
+        timeout_capped: bool = False,
+    ) -> Any:
+        """
+        同步執行 fn (回傳帶 headers 的 raw response)，失敗時依錯誤類型退避重試。
+        傳入 stats 時會寫入實際嘗試次數 (attempts) 與排隊等待秒數 (queue_wait)，成功或失敗皆同。
+        timeout_capped=True 時逾時不計入熔斷 (見 _retry_delay)。
+        """
+        stats = stats if stats is not None else {}
+        stats.update(attempts=0, queue_wait=0.0)
+        attempt = 0
+        while True:
+            wait = self._admit(estimated_tokens)
+            if wait:
+                stats["queue_wait"] += wait
+                time.sleep(wait)
+            self._count("requests")
+            stats["attempts"] += 1
+            try:
+                raw = fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, timeout_capped)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # 中斷 (例如 KeyboardInterrupt / SystemExit)：請求結果未知，歸還試探名額
+                self.breaker.release_probe()
+                raise
+            self._on_success(raw)
+            return raw
+
+    async def aexecute(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        stats: Optional[Dict[str, Any]] = None,
+        timeout_capped: bool = False,
+    ) -> Any:
+        """execute 的 async 版本，等待期間不阻塞 event loop。"""
+        stats = stats if stats is not None else {}
+        stats.update(attempts=0, queue_wait=0.0)
+        attempt = 0
+        while True:
+            wait = self._admit(estimated_tokens)
+            if wait:
+                stats["queue_wait"] += wait
+                await asyncio.sleep(wait)
+            self._count("requests")
+            stats["attempts"] += 1
+            try:
+                raw = await fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, timeout_capped)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # 取消 / 中斷 (例如 asyncio.CancelledError)：請求結果未知，歸還試探名額
+                self.breaker.release_probe()
+                raise
+            self._on_success(raw)
+            return raw
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_wait_s"] = round(stats["queue_wait_s"], 3)
+        stats["circuit_state"] = self.breaker.state
+        stats["rpm_capacity"] = self.requests.capacity or None
+        stats["tpm_capacity"] = self.tokens.capacity or None
+        return stats
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """行程共用的 scheduler (與共用的 Azure OpenAI client 對應)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,181 @@
+"""
+Incremental parser for streamed structured-output JSON.
+
+Structured output (json_schema) 會回傳一個扁平的 JSON 物件，例如 StructuredSummary：
+{"brief_answer": "...", "detailed_answer": "...", "general_summary": "..."}
+串流時每個 chunk 只是其中一小段文字，本模組逐字元解析，讓呼叫端在欄位尚未結束前就能取得已解碼的內容。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class IncrementalJSONFieldParser:
+    """
+    逐段餵入 JSON 文字，回傳頂層字串欄位的事件：
+    - ("delta", field, text): 欄位新解碼出的文字
+    - ("done", field, value): 欄位字串結束，value 為完整內容
+    - ("value", field, value): 布林 / 數字 / null 等純量值解析完成
+    巢狀物件與陣列會被略過，不產生事件。
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.values: Dict[str, Any] = {}
+        self._state = "start"  # start, key_wait, key, colon, value_wait, string, scalar, skip, comma, end
+        self._key: List[str] = []
+        self._current: Optional[str] = None
+        self._value: List[str] = []
+        self._scalar: List[str] = []
+        self._escape = ""  # 跨 chunk 未完成的跳脫序列
+        self._high_surrogate: Optional[int] = None
+        self._skip_depth = 0
+        self._skip_in_string = False
+        self._skip_escape = False
+
+    @property
+    def finished(self) -> bool:
+        return self._state == "end"
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        pending: List[str] = []
+
+        def flush():
+            if pending and self._current is not None:
+                text = "".join(pending)
+                self._value.append(text)
+                events.append(("delta", self._current, text))
+            pending.clear()
+
+        for ch in chunk:
+            state = self._state
+            if state == "string":
+                if self._escape:
+                    self._escape += ch
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        pending.append(decoded)
+                elif ch == "\\":
+                    self._escape = "\\"
+                elif ch == '"':
+                    flush()
+                    value = "".join(self._value)
+                    self.fields[self._current] = value
+                    events.append(("done", self._current, value))
+                    self._current = None
+                    self._value = []
+                    self._state = "comma"
+                else:
+                    pending.append(ch)
+            elif state == "key":
+                if self._escape:
+                    self._escape += ch
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        self._key.append(decoded)
+                elif ch == "\\":
+                    self._escape = "\\"
+                elif ch == '"':
+                    self._state = "colon"
+                else:
+                    self._key.append(ch)
+            elif state == "start":
+                if ch == "{":
+                    self._state = "key_wait"
+            elif state == "key_wait":
+                if ch == '"':
+                    self._key = []
+                    self._state = "key"
+                elif ch == "}":
+                    self._state = "end"
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value_wait"
+            elif state == "value_wait":
+                if ch == '"':
+                    self._current = "".join(self._key)
+                    self._value = []
+                    self._state = "string"
+                elif ch in "{[":
+                    self._state = "skip"
+                    self._skip_depth = 1
+                    self._skip_in_string = False
+                elif not ch.isspace():
+                    self._state = "scalar"
+                    self._scalar = [ch]
+            elif state == "scalar":
+                if ch in ",}":
+                    self._end_scalar(events)
+                    self._state = "key_wait" if ch == "," else "end"
+                elif not ch.isspace():
+                    self._scalar.append(ch)
+            elif state == "skip":
+                self._skip_char(ch)
+            elif state == "comma":
+                if ch == ",":
+                    self._state = "key_wait"
+                elif ch == "}":
+                    self._state = "end"
+
+        flush()
+        return events
+
+    def _end_scalar(self, events: List[Tuple[str, str, Any]]) -> None:
+        key = "".join(self._key)
+        try:
+            value = json.loads("".join(self._scalar))
+        except ValueError:
+            return
+        self.values[key] = value
+        events.append(("value", key, value))
+
+    def _skip_char(self, ch: str) -> None:
+        if self._skip_in_string:
+            if self._skip_escape:
+                self._skip_escape = False
+            elif ch == "\\":
+                self._skip_escape = True
+            elif ch == '"':
+                self._skip_in_string = False
+            return
+        if ch == '"':
+            self._skip_in_string = True
+        elif ch in "{[":
+            self._skip_depth += 1
+        elif ch in "}]":
+            if self._skip_depth == 0:
+                self._state = "end"
+            else:
+                self._skip_depth -= 1
+        elif ch == "," and self._skip_depth == 0:
+            self._state = "key_wait"
+
+    def _decode_escape(self) -> Optional[str]:
+        """解碼 self._escape；序列尚未完整時回傳 None。"""
+        seq = self._escape
+        if seq[1] != "u":
+            self._escape = ""
+            return _SIMPLE_ESCAPES.get(seq[1], seq[1])
+        if len(seq) < 6:
+            return None
+        self._escape = ""
+        code = int(seq[2:6], 16)
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            high, self._high_surrogate = self._high_surrogate, None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        return chr(code)
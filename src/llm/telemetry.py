@@ -0,0 +1,177 @@
+"""
+LLM call telemetry.
+
+每次 LLM 呼叫記錄 TTFB、總延遲、token usage (prompt / completion / cached)、重試次數與結果，
+依 stage (structured output 的 schema 名稱，非結構化呼叫為 "text") 彙總成直方圖式摘要，
+以 /api/metrics 提供容量規劃與預算調整使用的實測數據。
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+# 延遲直方圖的桶上界 (毫秒)，最後一個桶為 +Inf
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+SAMPLE_WINDOW = 500
+
+
+def stage_from_response_format(response_format: Optional[dict]) -> str:
+    if response_format and response_format.get("type") == "json_schema":
+        return response_format.get("json_schema", {}).get("name", "json_schema")
+    return "text"
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.samples: deque = deque(maxlen=SAMPLE_WINDOW)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.samples.append(ms)
+        self.total += ms
+        self.n += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.n:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]
+        cumulative, buckets = 0, {}
+        for label, count in zip(labels, self.counts):
+            cumulative += count
+            buckets[label] = cumulative
+        return {
+            "count": self.n,
+            "mean_ms": round(self.total / self.n, 1),
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "buckets": buckets,
+        }
+
+
+def _new_stage() -> Dict[str, Any]:
+    return {
+        "outcomes": {},
+        "models": {},
+        "latency": _Histogram(),
+        "ttfb": _Histogram(),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "attempts": 0,
+        "calls": 0,
+    }
+
+
+def usage_to_dict(usage: Any) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+    }
+
+
+class LLMTelemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        latency: float,
+        outcome: str,
+        ttfb: Optional[float] = None,
+        usage: Optional[Dict[str, int]] = None,
+        attempts: int = 1,
+    ) -> None:
+        """
+        outcome: success / timeout / rate_limited / unavailable / error。
+        非串流呼叫的回應在完整讀取後才返回，因此 ttfb 與 latency 相同。
+        """
+        usage = usage or {}
+        with self._lock:
+            entry = self._stages.setdefault(stage, _new_stage())
+            entry["calls"] += 1
+            entry["attempts"] += attempts
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            entry["models"][model] = entry["models"].get(model, 0) + 1
+            entry["latency"].observe(latency)
+            if ttfb is not None:
+                entry["ttfb"].observe(ttfb)
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+                entry[key] += usage.get(key, 0)
+
+            if usage:
+                model_entry = self._models.setdefault(
+                    model,
+                    {"requests": 0, "cache_hit_requests": 0, "prompt_tokens": 0, "cached_tokens": 0},
+                )
+                model_entry["requests"] += 1
+                model_entry["cache_hit_requests"] += 1 if usage.get("cached_tokens") else 0
+                model_entry["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                model_entry["cached_tokens"] += usage.get("cached_tokens", 0)
+
+    def count(self, stage: str, outcome: str) -> None:
+        """呼叫成功但回應不可用 (例如 schema 驗證失敗) 時額外計數"""
+        with self._lock:
+            entry = self._stages.setdefault(stage, _new_stage())
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for stage, entry in self._stages.items():
+                calls = entry["calls"]
+                stages[stage] = {
+                    "calls": calls,
+                    "outcomes": dict(entry["outcomes"]),
+                    "models": dict(entry["models"]),
+                    "avg_attempts": round(entry["attempts"] / calls, 2) if calls else None,
+                    "latency": entry["latency"].summary(),
+                    "ttfb": entry["ttfb"].summary(),
+                    "tokens": {
+                        "prompt": entry["prompt_tokens"],
+                        "completion": entry["completion_tokens"],
+                        "cached": entry["cached_tokens"],
+                        "avg_prompt": round(entry["prompt_tokens"] / calls, 1) if calls else None,
+                        "avg_completion": (
+                            round(entry["completion_tokens"] / calls, 1) if calls else None
+                        ),
+                    },
+                }
+            prompt_cache = {}
+            for model, entry in self._models.items():
+                prompt_cache[model] = dict(entry)
+                prompt_cache[model]["cached_ratio"] = (
+                    round(entry["cached_tokens"] / entry["prompt_tokens"], 3)
+                    if entry["prompt_tokens"]
+                    else None
+                )
+        return {"stages": stages, "prompt_cache": prompt_cache}
+
+
+_telemetry = LLMTelemetry()
+
+
+def get_llm_telemetry() -> LLMTelemetry:
+    return _telemetry
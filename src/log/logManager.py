@@ -57,7 +57,8 @@ class LogManager:
         response_content: str,
         temperature: float,
         response_format: dict,
-        model: str
+        model: str,
+        telemetry: dict = None
     ):
         log_entry = {
             "timestamp": datetime.datetime.now().isoformat(),
@@ -67,6 +68,9 @@ class LogManager:
             "response_format": response_format,
             "response": response_content,
         }
+        if telemetry:
+            # latency / ttfb / token usage / attempts / outcome
+            log_entry["telemetry"] = telemetry
         LogManager._write_log("client", log_entry)
 
     @staticmethod
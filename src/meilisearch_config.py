@@ -3,6 +3,8 @@ Meilisearch Configuration Settings
 Centralized configuration for search parameters and ranking rules.
 """
 
+import os
+
 # Default Semantic Ratio
 # Controls the weight of vector search vs keyword search
 # 0.0 = Pure keyword search (Fuzzy)
@@ -46,7 +48,13 @@ SEARCHABLE_ATTRIBUTES = [
 ]
 
 # Embedding Configuration
+EMBEDDING_SOURCE_DIMS = 1024  # Dimension of BGE-M3 embeddings
+
+# Optional PCA projection of stored/query vectors (0 = disabled, or 256 / 384 / 512)
+# Fit the projection with data_update/fit_projection.py, then re-ingest the index.
+EMBEDDING_PROJECTION_DIMS = int(os.getenv("EMBEDDING_PROJECTION_DIMS", 0))
+
 EMBEDDING_CONFIG = {
     "source": "userProvided",  # We generate embeddings externally (BGE-M3)
-    "dimensions": 1024,  # Dimension of BGE-M3 embeddings
+    "dimensions": EMBEDDING_PROJECTION_DIMS or EMBEDDING_SOURCE_DIMS,
 }
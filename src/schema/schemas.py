@@ -114,6 +114,35 @@ class StructuredSummary(BaseModel):
     )
 
 
+class RelevanceSummary(BaseModel):
+    """Relevance verdict and, when relevant, the structured summary in a single call"""
+
+    decision: str = Field(
+        default="",
+        description="Decision explanation in Chinese (10-20 characters).",
+    )
+    relevant: bool = Field(
+        ...,
+        description="Whether the documents are enough to answer the user's query clearly.",
+    )
+    search_direction: str = Field(
+        default="",
+        description="If relevant=False, provide a specific direction or focus for the next search attempt (in Chinese). Empty if relevant=True.",
+    )
+    brief_answer: str = Field(
+        default="",
+        description="Brief answer to the query (max 40 characters). Empty if relevant=False.",
+    )
+    detailed_answer: str = Field(
+        default="",
+        description="Detailed answer with citations using [index] (only use half-width square brackets). Empty if relevant=False.",
+    )
+    general_summary: str = Field(
+        default="",
+        description="General summary of all search results (max 1000 characters), independent of the query. Empty if relevant=False.",
+    )
+
+
 class SummaryResponse(BaseModel):
     """Complete summary response including metadata"""
 
@@ -128,6 +157,10 @@ class SummaryResponse(BaseModel):
     total_tokens: int = Field(
         default=0, description="Total token count of all summarized documents"
     )
+    discarded_tokens: int = Field(
+        default=0,
+        description="Tokens dropped or truncated away to fit the summary token limit",
+    )
     error: Optional[str] = Field(
         None, description="Error message if status is 'failed'"
     )
@@ -0,0 +1,98 @@
+"""
+Two-phase candidate fetch.
+
+原本每個子查詢固定取回 get_pre_search_limit (至少 50 筆) 的完整文件 (含 content 與 ranking details)，
+即使只需要 5 筆結果。改為兩階段：
+1. 每個子查詢只取小視窗 (get_candidate_window) 的 id / 分數與合併判斷需要的欄位 (CANDIDATE_ATTRIBUTES)，
+   依融合後的分數選出前 N 筆；只有在不重複連結少於 limit、或視窗尾端的分數與第 limit 名幾乎相同
+   (分數平坦，截斷點之後可能還有同樣好的文件) 時，才以原本的 fetch limit 重新取一次 (widen)
+2. 以 id 取回選出候選的完整文件 (與向量)，再做關鍵字 / vector rerank 與合併
+widen 的比例記錄於 /api/metrics 的 candidate_fetch。
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from src.config import CANDIDATE_FLAT_SPREAD
+
+# 第一階段只取合併判斷需要的欄位，內容與向量在第二階段才取回
+CANDIDATE_ATTRIBUTES = ["id", "link", "title"]
+
+WIDEN_FEW_LINKS = "few_links"
+WIDEN_FLAT_SCORES = "flat_scores"
+
+
+def widen_reason(
+    candidates: List[Dict[str, Any]],
+    limit: int,
+    flat_spread: float = CANDIDATE_FLAT_SPREAD,
+) -> Optional[str]:
+    """
+    判斷第一階段 (已依分數排序) 的候選是否需要擴大視窗，回傳原因或 None。
+    呼叫端需先確認至少一個子查詢被視窗截斷 (否則擴大也不會有新文件)。
+    """
+    links = {c.get("link") or c.get("id") for c in candidates}
+    if len(links) < limit:
+        return WIDEN_FEW_LINKS
+    scores = [c.get("_rerank_score", c.get("_rankingScore", 0.0)) for c in candidates]
+    if len(scores) > limit and scores[limit - 1] - scores[-1] < flat_spread:
+        return WIDEN_FLAT_SCORES
+    return None
+
+
+def hydrate(candidates: List[Dict[str, Any]], full_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    以 id 對應的完整文件補齊候選欄位 (候選上的分數等欄位優先)，保持候選順序。
+    找不到完整文件的候選 (例如剛被刪除) 會被略過。
+    """
+    by_id = {doc.get("id"): doc for doc in full_docs}
+    hydrated = []
+    for candidate in candidates:
+        doc = by_id.get(candidate.get("id"))
+        if doc is not None:
+            hydrated.append({**doc, **candidate})
+    return hydrated
+
+
+class CandidateFetchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "searches": 0,
+            "widened": 0,
+            WIDEN_FEW_LINKS: 0,
+            WIDEN_FLAT_SCORES: 0,
+            "candidates_fetched": 0,
+            "documents_hydrated": 0,
+        }
+
+    def record(self, reason: Optional[str], candidates_fetched: int, documents_hydrated: int) -> None:
+        with self._lock:
+            self._stats["searches"] += 1
+            self._stats["candidates_fetched"] += candidates_fetched
+            self._stats["documents_hydrated"] += documents_hydrated
+            if reason:
+                self._stats["widened"] += 1
+                self._stats[reason] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["overflow_rate"] = (
+            round(stats["widened"] / stats["searches"], 3) if stats["searches"] else None
+        )
+        return stats
+
+
+_candidate_fetch_stats: Optional[CandidateFetchStats] = None
+_candidate_fetch_stats_lock = threading.Lock()
+
+
+def get_candidate_fetch_stats() -> CandidateFetchStats:
+    """取得行程共用的兩階段 fetch 統計"""
+    global _candidate_fetch_stats
+    if _candidate_fetch_stats is None:
+        with _candidate_fetch_stats_lock:
+            if _candidate_fetch_stats is None:
+                _candidate_fetch_stats = CandidateFetchStats()
+    return _candidate_fetch_stats
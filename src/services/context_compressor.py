@@ -0,0 +1,196 @@
+"""
+Query-focused extractive context compression.
+
+總結與對話前，將每篇文件切成段落 (連續句子組成，約 CONTEXT_PASSAGE_CHARS 字)，
+以 embedding 與查詢的 cosine 相似度 (NumPy 向量化) 排序，每篇只保留最相關的段落，
+總長度不超過原文的 CONTEXT_COMPRESSION_RATIO，並依原文順序輸出。
+段落 embedding 以 LRU 快取，同一篇文件在重搜索、對話中重複出現時不需重新計算。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import (
+    CONTEXT_COMPRESSION_MIN_CHARS,
+    CONTEXT_COMPRESSION_RATIO,
+    CONTEXT_PASSAGE_CHARS,
+    PASSAGE_EMBEDDING_CACHE_SIZE,
+)
+from src.database import vector_utils
+from src.tool.ANSI import print_red
+from src.tool.context_packer import split_sentences
+
+GAP_MARKER = " ... "
+_EMBED_BATCH_SIZE = 64
+
+
+def split_passages(text: str, max_chars: int = CONTEXT_PASSAGE_CHARS) -> List[str]:
+    """將連續句子合併為不超過 max_chars 的段落 (單句過長時自成一段)，串接後與原文相同"""
+    passages = []
+    current = ""
+    for sentence in split_sentences(text):
+        if current and len(current) + len(sentence) > max_chars:
+            passages.append(current)
+            current = ""
+        current += sentence
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _cache_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ContextCompressor:
+    def __init__(
+        self,
+        ratio: float = CONTEXT_COMPRESSION_RATIO,
+        min_chars: int = CONTEXT_COMPRESSION_MIN_CHARS,
+        passage_chars: int = CONTEXT_PASSAGE_CHARS,
+        cache_size: int = PASSAGE_EMBEDDING_CACHE_SIZE,
+    ):
+        self.ratio = ratio
+        self.min_chars = min_chars
+        self.passage_chars = passage_chars
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "docs_compressed": 0,
+            "chars_in": 0,
+            "chars_out": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "failures": 0,
+        }
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """回傳 texts 對應的 L2 正規化向量矩陣，未快取的文字批次計算後寫入 LRU"""
+        keys = [_cache_key(t) for t in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = vector
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+        self._count("cache_hits", len(texts) - len(missing))
+        self._count("cache_misses", len(missing))
+
+        backend = vector_utils.get_embedding_backend()
+        missing_keys = list(missing)
+        for i in range(0, len(missing_keys), _EMBED_BATCH_SIZE):
+            batch = missing_keys[i : i + _EMBED_BATCH_SIZE]
+            embedded = np.asarray(
+                backend.embed([missing[k].replace("\n", " ") for k in batch]),
+                dtype=np.float32,
+            )
+            norms = np.linalg.norm(embedded, axis=1, keepdims=True)
+            embedded = embedded / np.maximum(norms, 1e-12)
+            with self._lock:
+                for key, vector in zip(batch, embedded):
+                    vectors[key] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.stack([vectors[k] for k in keys])
+
+    def _select(self, passages: List[str], scores: np.ndarray) -> str:
+        """依分數由高到低挑段落直到達到長度上限 (至少一段)，再依原順序組合，不連續處以 GAP_MARKER 分隔"""
+        limit = sum(len(p) for p in passages) * self.ratio
+        kept = []
+        used = 0
+        for i in np.argsort(-scores, kind="stable"):
+            if kept and used + len(passages[i]) > limit:
+                continue
+            kept.append(int(i))
+            used += len(passages[i])
+
+        text = ""
+        previous = None
+        for i in sorted(kept):
+            if previous is not None and i != previous + 1:
+                text += GAP_MARKER
+            text += passages[i]
+            previous = i
+        return text.strip()
+
+    def compress(self, query: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        回傳壓縮後的文件複本 (content 只保留與查詢最相關的段落)，未達 min_chars 的文件原樣保留。
+        embedding 失敗時回傳原始文件。
+        """
+        self._count("requests")
+        targets = []
+        for idx, doc in enumerate(docs):
+            content = doc.get("content") or doc.get("cleaned_content") or ""
+            if len(content) < self.min_chars:
+                continue
+            passages = split_passages(content, self.passage_chars)
+            if len(passages) > 1:
+                targets.append((idx, content, passages))
+        if not targets:
+            return docs
+
+        texts = [query] + [p for _, _, passages in targets for p in passages]
+        try:
+            matrix = self._embed(texts)
+        except Exception as e:
+            print_red(f"Context compression failed, using full content: {e}")
+            self._count("failures")
+            return docs
+
+        # 所有段落一次計算 cosine (向量皆已正規化)
+        scores = matrix[1:] @ matrix[0]
+
+        compressed = list(docs)
+        offset = 0
+        for idx, content, passages in targets:
+            doc_scores = scores[offset : offset + len(passages)]
+            offset += len(passages)
+            text = self._select(passages, doc_scores)
+            compressed[idx] = {**docs[idx], "content": text}
+            self._count("docs_compressed")
+            self._count("chars_in", len(content))
+            self._count("chars_out", len(text))
+        return compressed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_size"] = len(self._cache)
+        stats["ratio"] = self.ratio
+        stats["kept_ratio"] = (
+            round(stats["chars_out"] / stats["chars_in"], 3) if stats["chars_in"] else None
+        )
+        return stats
+
+
+_context_compressor: Optional[ContextCompressor] = None
+_context_compressor_lock = threading.Lock()
+
+
+def get_context_compressor() -> ContextCompressor:
+    """取得行程共用的 context compressor (段落 embedding 快取跨請求共用)"""
+    global _context_compressor
+    if _context_compressor is None:
+        with _context_compressor_lock:
+            if _context_compressor is None:
+                _context_compressor = ContextCompressor()
+    return _context_compressor
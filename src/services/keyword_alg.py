@@ -1,10 +1,120 @@
 import re
-from typing import List, Dict, Any, Optional
+import base64
+import hashlib
+from typing import List, Dict, Any, Optional, Set, Tuple, Container
 from src.config import (
     NO_HIT_PENALTY_FACTOR,
     KEYWORD_HIT_BOOST_FACTOR,
 )
 
+# CJK 字元各自成為一個 token (中文沒有空白分詞)，其餘以連續的字母 / 數字為一個 token
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK_CHARS}]|[^\\W_{_CJK_CHARS}]+")
+
+# keyword_signature 為 Bloom filter：每個 term 約 10 bits、7 個 hash，單一 term 誤判率約 0.8%
+_SIGNATURE_BITS_PER_TERM = 10
+_SIGNATURE_HASHES = 7
+_SIGNATURE_MIN_BITS = 64
+
+
+def normalize_keyword_text(text: str) -> str:
+    """關鍵字比對用的正規化：轉小寫並移除空白與連字號"""
+    return text.lower().replace(" ", "").replace("-", "")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def keyword_terms(text: str) -> Set[str]:
+    """
+    文件的比對 term：每個 token 與相鄰兩個 token 的串接 (等同移除空白與連字號後的比對)。
+    標題與內容需分別計算，關鍵字才不會橫跨兩個欄位誤判命中。
+    """
+    tokens = _tokenize(text)
+    terms = set(tokens)
+    terms.update(a + b for a, b in zip(tokens, tokens[1:]))
+    return terms
+
+
+def keyword_pattern(keyword: str) -> Tuple[str, ...]:
+    """關鍵字需要全部命中的 term：單一 token 本身，多個 token 則為每組相鄰 token 的串接"""
+    tokens = _tokenize(keyword)
+    if len(tokens) <= 1:
+        return tuple(tokens)
+    return tuple(a + b for a, b in zip(tokens, tokens[1:]))
+
+
+def _term_positions(term: str, size: int) -> List[int]:
+    # double hashing：以一次 blake2b 的兩段結果產生 _SIGNATURE_HASHES 個位置
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % size for i in range(_SIGNATURE_HASHES)]
+
+
+def build_keyword_signature(title: str, content: str) -> str:
+    """
+    文件的關鍵字比對欄位 (keyword_signature)：標題與內容 term 的 Bloom filter (base64)。
+    匯入時預先計算並存入索引，查詢時 rerank 只需查表，不必再轉換全文；
+    大小約為正規化全文 (title + content) 的 50% ~ 75%。
+    """
+    terms = keyword_terms(title) | keyword_terms(content)
+    if not terms:
+        return ""
+    size = max(_SIGNATURE_MIN_BITS, len(terms) * _SIGNATURE_BITS_PER_TERM)
+    size = (size + 7) // 8 * 8
+    bits = bytearray(size // 8)
+    for term in terms:
+        for pos in _term_positions(term, size):
+            bits[pos >> 3] |= 1 << (pos & 7)
+    return base64.b64encode(bytes(bits)).decode("ascii")
+
+
+class KeywordSignature:
+    """keyword_signature 的查詢端：支援 `term in signature` (可能誤判為命中，不會漏判)"""
+
+    def __init__(self, signature: str):
+        self._bits = base64.b64decode(signature) if signature else b""
+        self._size = len(self._bits) * 8
+
+    def __contains__(self, term: str) -> bool:
+        if not self._size:
+            return False
+        return all(
+            self._bits[pos >> 3] >> (pos & 7) & 1
+            for pos in _term_positions(term, self._size)
+        )
+
+
+class KeywordMatcher:
+    """
+    多關鍵字比對：關鍵字在建構時轉成 term 一次，每篇文件的 term 也只計算一次 (或使用 keyword_signature)，
+    再以查表找出所有命中的關鍵字 (回傳關鍵字索引的集合)。
+    term 相同的關鍵字 (如 "multi cloud" / "multi-cloud") 只比對一次並同時命中。
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        self._patterns: Dict[Tuple[str, ...], List[int]] = {}
+        for idx, keyword in enumerate(keywords):
+            # 與 _check_match 相同：空關鍵字 (或沒有任何 token) 永遠不命中
+            pattern = keyword_pattern(keyword or "")
+            if pattern:
+                self._patterns.setdefault(pattern, []).append(idx)
+
+    def find(self, text: str) -> Set[int]:
+        return self.find_terms(keyword_terms(text))
+
+    def find_terms(self, terms: Container[str]) -> Set[int]:
+        """terms 為 keyword_terms 的結果或 KeywordSignature"""
+        hits = set()
+        for pattern, indices in self._patterns.items():
+            if all(term in terms for term in pattern):
+                hits.update(indices)
+        return hits
+
+
 class ResultReranker:
     def __init__(
         self, search_results: List[Dict[str, Any]], target_keywords: Optional[List[str]]
@@ -15,7 +125,7 @@ class ResultReranker:
         )
 
     def _normalize(self, text: str) -> str:
-        return text.lower().replace(" ", "").replace("-", "")
+        return normalize_keyword_text(text)
 
     def _check_match(self, text: str, keyword: str) -> bool:
         if not text or not keyword:
@@ -82,18 +192,22 @@ class ResultReranker:
             return self.results[:top_k] if top_k else self.results
 
         reranked_docs = []
+        # 每篇文件的標題與內容只轉換一次 (或使用匯入時的 keyword_signature)，再比對所有關鍵字
+        matcher = KeywordMatcher(unique_keywords)
 
         for doc in self.results:
             content_text = doc.get("content", "") or ""
             title_text = doc.get("title", "") or ""
 
-            matched_keywords_count = 0
-            for kw in unique_keywords:
-                # Check if keyword exists in title or content
-                if self._check_match(title_text, kw) or self._check_match(
-                    content_text, kw
-                ):
-                    matched_keywords_count += 1
+            # Check if keyword exists in title or content
+            # 匯入時已存有 keyword_signature 則直接查表，舊資料才在查詢時轉換全文
+            signature = doc.get("keyword_signature")
+            if signature is not None:
+                terms = KeywordSignature(signature)
+            else:
+                terms = keyword_terms(title_text) | keyword_terms(content_text)
+            hits = matcher.find_terms(terms)
+            matched_keywords_count = len(hits)
 
             # User suggested formula: matched / total
             hit_ratio = (
@@ -0,0 +1,129 @@
+"""
+Chunk merge structures for search results.
+
+同一個 link 的多個片段 (chunk) 會合併成一筆結果。合併時只記錄 chunk id 集合與有序的片段文字，
+以 id / 文字集合去重 (O(1))，content 字串在取出 (序列化、總結) 時才一次組合，
+避免每次合併都對越來越長的字串做子字串搜尋與重建。
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SEPARATOR = "\n\n --- \n\n"
+
+
+class MergedDocument(dict):
+    """
+    合併後的文件：本身就是結果 dict (第一個片段的欄位)，另外保存片段結構。
+    content / all_ids / token 在 materialize() 時才依片段重新寫入。
+    """
+
+    def __init__(self, doc: Dict[str, Any]):
+        super().__init__(doc)
+        self._ids: List[str] = []
+        self._id_set = set()
+        self._texts: List[str] = []
+        self._text_set = set()
+        self._tokens: List[int] = []
+        self._dirty = False
+
+        ids, chunks = self._parts(doc)
+        self._add_ids(ids)
+        for text, token in chunks:
+            self._add_chunk(text, token)
+        self["all_ids"] = list(self._ids)
+        # 單一片段時 content / token 與原始結果相同，不需要重新組合
+        self._dirty = len(self._texts) > 1
+
+    def _add_ids(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            if chunk_id and chunk_id not in self._id_set:
+                self._id_set.add(chunk_id)
+                self._ids.append(chunk_id)
+                self._dirty = True
+
+    def _add_chunk(self, text: str, token: int) -> bool:
+        if not text or text in self._text_set:
+            return False
+        self._text_set.add(text)
+        self._texts.append(text)
+        self._tokens.append(token or 0)
+        self._dirty = True
+        return True
+
+    def chunks(self) -> List[Tuple[str, int]]:
+        return list(zip(self._texts, self._tokens))
+
+    def merge(self, doc: Dict[str, Any]) -> None:
+        """
+        併入同一 link 的另一筆結果。chunk id 都已出現過時不再併入內容；
+        傳入 MergedDocument 時逐片段合併，因此跨回合合併仍能以片段去重。
+        """
+        ids, chunks = self._parts(doc)
+        if ids and all(chunk_id in self._id_set for chunk_id in ids):
+            return
+        self._add_ids(ids)
+        for text, token in chunks:
+            self._add_chunk(text, token)
+
+    @staticmethod
+    def _parts(doc: Dict[str, Any]) -> Tuple[List[str], List[Tuple[str, int]]]:
+        if isinstance(doc, MergedDocument):
+            return list(doc._ids), doc.chunks()
+        ids = [i for i in (doc.get("all_ids") or [doc.get("id")]) if i]
+        return ids, [(doc.get("content") or "", doc.get("token", 0))]
+
+    def materialize(self) -> "MergedDocument":
+        """將片段組合寫回 content / all_ids / token，之後的讀取與 JSON 序列化即為最新內容"""
+        if self._dirty:
+            self["all_ids"] = list(self._ids)
+            if self._texts:
+                self["content"] = CHUNK_SEPARATOR.join(self._texts)
+                self["token"] = sum(self._tokens)
+            self._dirty = False
+        return self
+
+
+class MergedResults:
+    """
+    key (link 或 id) -> MergedDocument 的有序集合，介面與 dict 相同；
+    以 values() / items() / [] 取出時才組合內容。
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, MergedDocument] = {}
+
+    def add(self, key: str, doc: Dict[str, Any]) -> Tuple[MergedDocument, bool]:
+        """回傳 (合併後的文件, 是否為新 key)"""
+        existing = self._docs.get(key)
+        if existing is None:
+            # 複製一份，避免之後的合併改動到已回傳給前端的搜尋結果
+            merged = MergedDocument(doc)
+            self._docs[key] = merged
+            return merged, True
+        existing.merge(doc)
+        return existing, False
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._docs)
+
+    def __getitem__(self, key: str) -> MergedDocument:
+        return self._docs[key].materialize()
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        doc = self._docs.get(key)
+        return doc.materialize() if doc is not None else default
+
+    def keys(self) -> List[str]:
+        return list(self._docs)
+
+    def values(self) -> List[MergedDocument]:
+        return [doc.materialize() for doc in self._docs.values()]
+
+    def items(self) -> List[Tuple[str, MergedDocument]]:
+        return [(key, doc.materialize()) for key, doc in self._docs.items()]
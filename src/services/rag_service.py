@@ -5,9 +5,11 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 from src.services.search_service import SearchService
 from src.llm.client import LLMClient
-from src.tool.token_counter import count_tokens
-from src.config import LLM_TOKEN_LIMIT
-from src.llm.prompts.rag_answer import RAG_CHAT_PROMPT
+from src.tool.token_counter import count_tokens_batch, estimate_tokens
+from src.services.context_compressor import get_context_compressor
+from src.tool.context_packer import pack_context, render_document
+from src.config import LLM_TOKEN_LIMIT, CONTEXT_COMPRESSION, TOKEN_ESTIMATE_SAFE_RATIO
+from src.llm.prompts.rag_answer import RAG_CHAT_PROMPT, RAG_CONTEXT_TEMPLATE
 from src.schema.schemas import ChatResponse
 
 
@@ -68,44 +70,70 @@ class RAGService:
                 "references": [], 
             }
 
-        # --- 步驟 4: 將文件組裝成文字 (XML 格式，與 tool.py 一致) ---
-        context_text = ""
-        for idx, doc in enumerate(final_results, 1):
-            title = doc.get("title", "No Title")
-            link = doc.get("heading_link") or doc.get("link", "")
-            content = doc.get("content") or doc.get("cleaned_content") or ""
-            year = doc.get("year", "")
-            year_month = doc.get("year_month", "")
-            website = doc.get("website", "")
-
-            context_text += f'<document index="{idx}">\n'
-            context_text += f"<title>{title}</title>\n"
-            context_text += f"<year_month>{year_month}</year_month>\n"
-            context_text += f"<year>{year}</year>\n"
-            context_text += f"<website>{website}</website>\n"
-            context_text += f"<content>{content}</content>\n"
-            context_text += f"</document>\n\n"
-
-        # --- 步驟 5: Token 統計與超限檢查 ---
+        # --- 步驟 4: Token 統計，扣除固定部分後剩下的才是參考資料的預算 ---
+        # 長文字的 token 數會被記憶，對話歷史與同一批參考資料在後續回合不需重新計算
         current_date = datetime.now().strftime("%Y-%m-%d")
-        system_content = RAG_CHAT_PROMPT.format(context=context_text, current_date=current_date)
-
-        token_system = count_tokens(system_content)
-        token_context = count_tokens(context_text)
-        token_user = count_tokens(user_query)
-
-        token_history = 0
-        if history:
-            for msg in history:
-                content = msg.get("content", "")
-                if content:
-                    token_history += count_tokens(content)
+        static_texts = [
+            RAG_CHAT_PROMPT,
+            RAG_CONTEXT_TEMPLATE.format(context="", current_date=current_date),
+        ]
+        history_texts = [
+            msg.get("content", "") for msg in history or [] if msg.get("content", "")
+        ]
+
+        # --- 步驟 5: 依相關性 / token 比裝入參考資料 (XML 格式，與 tool.py 一致) ---
+        # 壓縮只影響送進 LLM 的內容，references 仍回傳原始文件
+        context_docs = final_results
+        if CONTEXT_COMPRESSION:
+            context_docs = get_context_compressor().compress(user_query, final_results)
+
+        # 保留原始編號，引用 [n] 才能對應到前端的結果順序
+        rendered = [render_document(idx, doc) for idx, doc in enumerate(context_docs, 1)]
+        estimated_total = sum(
+            estimate_tokens(text) for text in static_texts + history_texts + rendered + [user_query]
+        )
+        token_estimated = estimated_total <= LLM_TOKEN_LIMIT * TOKEN_ESTIMATE_SAFE_RATIO
+
+        if token_estimated:
+            # 估算值遠低於上限：全部放入，不做精確 tokenize
+            token_static = sum(estimate_tokens(text) for text in static_texts)
+            token_user = estimate_tokens(user_query)
+            token_history = sum(estimate_tokens(text) for text in history_texts)
+            token_context = sum(estimate_tokens(text) for text in rendered)
+            packed = {
+                "documents": list(enumerate(context_docs, 1)),
+                "packed_tokens": token_context,
+                "discarded_tokens": 0,
+                "truncated_count": 0,
+            }
+            context_text = "".join(rendered)
+        else:
+            counts = count_tokens_batch(static_texts + history_texts + [user_query])
+            token_static = sum(counts[: len(static_texts)])
+            token_history = sum(counts[len(static_texts) : -1])
+            token_user = counts[-1]
+            context_budget = LLM_TOKEN_LIMIT - token_static - token_user - token_history
+            packed = pack_context(context_docs, max(0, context_budget))
+            # 各篇 token 數由 pack_context 計算 (含 XML 標籤)，不再對組合後的 context 重新 tokenize
+            token_context = packed["packed_tokens"]
+            context_text = "".join(
+                render_document(idx, doc) for idx, doc in packed["documents"]
+            )
 
+        context_content = RAG_CONTEXT_TEMPLATE.format(
+            context=context_text, current_date=current_date
+        )
+        token_system = token_static + token_context
         total_tokens = token_system + token_user + token_history
 
-        print(f"   Token Usage: system={token_system}, context={token_context}, user={token_user}, history={token_history}, total={total_tokens}")
+        print(f"   Token Usage: system={token_system}, context={token_context}, user={token_user}, history={token_history}, total={total_tokens}, estimated={token_estimated}")
+        print(
+            f"   Context packed: {len(packed['documents'])}/{len(final_results)} docs, "
+            f"truncated={packed['truncated_count']}, discarded={packed['discarded_tokens']} tokens"
+        )
 
-        if total_tokens > LLM_TOKEN_LIMIT:
+        # 對話歷史本身就超過限制，或預算小到連一篇截斷的文件都放不下
+        if total_tokens > LLM_TOKEN_LIMIT or not packed["documents"]:
             print(f"   Token limit exceeded: {total_tokens} > {LLM_TOKEN_LIMIT}")
             return {
                 "error": f"Token 使用量 ({total_tokens:,}) 超過限制 ({LLM_TOKEN_LIMIT:,})，請清除對話歷史或降低相似度閾值",
@@ -115,6 +143,8 @@ class RAGService:
                     "context": token_context,
                     "history": token_history,
                     "user": token_user,
+                    "discarded": packed["discarded_tokens"],
+                    "estimated": token_estimated,
                 },
                 "suggestions": ["清除對話歷史", "降低相似度閾值", "減少參考文章數量"],
             }
@@ -122,7 +152,11 @@ class RAGService:
         # --- 步驟 6: 呼叫 LLM (生成回答 + 建議) ---
         print("   Calling LLM for Answer & Suggestions (Schema Mode)...")
 
-        messages = [{"role": "system", "content": system_content}]
+        # 固定指令 -> context -> 對話歷史 -> 本次問題，變動越頻繁的內容越靠後
+        messages = [
+            {"role": "system", "content": RAG_CHAT_PROMPT},
+            {"role": "system", "content": context_content},
+        ]
 
         if history:
             for msg in history:
@@ -166,12 +200,14 @@ class RAGService:
         return {
             "answer": answer_text,
             "suggestions": suggestions,
-            "references": final_results,
+            "references": [final_results[idx - 1] for idx, _ in packed["documents"]],
             "token_usage": {
                 "total": total_tokens,
                 "system": token_system,
                 "context": token_context,
                 "history": token_history,
                 "user": token_user,
+                "discarded": packed["discarded_tokens"],
+                "estimated": token_estimated,
             }
         }
\ No newline at end of file
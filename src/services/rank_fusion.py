@@ -0,0 +1,166 @@
+"""
+Reciprocal-rank fusion across sub-query result sets, and the adaptive per-query fetch limit.
+
+原本只保留每個 id 第一次出現的結果，丟掉了「同一篇在多個子查詢都排名靠前」的證據。
+fuse_result_sets 以 RRF (1 / (k + rank)) 累計其他子查詢的名次，作為補足到 1.0 的加權：
+    fused = best + FUSION_BOOST_FACTOR * support * (1 - best)
+best 為各子查詢中最高的 _rankingScore，support 為其餘子查詢的 RRF 總和 (正規化到 0~1)。
+只有一個子查詢時 support 為 0，分數與原本相同。
+
+融合後，最終結果通常只用到每個子查詢的前段名次；AdaptiveFetchTuner 觀察實際用到的最深名次，
+確認尾端長期用不到時逐步縮小每個子查詢的 fetch limit，用到尾端時再放大。
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import (
+    ADAPTIVE_FETCH_LIMIT,
+    FUSION_BOOST_FACTOR,
+    RRF_K,
+)
+
+
+def fuse_result_sets(
+    result_sets: List[List[Dict[str, Any]]],
+    k: int = RRF_K,
+    boost: float = FUSION_BOOST_FACTOR,
+) -> List[Dict[str, Any]]:
+    """
+    合併多個子查詢的 hits (依 id 去重)，回傳依融合分數排序的文件。
+    每篇保留分數最高的那筆 hit，並寫入:
+        _rankingScore: 融合後分數 (原始最高分另存於 _meili_score)
+        _best_rank: 各子查詢中最好的名次 (1-based)
+        _fusion_hits: 出現在幾個子查詢中
+    """
+    docs: List[Dict[str, Any]] = []
+    index: Dict[str, int] = {}
+    entries = []  # (doc 索引, 子查詢索引, 名次, 分數)
+
+    for set_idx, hits in enumerate(result_sets):
+        for rank, hit in enumerate(hits, 1):
+            doc_id = hit.get("id")
+            if not doc_id:
+                continue
+            pos = index.get(doc_id)
+            if pos is None:
+                pos = index[doc_id] = len(docs)
+                docs.append(hit)
+            elif hit.get("_rankingScore", 0) > docs[pos].get("_rankingScore", 0):
+                docs[pos] = hit
+            entries.append((pos, set_idx, rank, hit.get("_rankingScore", 0.0)))
+
+    if not docs:
+        return []
+
+    n_docs, n_sets = len(docs), max(1, len(result_sets))
+    pos, set_idx, ranks, scores = (np.array(col) for col in zip(*entries))
+
+    # 同一子查詢內重複的 id 只取最好的名次
+    best_rank_matrix = np.full((n_docs, n_sets), np.inf)
+    np.minimum.at(best_rank_matrix, (pos, set_idx), ranks.astype(float))
+    reciprocal = np.where(np.isfinite(best_rank_matrix), 1.0 / (k + best_rank_matrix), 0.0)
+
+    best_score = np.zeros(n_docs)
+    np.maximum.at(best_score, pos, scores.astype(float))
+    best_score = np.clip(best_score, 0.0, 1.0)
+
+    # support：扣掉最好那一次的名次後，其餘子查詢的 RRF 總和，以「全部都第 1 名」正規化
+    others = reciprocal.sum(axis=1) - reciprocal.max(axis=1)
+    support = others / ((n_sets - 1) / (k + 1)) if n_sets > 1 else np.zeros(n_docs)
+    fused = best_score + boost * support * (1.0 - best_score)
+
+    best_rank = best_rank_matrix.min(axis=1)
+    fusion_hits = np.isfinite(best_rank_matrix).sum(axis=1)
+
+    results = []
+    for i in np.argsort(-fused, kind="stable"):
+        doc = docs[i]
+        doc["_meili_score"] = doc.get("_rankingScore", 0.0)
+        doc["_rankingScore"] = float(fused[i])
+        doc["_best_rank"] = int(best_rank[i])
+        doc["_fusion_hits"] = int(fusion_hits[i])
+        results.append(doc)
+    return results
+
+
+class AdaptiveFetchTuner:
+    """
+    依「最終結果實際用到的最深名次 / fetch limit」調整每個子查詢的 fetch 比例。
+    累積 min_samples 筆後，p95 低於 headroom 表示尾端用不到 → 縮小 step；
+    高於 tail 表示結果常來自尾端 → 放大 step (最多回到 1.0)。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ADAPTIVE_FETCH_LIMIT,
+        min_samples: int = 50,
+        min_scale: float = 0.4,
+        step: float = 0.1,
+        headroom: float = 0.5,
+        tail: float = 0.85,
+    ):
+        self.enabled = enabled
+        self.min_samples = min_samples
+        self.min_scale = min_scale
+        self.step = step
+        self.headroom = headroom
+        self.tail = tail
+        self.scale = 1.0
+        self._samples = deque(maxlen=min_samples)
+        self._lock = threading.Lock()
+        self._stats = {"samples": 0, "shrinks": 0, "grows": 0}
+
+    def fetch_limit(self, base_limit: int, result_limit: int) -> int:
+        """縮放後的 fetch limit，至少為結果數的兩倍 (合併同連結的片段後仍足夠)"""
+        if not self.enabled:
+            return base_limit
+        with self._lock:
+            scale = self.scale
+        return min(base_limit, max(int(base_limit * scale), result_limit * 2))
+
+    def record(self, fetch_limit: int, deepest_rank: int) -> None:
+        """記錄一次搜尋 (僅在子查詢回傳滿 fetch_limit 筆、即有被截斷時才有參考價值)"""
+        if not self.enabled or fetch_limit <= 0:
+            return
+        with self._lock:
+            self._stats["samples"] += 1
+            self._samples.append(deepest_rank / fetch_limit)
+            if len(self._samples) < self.min_samples:
+                return
+            p95 = float(np.percentile(self._samples, 95))
+            if p95 < self.headroom and self.scale > self.min_scale:
+                self.scale = max(self.min_scale, round(self.scale - self.step, 3))
+                self._stats["shrinks"] += 1
+            elif p95 > self.tail and self.scale < 1.0:
+                self.scale = min(1.0, round(self.scale + self.step, 3))
+                self._stats["grows"] += 1
+            else:
+                return
+            # 調整後重新觀察
+            self._samples.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["scale"] = self.scale
+            stats["pending_samples"] = len(self._samples)
+        stats["enabled"] = self.enabled
+        return stats
+
+
+_fetch_tuner: Optional[AdaptiveFetchTuner] = None
+_fetch_tuner_lock = threading.Lock()
+
+
+def get_fetch_tuner() -> AdaptiveFetchTuner:
+    """取得行程共用的 fetch limit tuner"""
+    global _fetch_tuner
+    if _fetch_tuner is None:
+        with _fetch_tuner_lock:
+            if _fetch_tuner is None:
+                _fetch_tuner = AdaptiveFetchTuner()
+    return _fetch_tuner
@@ -0,0 +1,100 @@
+"""
+Server-side result sessions.
+
+/api/search 完成時將最終結果登記為一個 result set，回傳 result_set_id；
+/api/chat 只需傳 result_set_id 與選取的文件 id，不必每回合把完整內容 (含合併後的 content) 傳回後端。
+記憶體內 LRU + TTL，過期或被淘汰時 /api/chat 回傳 410，由前端改為傳送完整 context。
+session 只存在於處理該次搜尋的行程；多 worker 部署時落到其他 worker 的對話同樣以 410 回退。
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+RESULT_SESSION_TTL = float(os.getenv("RESULT_SESSION_TTL", 3600))
+RESULT_SESSION_MAX_ENTRIES = int(os.getenv("RESULT_SESSION_MAX_ENTRIES", 500))
+
+
+class ResultSessionStore:
+    def __init__(
+        self,
+        max_entries: int = RESULT_SESSION_MAX_ENTRIES,
+        ttl: float = RESULT_SESSION_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._stats = {
+            "registered": 0,
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    def register(self, results: List[Dict[str, Any]]) -> str:
+        """登記一組搜尋結果 (保留原順序)，回傳 result_set_id"""
+        result_set_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[result_set_id] = (time.time() + self.ttl, list(results))
+            self._stats["registered"] += 1
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+        return result_set_id
+
+    def get(self, result_set_id: str) -> Optional[List[Dict[str, Any]]]:
+        """取得結果列表；不存在或已過期時回傳 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(result_set_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, results = entry
+            if expires_at <= now:
+                del self._sessions[result_set_id]
+                self._stats["expired"] += 1
+                return None
+            self._sessions.move_to_end(result_set_id)
+            self._stats["hits"] += 1
+            return results
+
+    def select(
+        self, result_set_id: str, doc_ids: List[str]
+    ) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+        """
+        依 doc_ids 的順序取出文件，回傳 [(在結果中的排名 1-based, 文件)]；
+        不在結果中的 id 會被略過。result set 不存在或已過期時回傳 None。
+        """
+        results = self.get(result_set_id)
+        if results is None:
+            return None
+        by_id = {doc.get("id"): (rank, doc) for rank, doc in enumerate(results, 1)}
+        return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._sessions)
+        stats["max_entries"] = self.max_entries
+        stats["ttl_s"] = self.ttl
+        return stats
+
+
+_result_session_store: Optional[ResultSessionStore] = None
+_result_session_store_lock = threading.Lock()
+
+
+def get_result_session_store() -> ResultSessionStore:
+    """取得行程共用的 result session store"""
+    global _result_session_store
+    if _result_session_store is None:
+        with _result_session_store_lock:
+            if _result_session_store is None:
+                _result_session_store = ResultSessionStore()
+    return _result_session_store
@@ -1,22 +1,39 @@
 from typing import Dict, Any, Optional, List
 from src.llm.client import LLMClient
-from src.llm.search_prompts import SEARCH_INTENT_PROMPT
+from src.llm.scheduler import get_llm_scheduler
+from src.llm.search_prompts import SEARCH_INTENT_PROMPT, SEARCH_INTENT_USER_TEMPLATE
 from src.schema.schemas import SearchIntent
 from src.database.db_adapter_meili import MeiliAdapter, build_meili_filter
 from src.database import vector_utils
+from src.database.vector_projection import project_vector
 from src.config import (
     MEILISEARCH_HOST,
     MEILISEARCH_API_KEY,
     MEILISEARCH_INDEX,
     get_pre_search_limit,
+    get_candidate_window,
     RETRY_SEARCH_LIMIT_MULTIPLIER,
+    TWO_PHASE_FETCH,
     MAX_SEARCH_LIMIT,
     MEILISEARCH_TIMEOUT,
+    DEADLINE_INTENT_MIN,
+    VECTOR_RERANK,
+    VECTOR_RERANK_WEIGHT,
 )
+from src.tool.deadline import Deadline
 from meilisearch_config import DEFAULT_SEMANTIC_RATIO
 from datetime import datetime
 from src.tool.ANSI import print_red
 from src.services.keyword_alg import ResultReranker
+from src.services.merged_results import MergedDocument
+from src.services.vector_rerank import vector_rerank
+from src.services.rank_fusion import fuse_result_sets, get_fetch_tuner
+from src.services.candidate_fetch import (
+    CANDIDATE_ATTRIBUTES,
+    get_candidate_fetch_stats,
+    hydrate,
+    widen_reason,
+)
 import traceback
 
 
@@ -47,9 +64,11 @@ class SearchService:
             print_red(msg)
             return msg
 
-    def _check_embedding_service(self, test_text: str = "test") -> str | None:
+    def _check_embedding_service(
+        self, test_text: str = "test", timeout: Optional[float] = None
+    ) -> str | None:
         try:
-            result = vector_utils.get_embedding(test_text)
+            result = vector_utils.get_embedding(test_text, timeout=timeout)
             if result.get("status") == "failed":
                 return result.get("error")
             if not result.get("result"):
@@ -76,29 +95,28 @@ class SearchService:
         history: List[str] = None,
         direction: str = "",
         website: List[str] = None,
+        timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
         try:
             previous_queries_str = str(history) if history else "None"
             website_str = ", ".join(website) if website else "All Sources"
-            system_prompt = SEARCH_INTENT_PROMPT.format(
+            # system prompt 保持固定，日期 / 歷史 / 方向等變動資料放在 user message
+            user_content = SEARCH_INTENT_USER_TEMPLATE.format(
                 current_date=datetime.now().strftime("%Y-%m-%d"),
                 previous_queries=previous_queries_str,
                 direction=direction or "",
                 website=website_str,
+                user_query=user_query,
             )
-
-            if website:
-                user_content = f"User Request: {user_query}\nContext - Selected website: {website_str}"
-            else:
-                user_content = user_query
             messages = [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SEARCH_INTENT_PROMPT},
                 {"role": "user", "content": user_content},
             ]
             result = self.llm_client.call_with_schema(
                 messages=messages,
                 response_model=SearchIntent,
                 temperature=0.0,
+                timeout=timeout,
             )
             return result
         except Exception as e:
@@ -110,13 +128,21 @@ class SearchService:
             }
 
     def _validate_and_init_services(
-        self, semantic_ratio: float, manual_semantic_ratio: bool, enable_llm: bool
+        self,
+        semantic_ratio: float,
+        manual_semantic_ratio: bool,
+        enable_llm: bool,
+        deadline: Deadline,
     ) -> None:
         if err := self._init_meilisearch():
             raise RuntimeError(f"Meilisearch: {err}")
 
         if semantic_ratio > 0 or not manual_semantic_ratio:
-            if err := self._check_embedding_service():
+            if err := self._check_embedding_service(
+                timeout=deadline.cap(vector_utils.EMBEDDING_QUERY_TIMEOUT)
+            ):
+                raise RuntimeError(f"Embedding: {err}")
+            if err := self.meili_adapter.check_embedding_version():
                 raise RuntimeError(f"Embedding: {err}")
 
         if enable_llm:
@@ -132,18 +158,39 @@ class SearchService:
         direction: str,
         traces: List[str],
         website: List[str] = None,
+        deadline: Optional[Deadline] = None,
+        degradations: Optional[List[str]] = None,
     ) -> tuple[SearchIntent, Optional[str]]:
         llm_error = None
         intent = None
+        deadline = deadline or Deadline()
+
+        if enable_llm and not deadline.has(DEADLINE_INTENT_MIN):
+            # 剩餘時間不足以等待意圖解析，直接以原始查詢搜尋
+            traces.append("Warning: deadline nearly exhausted, skipping LLM intent parsing")
+            if degradations is not None:
+                degradations.append("intent_skipped")
+            enable_llm = False
+
+        if enable_llm and not get_llm_scheduler().available():
+            # LLM 熔斷中：不等待逾時，直接使用非 LLM 的意圖
+            llm_error = "LLM temporarily unavailable, using non-LLM intent"
+            traces.append(f"Warning: {llm_error}")
+            print_red(llm_error)
+            enable_llm = False
 
         if enable_llm:
             intent_result = self.parse_intent(
-                user_query, history=history, direction=direction, website=website
+                user_query,
+                history=history,
+                direction=direction,
+                website=website,
+                timeout=deadline.cap(None),
             )
             if intent_result.get("status") == "failed":
                 llm_error = intent_result.get("error")
                 print_red(f"LLM Intent parsing failed: {llm_error}")
-                if not fall_back:
+                if not fall_back and intent_result.get("stage") != "llm_unavailable":
                     raise RuntimeError(llm_error)
             else:
                 intent = intent_result.get("result")
@@ -251,35 +298,40 @@ class SearchService:
         semantic_ratio: float,
         meili_filter: Optional[str],
         is_retry_search: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
         final_kw_query = query_text
         vector = None
+        deadline = deadline or Deadline()
 
         if semantic_ratio > 0:
             text_for_embedding = query_text
             if query_text == intent.keyword_query and intent.semantic_query:
                 text_for_embedding = intent.semantic_query
 
-            embedding_result = vector_utils.get_embedding(text_for_embedding)
+            embedding_result = vector_utils.get_embedding(
+                text_for_embedding,
+                timeout=deadline.cap(vector_utils.EMBEDDING_QUERY_TIMEOUT),
+            )
             if embedding_result.get("status") == "success":
-                vector = embedding_result.get("result")
+                vector = project_vector(embedding_result.get("result"))
             else:
                 print_red(
                     f"Embedding failed for '{query_text}': {embedding_result.get('error')}"
                 )
 
-        # Calculate limit based on retry status
-        base_limit = get_pre_search_limit(current_limit)
-        final_limit = int(base_limit * RETRY_SEARCH_LIMIT_MULTIPLIER) if is_retry_search else base_limit
-
         search_params = {
             "indexUid": MEILISEARCH_INDEX,
             "q": final_kw_query,
-            "limit": final_limit,
+            "limit": self._fetch_limit(current_limit, is_retry_search, widened=not TWO_PHASE_FETCH),
             "attributesToRetrieve": ["*"],
             "showRankingScore": True,
             "showRankingScoreDetails": True,
         }
+        if TWO_PHASE_FETCH:
+            # 第一階段只取 id / 分數與合併判斷需要的欄位，完整文件 (與向量) 在第二階段才取回
+            search_params["attributesToRetrieve"] = CANDIDATE_ATTRIBUTES
+            search_params["showRankingScoreDetails"] = False
 
         if meili_filter:
             search_params["filter"] = meili_filter
@@ -290,44 +342,186 @@ class SearchService:
                 "embedder": "default",
             }
             search_params["vector"] = vector
+            if VECTOR_RERANK and not TWO_PHASE_FETCH:
+                # 候選向量隨結果回傳，供 vector rerank 使用 (兩階段時由 _fetch_full_documents 取回)
+                search_params["retrieveVectors"] = True
 
         return search_params
 
-    def _deduplicate_hits(self, raw_hits_batch: List[Dict]) -> List[Dict[str, Any]]:
-        all_hits = []
-        seen_ids = set()
-
-        for result_set in raw_hits_batch:
-            hits = result_set.get("hits", [])
-            for hit in hits:
-                doc_id = hit.get("id")
-                if doc_id and doc_id not in seen_ids:
-                    seen_ids.add(doc_id)
-                    all_hits.append(hit)
-
-        return all_hits
+    def _fetch_limit(self, current_limit: int, is_retry_search: bool, widened: bool) -> int:
+        # Calculate limit based on retry status；widened 為原本的 fetch limit (fusion 品質確認後依 tuner 縮小)
+        if widened:
+            base_limit = get_fetch_tuner().fetch_limit(
+                get_pre_search_limit(current_limit), current_limit
+            )
+        else:
+            base_limit = get_candidate_window(current_limit)
+        return int(base_limit * RETRY_SEARCH_LIMIT_MULTIPLIER) if is_retry_search else base_limit
+
+    def _fuse_hits(self, raw_hits_batch: List[Dict]) -> List[Dict[str, Any]]:
+        # 以 RRF 合併各子查詢的名次，多個子查詢都排名靠前的文件分數較高
+        return fuse_result_sets([result_set.get("hits", []) for result_set in raw_hits_batch])
+
+    def _is_truncated(
+        self, multi_search_queries: List[Dict[str, Any]], raw_hits_batch: List[Dict]
+    ) -> bool:
+        return any(
+            len(result_set.get("hits", [])) >= params["limit"]
+            for params, result_set in zip(multi_search_queries, raw_hits_batch)
+        )
 
-    def _rerank_and_merge_results(
+    def _record_fetch_depth(
+        self,
+        multi_search_queries: List[Dict[str, Any]],
+        raw_hits_batch: List[Dict],
+        final_results: List[Dict[str, Any]],
+    ) -> None:
+        # 只有子查詢被 limit 截斷時，最終結果用到的最深名次才能反映 fetch limit 是否足夠
+        if not self._is_truncated(multi_search_queries, raw_hits_batch) or not final_results:
+            return
+        deepest_rank = max(doc.get("_best_rank", 0) for doc in final_results)
+        fetch_limit = max(params["limit"] for params in multi_search_queries)
+        get_fetch_tuner().record(fetch_limit, deepest_rank)
+
+    def _rerank_candidates(
         self,
         all_hits: List[Dict[str, Any]],
         intent: SearchIntent,
         limit: int,
         enable_llm: bool,
+        query_vector: Optional[List[float]] = None,
+        traces: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
         pre_merge_limit = round(limit * 2.5)
+        use_vector_rerank = VECTOR_RERANK and query_vector is not None
 
         reranker = ResultReranker(all_hits, intent.must_have_keywords)
         reranked_results = reranker.rerank(
-            top_k=pre_merge_limit,
+            # vector rerank 需要先看過所有候選再截斷
+            top_k=None if use_vector_rerank else pre_merge_limit,
             enable_llm=enable_llm,
         )
 
+        if use_vector_rerank:
+            reranked_count = vector_rerank(
+                reranked_results, query_vector, VECTOR_RERANK_WEIGHT
+            )
+            if traces is not None:
+                traces.append(f"Vector rerank applied to {reranked_count} candidates.")
+
         if reranked_results and "_rerank_score" in reranked_results[0]:
             reranked_results.sort(key=lambda x: x.get("_rerank_score", 0), reverse=True)
+        return reranked_results[:pre_merge_limit]
 
-        merged_results = self._merge_duplicate_links(reranked_results)
+    def _merge_candidates(
+        self, candidates: List[Dict[str, Any]], limit: int
+    ) -> List[Dict[str, Any]]:
+        # keyword_signature / _vectors 只供 rerank 使用，不回傳給前端 / LLM
+        for doc in candidates:
+            doc.pop("keyword_signature", None)
+            doc.pop("_vectors", None)
+
+        merged_results = self._merge_duplicate_links(candidates)
         return merged_results[:limit]
 
+    def _rerank_and_merge_results(
+        self,
+        all_hits: List[Dict[str, Any]],
+        intent: SearchIntent,
+        limit: int,
+        enable_llm: bool,
+        query_vector: Optional[List[float]] = None,
+        traces: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        candidates = self._rerank_candidates(
+            all_hits, intent, limit, enable_llm, query_vector, traces
+        )
+        return self._merge_candidates(candidates, limit)
+
+    def _fetch_full_documents(
+        self, ids: List[str], deadline: Deadline
+    ) -> Dict[str, Any]:
+        # 以 id 一次取回完整文件 (與搜尋共用 multi_search 與 deadline)
+        if not ids:
+            return {"status": "success", "result": []}
+        ids_str = ", ".join([f'"{doc_id}"' for doc_id in ids])
+        params = {
+            "indexUid": MEILISEARCH_INDEX,
+            "q": "",
+            "filter": f"id IN [{ids_str}]",
+            "limit": len(ids),
+            "attributesToRetrieve": ["*"],
+        }
+        if VECTOR_RERANK:
+            # 只為選出的候選取回向量，供第二階段 vector rerank 使用
+            params["retrieveVectors"] = True
+        batch_result = self.meili_adapter.multi_search(
+            [params], timeout=deadline.cap(None)
+        )
+        if batch_result.get("status") == "failed":
+            return batch_result
+        results = batch_result.get("result", {}).get("results", [])
+        return {"status": "success", "result": results[0].get("hits", []) if results else []}
+
+    def _select_candidates(
+        self, raw_hits_batch: List[Dict], limit: int
+    ) -> List[Dict[str, Any]]:
+        # 第一階段沒有內容可比對關鍵字，只依融合後的分數選出要取回完整文件的前 N 筆
+        all_hits = self._fuse_hits(raw_hits_batch)
+        all_hits.sort(key=lambda x: x.get("_rankingScore", 0), reverse=True)
+        return all_hits[: round(limit * 2.5)]
+
+    def _two_phase_results(
+        self,
+        multi_search_queries: List[Dict[str, Any]],
+        raw_hits_batch: List[Dict],
+        intent: SearchIntent,
+        limit: int,
+        enable_llm: bool,
+        is_retry_search: bool,
+        deadline: Deadline,
+        traces: List[str],
+    ) -> Dict[str, Any]:
+        candidates = self._select_candidates(raw_hits_batch, limit)
+        fetched = sum(len(r.get("hits", [])) for r in raw_hits_batch)
+
+        reason = None
+        if self._is_truncated(multi_search_queries, raw_hits_batch):
+            reason = widen_reason(candidates, limit)
+        if reason:
+            wide_limit = self._fetch_limit(limit, is_retry_search, widened=True)
+            traces.append(f"Candidate window widened to {wide_limit} ({reason}).")
+            for params in multi_search_queries:
+                params["limit"] = wide_limit
+            batch_result = self.meili_adapter.multi_search(
+                multi_search_queries, timeout=deadline.cap(None)
+            )
+            if batch_result.get("status") == "failed":
+                return batch_result
+            raw_hits_batch = batch_result.get("result", {}).get("results", [])
+            candidates = self._select_candidates(raw_hits_batch, limit)
+            fetched += sum(len(r.get("hits", [])) for r in raw_hits_batch)
+
+        # 第二階段：取回選出候選的完整文件，再以內容做關鍵字 (與向量) rerank
+        full_result = self._fetch_full_documents([c["id"] for c in candidates], deadline)
+        if full_result.get("status") == "failed":
+            return full_result
+        candidates = hydrate(candidates, full_result["result"])
+        get_candidate_fetch_stats().record(reason, fetched, len(candidates))
+
+        final_results = self._rerank_and_merge_results(
+            candidates,
+            intent,
+            limit,
+            enable_llm,
+            query_vector=multi_search_queries[0].get("vector"),
+            traces=traces,
+        )
+        if reason:
+            # tuner 只調整擴大後的 fetch limit
+            self._record_fetch_depth(multi_search_queries, raw_hits_batch, final_results)
+        return {"status": "success", "result": final_results}
+
     def _build_response(
         self,
         intent: SearchIntent,
@@ -336,6 +530,7 @@ class SearchService:
         meili_filter: Optional[str],
         traces: List[str],
         llm_error: Optional[str],
+        degradations: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
         response = {
             "status": "success",
@@ -350,6 +545,8 @@ class SearchService:
         }
         if llm_error:
             response["llm_warning"] = llm_error
+        if degradations:
+            response["degradations"] = degradations
 
         return response
 
@@ -358,43 +555,30 @@ class SearchService:
     ) -> List[Dict[str, Any]]:
         if not results:
             return []
-        link_to_doc = {}
+        link_to_doc: Dict[str, MergedDocument] = {}
         merged_results = []
         for doc in results:
             link = doc.get("link")
-            doc_id = doc.get("id")
-
-            # 初始化 all_ids 欄位
-            if "all_ids" not in doc:
-                doc["all_ids"] = [doc_id] if doc_id else []
 
             if not link:
+                # 初始化 all_ids 欄位
+                if "all_ids" not in doc:
+                    doc["all_ids"] = [doc["id"]] if doc.get("id") else []
                 merged_results.append(doc)
                 continue
 
-            if link not in link_to_doc:
-                link_to_doc[link] = doc
-                merged_results.append(doc)
+            existing_doc = link_to_doc.get(link)
+            if existing_doc is None:
+                link_to_doc[link] = MergedDocument(doc)
+                merged_results.append(link_to_doc[link])
             else:
-                existing_doc = link_to_doc[link]
-
-                # 合併 ID 列表
-                if doc_id and doc_id not in existing_doc["all_ids"]:
-                    existing_doc["all_ids"].append(doc_id)
-
-                # 合併內容
-                existing_content = existing_doc.get("content", "")
-                new_content = doc.get("content", "")
-                if new_content and new_content not in existing_content:
-                    existing_doc["content"] = (
-                        f"{existing_content}\n\n --- \n\n{new_content}"
-                    )
-                    
-                    # 合併 token 計數
-                    existing_token = existing_doc.get("token", 0)
-                    new_token = doc.get("token", 0)
-                    existing_doc["token"] = existing_token + new_token
-        return merged_results
+                # 合併 ID 與內容 (以 chunk id / 內容去重，content 最後才組合)
+                existing_doc.merge(doc)
+
+        return [
+            d.materialize() if isinstance(d, MergedDocument) else d
+            for d in merged_results
+        ]
 
     def search(
         self,
@@ -411,14 +595,21 @@ class SearchService:
         end_date: Optional[str] = None,
         website: List[str] = None,
         is_retry_search: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
+        """
+        deadline 為整個請求的時間預算：embedding / LLM / Meilisearch 呼叫的 timeout 皆受剩餘時間限制，
+        剩餘時間不足時略過意圖解析 (記錄於回應的 degradations)。
+        """
 
         limit = min(limit, MAX_SEARCH_LIMIT)
         traces = []
+        degradations = []
+        deadline = deadline or Deadline()
 
         try:
             self._validate_and_init_services(
-                semantic_ratio, manual_semantic_ratio, enable_llm
+                semantic_ratio, manual_semantic_ratio, enable_llm, deadline
             )
 
             intent, llm_error = self._parse_search_intent(
@@ -429,6 +620,8 @@ class SearchService:
                 direction,
                 traces,
                 website=website,
+                deadline=deadline,
+                degradations=degradations,
             )
 
             if intent.limit is not None:
@@ -450,27 +643,71 @@ class SearchService:
             )
 
             multi_search_queries = [
-                self._build_single_query_params(limit, q, intent, semantic_ratio, meili_filter, is_retry_search)
+                self._build_single_query_params(
+                    limit, q, intent, semantic_ratio, meili_filter, is_retry_search, deadline
+                )
                 for q in query_candidates
             ]
 
             if not multi_search_queries:
                 return self._build_response(
-                    intent, [], semantic_ratio, meili_filter, traces, llm_error
+                    intent, [], semantic_ratio, meili_filter, traces, llm_error, degradations
                 )
 
-            batch_result = self.meili_adapter.multi_search(multi_search_queries)
+            batch_result = self.meili_adapter.multi_search(
+                multi_search_queries, timeout=deadline.cap(None)
+            )
             if batch_result.get("status") == "failed":
                 return batch_result
 
             raw_hits_batch = batch_result.get("result", {}).get("results", [])
-            all_hits = self._deduplicate_hits(raw_hits_batch)
+            if len(raw_hits_batch) > 1:
+                traces.append(
+                    f"Fusing hits from {len(raw_hits_batch)} sub-queries (RRF)."
+                )
+
+            if TWO_PHASE_FETCH:
+                fetch_result = self._two_phase_results(
+                    multi_search_queries,
+                    raw_hits_batch,
+                    intent,
+                    limit,
+                    enable_llm,
+                    is_retry_search,
+                    deadline,
+                    traces,
+                )
+                if fetch_result.get("status") == "failed":
+                    return fetch_result
+                return self._build_response(
+                    intent,
+                    fetch_result["result"],
+                    semantic_ratio,
+                    meili_filter,
+                    traces,
+                    llm_error,
+                    degradations,
+                )
+
+            all_hits = self._fuse_hits(raw_hits_batch)
             final_results = self._rerank_and_merge_results(
-                all_hits, intent, limit, enable_llm
+                all_hits,
+                intent,
+                limit,
+                enable_llm,
+                query_vector=multi_search_queries[0].get("vector"),
+                traces=traces,
             )
+            self._record_fetch_depth(multi_search_queries, raw_hits_batch, final_results)
 
             return self._build_response(
-                intent, final_results, semantic_ratio, meili_filter, traces, llm_error
+                intent,
+                final_results,
+                semantic_ratio,
+                meili_filter,
+                traces,
+                llm_error,
+                degradations,
             )
 
         except Exception as e:
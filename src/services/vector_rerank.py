@@ -0,0 +1,63 @@
+"""
+Second-stage vector rerank.
+
+Hybrid search 的 _rankingScore 混合了關鍵字與向量排序的名次，並非實際相似度。
+此階段以 Meilisearch 回傳的候選向量 (retrieveVectors) 與查詢向量計算精確 cosine，
+一次矩陣乘法完成所有候選，再依 VECTOR_RERANK_WEIGHT 混入 _rerank_score。
+不額外發出網路請求：向量隨搜尋結果一起回傳。
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def extract_vector(hit: Dict[str, Any], embedder: str = "default") -> Optional[Sequence[float]]:
+    """
+    取出 hit 中 retrieveVectors 回傳的向量。
+    Meilisearch 格式為 {"default": {"embeddings": [[...]], "regenerate": false}}，
+    也接受 {"default": [...]} 或 {"default": [[...]]}。
+    """
+    vectors = hit.get("_vectors")
+    if not isinstance(vectors, dict):
+        return None
+    value = vectors.get(embedder)
+    if isinstance(value, dict):
+        value = value.get("embeddings")
+    if value is None or len(value) == 0:
+        return None
+    if isinstance(value[0], (list, tuple, np.ndarray)):
+        value = value[0]
+    return value
+
+
+def vector_rerank(
+    hits: List[Dict[str, Any]], query_vector: Sequence[float], weight: float
+) -> int:
+    """
+    以 cosine(查詢, 候選) 調整 _rerank_score：(1 - weight) * 原分數 + weight * max(cosine, 0)。
+    沒有向量的候選維持原分數。所有 hit 的 _vectors 都會被移除 (不回傳給前端)。
+    回傳實際參與 rerank 的候選數。
+    """
+    rows = []
+    vectors = []
+    for idx, hit in enumerate(hits):
+        vector = extract_vector(hit)
+        hit.pop("_vectors", None)
+        if vector is not None and len(vector) == len(query_vector):
+            rows.append(idx)
+            vectors.append(vector)
+    if not rows:
+        return 0
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    similarities = (matrix @ query) / np.maximum(norms, 1e-12)
+
+    for idx, similarity in zip(rows, similarities.tolist()):
+        hit = hits[idx]
+        base = hit.get("_rerank_score", hit.get("_rankingScore", 0.0))
+        hit["_vector_score"] = round(similarity, 4)
+        hit["_rerank_score"] = (1.0 - weight) * base + weight * max(similarity, 0.0)
+    return len(rows)
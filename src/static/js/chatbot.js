@@ -1,4 +1,4 @@
-import { currentResults, activeResults, applyThresholdToResults } from './render.js';
+import { currentResults, activeResults, currentResultSetId, applyThresholdToResults } from './render.js';
 import { searchConfig, appConfig } from './config.js';
 import { showAlert } from './alert.js';
 import { sendFeedback } from './api.js';
@@ -318,17 +318,27 @@ export function setupChatbot() {
             console.log(`Chatbot Context: 使用了 ${validResults.length} 筆資料 (門檻: ${thresholdPercent}%)`);
 
             const currentContext = prepareContext(validResults);
+            const docIds = validResults.map(item => item.id);
+            const canUseResultSet = currentResultSetId && docIds.every(id => id);
 
-            const response = await fetch('/api/chat', {
+            const postChat = (payload) => fetch('/api/chat', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     message: text,
-                    context: currentContext,
-                    history: chatHistory.getHistory()
+                    history: chatHistory.getHistory(),
+                    ...payload
                 })
             });
 
+            // 優先只傳結果集 id；後端 session 過期 (410) 時改傳完整內容
+            let response = canUseResultSet
+                ? await postChat({ result_set_id: currentResultSetId, doc_ids: docIds })
+                : await postChat({ context: currentContext });
+            if (response.status === 410) {
+                response = await postChat({ context: currentContext });
+            }
+
             const data = await response.json();
             removeMessage(loadingId);
 
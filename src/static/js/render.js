@@ -12,6 +12,8 @@ import { showAlert } from './alert.js';
 export let currentResults = [];
 //「目前沒反灰」的結果
 export let activeResults = [];
+// 後端登記的結果集 id (對話時只傳 id，不傳完整內容)
+export let currentResultSetId = null;
 
 // Current Search Context (for feedback logging)
 let currentSearchQuery = '';
@@ -99,6 +101,7 @@ export function renderResults(data, duration, query) {
 
     // Store results globally for detail view
     currentResults = results;
+    currentResultSetId = data.result_set_id || null;
 
     // Extract final_semantic_ratio from response
     const finalSemanticRatio = data.final_semantic_ratio !== undefined ? data.final_semantic_ratio : searchConfig.semanticRatio;
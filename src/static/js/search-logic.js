@@ -121,6 +121,21 @@ export async function performSearch() {
     const totalStartTime = performance.now();
     let hasUpdatedResults = false;
 
+    // summary_delta 串流中的暫存摘要，complete 時以完整結果覆蓋
+    let streamingSummary = null;
+    let streamingLinks = {};
+    let streamingRenderPending = false;
+    const renderStreamingSummary = () => {
+        if (streamingRenderPending) return;
+        streamingRenderPending = true;
+        requestAnimationFrame(() => {
+            streamingRenderPending = false;
+            if (streamingSummary && summaryContent) {
+                summaryContent.innerHTML = renderStructuredSummary(streamingSummary, streamingLinks);
+            }
+        });
+    };
+
     try {
         const response = await performSearchStream(query, selectedWebsites);
 
@@ -146,6 +161,7 @@ export async function performSearch() {
                     console.log('Agent Stream:', data.status, data);
 
                     if (data.status === "failed") {
+                        streamingSummary = null;
                         const errorStage = data.error_stage || data.stage || "unknown";
                         const { title, content } = error_display(errorStage, data.error);
 
@@ -171,9 +187,29 @@ export async function performSearch() {
                         summaryTitle.innerHTML = `<span class="material-icons-round animate-pulse mr-2 align-middle text-amber-500">edit_note</span>${data.message}`;
                     } else if (data.stage === "retrying") {
                         summaryTitle.innerHTML = `<span class="material-icons-round animate-spin mr-2 align-middle text-amber-500">sync_problem</span>${data.message}`;
+                    } else if (data.stage === "degraded") {
+                        summaryTitle.innerHTML = `<span class="material-icons-round animate-pulse mr-2 align-middle text-amber-500">timer</span>${data.message}`;
                     } else if (data.stage === "summarizing") {
                         summaryTitle.innerHTML = `<span class="material-icons-round animate-pulse mr-2 align-middle text-primary">auto_awesome</span>${data.message}`;
+                    } else if (data.stage === "summary_delta") {
+                        if (!streamingSummary) {
+                            streamingSummary = {};
+                            summaryTitle.innerHTML = `<span class="material-icons-round animate-pulse mr-2 align-middle text-primary">auto_awesome</span>以下為「<span class="text-primary">${query}</span>」的相關公告總結：`;
+                        }
+                        if (data.link_mapping) streamingLinks = data.link_mapping;
+                        if (data.value !== undefined) {
+                            streamingSummary[data.field] = data.value;
+                        } else if (data.delta) {
+                            streamingSummary[data.field] = (streamingSummary[data.field] || "") + data.delta;
+                        }
+                        renderStreamingSummary();
+                    } else if (data.stage === "summary_reset") {
+                        // 合併判斷的串流中途失敗，接下來會重新產生總結：清除不完整的內容
+                        streamingSummary = null;
+                        streamingLinks = {};
+                        if (summaryContent) summaryContent.innerHTML = "";
                     } else if (data.stage === "complete") {
+                        streamingSummary = null;
                         const totalEndTime = performance.now();
                         const totalDuration = Math.round(totalEndTime - totalStartTime);
 
@@ -192,6 +228,8 @@ export async function performSearch() {
                                 data.summarized_count || 0,
                                 data.total_tokens || 0
                             );
+                        } else if ((data.degradations || []).some(d => d === "summary_skipped" || d === "summary_timeout")) {
+                            summaryContent.innerHTML = "<p>搜尋時間已達上限，僅顯示搜尋結果。</p>";
                         } else {
                             summaryContent.innerHTML = "<p>無相關總結。</p>";
                         }
@@ -204,6 +242,7 @@ export async function performSearch() {
                             const renderData = {
                                 results: data.results,
                                 intent: data.intent || null,
+                                result_set_id: data.result_set_id || null,
                             };
 
                             renderResults(renderData, totalDuration, query);
@@ -0,0 +1,168 @@
+"""
+Relevance-per-token context packer.
+
+總結與對話送進 LLM 的文件需在 token 預算內。原本依分數順序貪婪加入、遇到第一篇放不下就停止，
+且使用的 token 是合併前的原始片段數。此模組：
+1. 以實際要送出的內容 (含 XML 標籤) 重新計算每篇 token 數
+2. 以相關性分數為價值、token 為重量解 0/1 背包，在預算內取得最大總相關性
+3. 剩餘空間依相關性順序放入被排除的文件，並在句子邊界截斷而非整篇丟棄
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from src.tool.token_counter import count_tokens
+
+# 背包 DP 的容量格數上限；token 預算會被等比例縮放到此格數內 (重量無條件進位，結果不會超出預算)
+_DP_SLOTS = 1000
+# 截斷後可用的內容 token 少於此值時不再放入 (太短的片段對回答沒有幫助)
+MIN_TRUNCATED_TOKENS = 200
+TRUNCATION_MARKER = "..."
+
+# 句尾標點或換行；英文句點需接空白，避免切開版本號與網址
+_SENTENCE = re.compile(r".+?(?:[。！？!?；;]+|\.(?=\s)|\n+|$)", re.S)
+
+
+def render_document(idx: int, doc: Dict[str, Any]) -> str:
+    """總結與對話共用的 XML 文件格式"""
+    title = doc.get("title", "No Title")
+    content = doc.get("content") or doc.get("cleaned_content") or ""
+    year = doc.get("year", "")
+    year_month = doc.get("year_month", "")
+    website = doc.get("website", "")
+
+    text = f'<document index="{idx}">\n'
+    text += f"<title>{title}</title>\n"
+    text += f"<year_month>{year_month}</year_month>\n"
+    text += f"<year>{year}</year>\n"
+    text += f"<website>{website}</website>\n"
+    text += f"<content>{content}</content>\n"
+    text += f"</document>\n\n"
+    return text
+
+
+def _relevance(doc: Dict[str, Any], rank: int) -> float:
+    for key in ("_rerank_score", "_rankingScore", "@search.score"):
+        score = doc.get(key)
+        if score is not None:
+            return max(float(score), 1e-6)
+    # 沒有分數時以排序位置代替
+    return 1.0 / (rank + 1)
+
+
+def _content(doc: Dict[str, Any]) -> str:
+    return doc.get("content") or doc.get("cleaned_content") or ""
+
+
+def split_sentences(text: str) -> List[str]:
+    """依句尾標點 / 換行切句，保留原本的標點與空白 (串接後與原文相同)"""
+    return [m.group(0) for m in _SENTENCE.finditer(text or "")]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """在句子邊界截斷至 max_tokens 以內；第一句就超過時依比例截斷字元"""
+    if max_tokens <= 0 or not text:
+        return ""
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            if not kept:
+                return sentence[: len(sentence) * max_tokens // tokens]
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept).rstrip()
+
+
+def _knapsack(weights: List[int], values: List[float], capacity: int) -> List[int]:
+    """0/1 背包，回傳選中項目的索引 (依原順序)"""
+    best = [0.0] * (capacity + 1)
+    keep = []
+    for weight, value in zip(weights, values):
+        taken = [False] * (capacity + 1)
+        if weight <= capacity:
+            for c in range(capacity, weight - 1, -1):
+                candidate = best[c - weight] + value
+                if candidate > best[c]:
+                    best[c] = candidate
+                    taken[c] = True
+        keep.append(taken)
+
+    chosen = []
+    c = capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if keep[i][c]:
+            chosen.append(i)
+            c -= weights[i]
+    return sorted(chosen)
+
+
+def pack_context(
+    docs: List[Dict[str, Any]],
+    budget: int,
+    min_truncated_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    在 budget 個 token 內挑選文件 (docs 需依相關性排序)。
+
+    回傳:
+        documents: [(原始位置 1-based, 文件)]，依原順序；截斷的文件為複本，content 已截斷
+        packed_tokens: 放入的 token 數 (含 XML 標籤)
+        discarded_tokens: 因預算被丟棄或截斷掉的 token 數
+        truncated_count / dropped_count: 截斷與完全未放入的篇數
+    """
+    if min_truncated_tokens is None:
+        min_truncated_tokens = MIN_TRUNCATED_TOKENS
+
+    overheads = [
+        count_tokens(render_document(i, {**d, "content": "", "cleaned_content": ""}))
+        for i, d in enumerate(docs, 1)
+    ]
+    content_tokens = [count_tokens(_content(d)) for d in docs]
+    sizes = [o + c for o, c in zip(overheads, content_tokens)]
+    total = sum(sizes)
+
+    if total <= budget:
+        selected = set(range(len(docs)))
+    else:
+        unit = budget / _DP_SLOTS if budget > _DP_SLOTS else 1
+        slots = min(budget, _DP_SLOTS)
+        weights = [math.ceil(size / unit) for size in sizes]
+        values = [_relevance(d, rank) for rank, d in enumerate(docs)]
+        selected = set(_knapsack(weights, values, slots))
+
+    packed = {i: docs[i] for i in selected}
+    packed_tokens = sum(sizes[i] for i in selected)
+
+    # 剩餘空間依相關性順序放入截斷的文件
+    truncated_count = 0
+    for i in range(len(docs)):
+        if i in selected:
+            continue
+        room = budget - packed_tokens - overheads[i]
+        if room - count_tokens(TRUNCATION_MARKER) < min_truncated_tokens:
+            continue
+        text = truncate_to_tokens(
+            _content(docs[i]), room - count_tokens(TRUNCATION_MARKER)
+        )
+        if not text:
+            continue
+        text += TRUNCATION_MARKER
+        # 逐句計數與整段計數可能略有差異，以整段結果為準確保不超出預算
+        text_tokens = count_tokens(text)
+        if text_tokens > room:
+            continue
+        packed[i] = {**docs[i], "content": text}
+        packed_tokens += overheads[i] + text_tokens
+        truncated_count += 1
+
+    return {
+        "documents": [(i + 1, packed[i]) for i in sorted(packed)],
+        "packed_tokens": packed_tokens,
+        "discarded_tokens": max(0, total - packed_tokens),
+        "truncated_count": truncated_count,
+        "dropped_count": len(docs) - len(packed),
+    }
@@ -0,0 +1,44 @@
+import time
+from typing import Optional
+
+# 低於此秒數的剩餘時間不再送出網路呼叫 (連線建立本身就會超過)
+MIN_CALL_TIMEOUT = 0.5
+
+
+class Deadline:
+    """
+    單一請求的總時間預算，於各階段間傳遞。
+    budget 為 None 表示不限時，所有判斷都視為時間充足。
+    """
+
+    def __init__(self, budget: Optional[float] = None):
+        self.budget = budget
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> Optional[float]:
+        if self.budget is None:
+            return None
+        return max(0.0, self.budget - self.elapsed())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def has(self, seconds: float) -> bool:
+        """剩餘時間是否還足以執行需要 seconds 秒的階段"""
+        remaining = self.remaining()
+        return remaining is None or remaining >= seconds
+
+    def cap(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        以剩餘時間限制單次呼叫的 timeout；不限時時原樣回傳。
+        timeout 為 None (使用呼叫端預設值) 時回傳剩餘時間。
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(MIN_CALL_TIMEOUT, remaining)
+        return remaining if timeout is None else min(timeout, remaining)
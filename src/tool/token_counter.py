@@ -1,8 +1,174 @@
+"""
+行程共用的 token 計算服務。
+
+- encoding 延遲載入並依模型快取 (tiktoken.encoding_for_model 每次呼叫都要查表與建立物件)
+- 長文字 (>= TOKEN_MEMO_MIN_CHARS) 的 token 數以內容 hash 記憶，同一篇文件 / 對話歷史在多輪對話中不需重新計算
+- 多筆文字以 encode_ordinary_batch 一次計算
+- estimate_tokens 以字元數估算，距離上限很遠時 (exceeds_tokens) 不需精確計算
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
 import tiktoken
-from typing import Union
 
+from src.config import TOKEN_ESTIMATE_SAFE_RATIO, TOKEN_MEMO_MIN_CHARS, TOKEN_MEMO_SIZE
+
+DEFAULT_MODEL = "gpt-4o-mini"
+FALLBACK_ENCODING = "cl100k_base"
+# 英文等 ASCII 文字約 4 字元一個 token，中文等非 ASCII 字元約一字一個 token
+ASCII_CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, "tiktoken.Encoding"] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str = DEFAULT_MODEL) -> "tiktoken.Encoding":
+    """取得模型對應的 encoding (第一次使用時載入，之後共用)；不支援的模型使用 cl100k_base"""
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    with _encodings_lock:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                print(f"Warning: Model {model} not found, using {FALLBACK_ENCODING} encoding.")
+                encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+            _encodings[model] = encoding
+    return encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """以字元數估算 token 數 (不需 encoding)，只適合用於判斷是否遠低於上限"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+
+class TokenCounter:
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        memo_size: int = TOKEN_MEMO_SIZE,
+        memo_min_chars: int = TOKEN_MEMO_MIN_CHARS,
+    ):
+        self.model = model
+        self.memo_size = memo_size
+        self.memo_min_chars = memo_min_chars
+        self._memo: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memo_hits": 0,
+            "memo_misses": 0,
+            "encoded_texts": 0,
+            "estimated": 0,
+        }
+
+    @property
+    def encoding(self) -> "tiktoken.Encoding":
+        return get_encoding(self.model)
+
+    def _memo_get(self, key: str) -> Optional[int]:
+        with self._lock:
+            count = self._memo.get(key)
+            if count is None:
+                self._stats["memo_misses"] += 1
+                return None
+            self._memo.move_to_end(key)
+            self._stats["memo_hits"] += 1
+            return count
+
+    def _memo_put(self, key: str, count: int) -> None:
+        with self._lock:
+            self._memo[key] = count
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
 
-def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    def _key(self, text: str) -> Optional[str]:
+        if len(text) < self.memo_min_chars:
+            return None
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def count(self, text: str) -> int:
+        """精確 token 數 (特殊 token 字串視為一般文字)"""
+        if not text:
+            return 0
+        key = self._key(text)
+        if key is not None:
+            count = self._memo_get(key)
+            if count is not None:
+                return count
+        count = len(self.encoding.encode_ordinary(text))
+        with self._lock:
+            self._stats["encoded_texts"] += 1
+        if key is not None:
+            self._memo_put(key, count)
+        return count
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """多筆文字的精確 token 數，未記憶的文字以 encode_ordinary_batch 一次計算"""
+        counts: List[Optional[int]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text:
+                counts[i] = 0
+                continue
+            key = self._key(text)
+            count = self._memo_get(key) if key is not None else None
+            if count is None:
+                pending.append((i, key))
+            else:
+                counts[i] = count
+
+        if pending:
+            encoded = self.encoding.encode_ordinary_batch([texts[i] for i, _ in pending])
+            with self._lock:
+                self._stats["encoded_texts"] += len(pending)
+            for (i, key), tokens in zip(pending, encoded):
+                counts[i] = len(tokens)
+                if key is not None:
+                    self._memo_put(key, len(tokens))
+        return counts
+
+    def exceeds(self, text: str, limit: int) -> bool:
+        """是否超過 limit 個 token；估算值遠低於 limit 時不做精確計算"""
+        if estimate_tokens(text) <= limit * TOKEN_ESTIMATE_SAFE_RATIO:
+            with self._lock:
+                self._stats["estimated"] += 1
+            return False
+        return self.count(text) > limit
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memo_size"] = len(self._memo)
+        stats["model"] = self.model
+        return stats
+
+
+_token_counters: Dict[str, TokenCounter] = {}
+_token_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: str = DEFAULT_MODEL) -> TokenCounter:
+    """取得行程共用的 token counter (每個模型一個，記憶跨請求共用)"""
+    counter = _token_counters.get(model)
+    if counter is None:
+        with _token_counters_lock:
+            counter = _token_counters.get(model)
+            if counter is None:
+                counter = _token_counters[model] = TokenCounter(model)
+    return counter
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
     """
     計算給定字串的 token 數量。
 
@@ -13,18 +179,17 @@ def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
     Returns:
         token 數量。
     """
-    if not text:
-        return 0
+    return get_token_counter(model).count(text)
+
+
+def count_tokens_batch(texts: List[str], model: str = DEFAULT_MODEL) -> List[int]:
+    """批次計算多筆字串的 token 數量"""
+    return get_token_counter(model).count_batch(texts)
 
-    try:
-        # 取得該模型的 encoding
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        # 如果模型不支援，預設使用 cl100k_base (GPT-4, GPT-3.5-turbo 等)
-        print(f"Warning: Model {model} not found, using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
 
-    return len(encoding.encode(text))
+def exceeds_tokens(text: str, limit: int, model: str = DEFAULT_MODEL) -> bool:
+    """字串的 token 數是否超過 limit (遠低於 limit 時只估算)"""
+    return get_token_counter(model).exceeds(text, limit)
 
 
 if __name__ == "__main__":
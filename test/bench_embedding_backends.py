@@ -0,0 +1,89 @@
+"""
+比較 Ollama (HTTP) 與 in-process (sentence-transformers / ONNX Runtime) embedding 延遲
+
+用法:
+    python test/bench_embedding_backends.py
+    EMBEDDING_LOCAL_MODEL=BAAI/bge-m3 EMBEDDING_LOCAL_INT8=true python test/bench_embedding_backends.py
+"""
+import sys
+import time
+import statistics
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.vector_utils import (
+    OllamaBackend,
+    SentenceTransformerBackend,
+    EMBEDDING_LOCAL_RUNTIME,
+    EMBEDDING_LOCAL_INT8,
+)
+
+QUERIES = [
+    "近期關於 Azure 的公告",
+    "Copilot 授權費用調整",
+    "Windows 11 24H2 known issues",
+    "AI 雲合作夥伴計劃 AI Cloud Partner Program",
+    "Power BI 2025年5月 更新",
+]
+BATCH_TEXT = "Microsoft 合作夥伴中心公告：自 2025 年 12 月起調整 Azure OpenAI 價格。" * 20
+ROUNDS = 20
+BATCH_SIZE = 32
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def bench_backend(backend):
+    backend.embed(QUERIES[:1])  # warm-up
+
+    single = []
+    for i in range(ROUNDS):
+        start = time.perf_counter()
+        backend.embed([QUERIES[i % len(QUERIES)]])
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = [BATCH_TEXT] * BATCH_SIZE
+    start = time.perf_counter()
+    backend.embed(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "p50": statistics.median(single),
+        "p95": _percentile(single, 95),
+        "batch_ms": batch_ms,
+        "docs_per_s": BATCH_SIZE / (batch_ms / 1000),
+    }
+
+
+def main():
+    backends = []
+    try:
+        backends.append(("ollama", OllamaBackend()))
+    except Exception as e:
+        print(f"⚠️ Ollama backend unavailable: {e}")
+    try:
+        label = f"local-{EMBEDDING_LOCAL_RUNTIME}{'-int8' if EMBEDDING_LOCAL_INT8 else ''}"
+        backends.append((label, SentenceTransformerBackend()))
+    except Exception as e:
+        print(f"⚠️ Local backend unavailable: {e}")
+
+    print(f"{'Backend':<20} | {'query p50 (ms)':>15} | {'query p95 (ms)':>15} | {'batch (ms)':>11} | {'docs/s':>8}")
+    print("-" * 82)
+    for name, backend in backends:
+        try:
+            r = bench_backend(backend)
+        except Exception as e:
+            print(f"{name:<20} | failed: {e}")
+            continue
+        print(
+            f"{name:<20} | {r['p50']:>15.1f} | {r['p95']:>15.1f} | {r['batch_ms']:>11.1f} | {r['docs_per_s']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
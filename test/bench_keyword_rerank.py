@@ -0,0 +1,96 @@
+"""
+比較 ResultReranker 的關鍵字比對：逐對 _check_match (每次重新正規化)、每篇只正規化一次的 KeywordMatcher，
+以及使用匯入時預先計算的 keyword_signature
+
+用法:
+    python test/bench_keyword_rerank.py
+"""
+import sys
+import time
+import random
+import statistics
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.keyword_alg import ResultReranker, build_keyword_signature
+
+KEYWORDS = ["Copilot", "Azure OpenAI", "價格", "Microsoft 365", "E5", "multi-cloud"]
+SENTENCES = [
+    "Microsoft 合作夥伴中心公告：自 2025 年 12 月起調整 Azure OpenAI 價格。",
+    "Windows 11 24H2 known issues and workarounds for enterprise devices.",
+    "Power BI 2025年5月 更新：新的視覺效果與 Copilot 整合。",
+    "Teams Premium licensing changes for Microsoft 365 E3 and E5 customers.",
+    "Security update guide: CVE details for Exchange Server.",
+]
+HIT_COUNTS = [200, 500]
+ROUNDS = 10
+
+
+def _hits(count: int):
+    random.seed(0)
+    return [
+        {
+            "id": str(i),
+            "title": random.choice(SENTENCES)[:40],
+            "content": " ".join(random.choice(SENTENCES) for _ in range(random.randint(20, 120))),
+            "_rankingScore": random.random(),
+        }
+        for i in range(count)
+    ]
+
+
+def rerank_per_pair(hits, keywords):
+    """改寫前的做法：每個 (文件, 關鍵字) 組合都重新正規化標題與內容"""
+    reranker = ResultReranker(hits, keywords)
+    unique_keywords = list(dict.fromkeys(reranker.keywords))
+    counts = []
+    for doc in hits:
+        title, content = doc.get("title") or "", doc.get("content") or ""
+        counts.append(
+            sum(
+                1
+                for kw in unique_keywords
+                if reranker._check_match(title, kw) or reranker._check_match(content, kw)
+            )
+        )
+    return counts
+
+
+def rerank_matcher(hits, keywords):
+    ResultReranker([dict(h) for h in hits], keywords).rerank()
+
+
+def rerank_signature(hits, keywords):
+    ResultReranker([dict(h) for h in hits], keywords).rerank()
+
+
+def _time(fn, *args):
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    print(
+        f"{'hits':>6} | {'per-pair ms':>12} | {'matcher ms':>11} | {'signature ms':>14}"
+    )
+    print("-" * 54)
+    for count in HIT_COUNTS:
+        hits = _hits(count)
+        old_ms = _time(rerank_per_pair, hits, KEYWORDS)
+        new_ms = _time(rerank_matcher, hits, KEYWORDS)
+        indexed = [
+            {**h, "keyword_signature": build_keyword_signature(h["title"], h["content"])}
+            for h in hits
+        ]
+        indexed_ms = _time(rerank_signature, indexed, KEYWORDS)
+        print(f"{count:>6} | {old_ms:>12.1f} | {new_ms:>11.1f} | {indexed_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
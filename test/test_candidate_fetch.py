@@ -0,0 +1,161 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.schema.schemas import SearchIntent
+from src.services.candidate_fetch import (
+    CANDIDATE_ATTRIBUTES,
+    WIDEN_FEW_LINKS,
+    WIDEN_FLAT_SCORES,
+    CandidateFetchStats,
+    hydrate,
+    widen_reason,
+)
+from src.services.search_service import SearchService
+from src.tool.deadline import Deadline
+
+
+def _candidate(doc_id, score, link=None):
+    return {
+        "id": doc_id,
+        "link": link or f"https://example.com/{doc_id}",
+        "title": doc_id,
+        "_rankingScore": score,
+    }
+
+
+class FakeMeiliAdapter:
+    """一般查詢回傳語料的前 limit 筆候選，以 id 查詢時回傳完整文件"""
+
+    def __init__(self, corpus, contents=None):
+        self.corpus = corpus
+        self.contents = contents or {}
+        self.calls = []
+
+    def _content(self, doc_id):
+        return self.contents.get(doc_id, f"full {doc_id}")
+
+    def _hit(self, doc, query):
+        if query.get("attributesToRetrieve") == ["*"]:
+            return {**doc, "content": self._content(doc["id"])}
+        return dict(doc)
+
+    def multi_search(self, queries, timeout=None):
+        self.calls.append([dict(q) for q in queries])
+        results = []
+        for q in queries:
+            if "filter" in q and q["filter"].startswith("id IN"):
+                hits = [
+                    {"id": d["id"], "link": d["link"], "title": d["id"], "content": self._content(d["id"])}
+                    for d in self.corpus
+                    if f'"{d["id"]}"' in q["filter"]
+                ]
+            else:
+                hits = [self._hit(d, q) for d in self.corpus[: q["limit"]]]
+            results.append({"hits": hits})
+        return {"status": "success", "result": {"results": results}}
+
+
+class TestWidenReason(unittest.TestCase):
+    def test_few_unique_links(self):
+        candidates = [_candidate("a", 0.9, "l1"), _candidate("b", 0.8, "l1"), _candidate("c", 0.7, "l2")]
+        self.assertEqual(widen_reason(candidates, limit=3), WIDEN_FEW_LINKS)
+
+    def test_flat_tail(self):
+        candidates = [_candidate(str(i), 0.8 - i * 0.001) for i in range(6)]
+        self.assertEqual(widen_reason(candidates, limit=3, flat_spread=0.02), WIDEN_FLAT_SCORES)
+
+    def test_sufficient_window(self):
+        candidates = [_candidate(str(i), 0.9 - i * 0.1) for i in range(6)]
+        self.assertIsNone(widen_reason(candidates, limit=3, flat_spread=0.02))
+
+    def test_hydrate_keeps_candidate_order_and_scores(self):
+        candidates = [{"id": "b", "_rerank_score": 0.9}, {"id": "gone"}, {"id": "a", "_rerank_score": 0.5}]
+        full = [{"id": "a", "content": "A"}, {"id": "b", "content": "B", "_rerank_score": None}]
+
+        hydrated = hydrate(candidates, full)
+
+        self.assertEqual([d["id"] for d in hydrated], ["b", "a"])
+        self.assertEqual(hydrated[0], {"id": "b", "content": "B", "_rerank_score": 0.9})
+
+    def test_overflow_rate(self):
+        stats = CandidateFetchStats()
+        stats.record(None, 10, 5)
+        stats.record(WIDEN_FLAT_SCORES, 60, 5)
+
+        result = stats.get_stats()
+        self.assertEqual(result["overflow_rate"], 0.5)
+        self.assertEqual(result[WIDEN_FLAT_SCORES], 1)
+        self.assertEqual(result["candidates_fetched"], 70)
+
+
+class TestTwoPhaseSearch(unittest.TestCase):
+    def _run(self, corpus, limit, window, contents=None, keywords=None):
+        service = SearchService()
+        service.meili_adapter = FakeMeiliAdapter(corpus, contents)
+        intent = SearchIntent(
+            keyword_query="q", semantic_query="q", must_have_keywords=keywords or []
+        )
+        queries = [{"indexUid": "idx", "q": "q", "limit": window, "attributesToRetrieve": ["id"]}]
+        raw = service.meili_adapter.multi_search(queries)["result"]["results"]
+        traces = []
+        result = service._two_phase_results(
+            queries, raw, intent, limit, enable_llm=bool(keywords), is_retry_search=False,
+            deadline=Deadline(), traces=traces,
+        )
+        return service, result, traces
+
+    def test_small_window_is_enough(self):
+        corpus = [_candidate(str(i), 0.9 - i * 0.05) for i in range(12)]
+
+        service, result, traces = self._run(corpus, limit=2, window=5)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual([d["id"] for d in result["result"]], ["0", "1"])
+        self.assertEqual(result["result"][0]["content"], "full 0")
+        self.assertNotIn("keyword_signature", result["result"][0])
+        # 第一階段 + 以 id 取回完整文件，沒有擴大
+        self.assertEqual(len(service.meili_adapter.calls), 2)
+        self.assertFalse(any("widened" in t for t in traces))
+
+    def test_widens_when_window_has_too_few_links(self):
+        corpus = [_candidate(str(i), 0.9 - i * 0.01, link="same" if i < 5 else None) for i in range(60)]
+
+        service, result, traces = self._run(corpus, limit=3, window=5)
+
+        self.assertEqual(len(result["result"]), 3)
+        self.assertEqual(len(service.meili_adapter.calls), 3)
+        self.assertGreater(service.meili_adapter.calls[1][0]["limit"], 5)
+        self.assertTrue(any(WIDEN_FEW_LINKS in t for t in traces))
+
+    def test_phase_one_requests_no_content(self):
+        service = SearchService()
+        intent = SearchIntent(keyword_query="q", semantic_query="q")
+
+        params = service._build_single_query_params(5, "q", intent, 0.0, None)
+
+        self.assertEqual(params["attributesToRetrieve"], CANDIDATE_ATTRIBUTES)
+        self.assertNotIn("content", CANDIDATE_ATTRIBUTES)
+        self.assertNotIn("keyword_signature", CANDIDATE_ATTRIBUTES)
+        self.assertNotIn("retrieveVectors", params)
+
+    def test_keyword_rerank_uses_hydrated_content(self):
+        corpus = [_candidate(str(i), 0.9 - i * 0.05) for i in range(12)]
+        contents = {"3": "Azure OpenAI pricing"}
+
+        service, result, _ = self._run(
+            corpus, limit=2, window=5, contents=contents, keywords=["Azure OpenAI"]
+        )
+
+        # 第一階段分數排第 4 的文件在取回內容後因關鍵字命中排到第一
+        self.assertEqual(result["result"][0]["id"], "3")
+        self.assertEqual(result["result"][0]["has_keyword"], "1/1")
+        self.assertEqual(len(service.meili_adapter.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database import vector_utils
+from src.services.context_compressor import ContextCompressor
+
+
+class KeywordBackend(vector_utils.EmbeddingBackend):
+    """以關鍵字出現與否產生向量，方便驗證排序"""
+
+    name = "keyword"
+    in_process = True
+    vocabulary = ("價格", "上市", "天氣")
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return np.array(
+            [[1.0 if w in t else 0.0 for w in self.vocabulary] + [0.1] for t in texts],
+            dtype=np.float32,
+        )
+
+
+class TestContextCompressor(unittest.TestCase):
+    def setUp(self):
+        self.backend = KeywordBackend()
+        vector_utils.set_embedding_backend(self.backend)
+        self.addCleanup(vector_utils.set_embedding_backend, None)
+
+    def test_keeps_query_relevant_passages_in_order(self):
+        content = "今天天氣晴朗。" * 5 + "Copilot 價格為每月 30 美元。" + "明天天氣多雲。" * 5
+        doc = {"id": "a", "content": content}
+        compressor = ContextCompressor(ratio=0.3, min_chars=10, passage_chars=20)
+
+        result = compressor.compress("Copilot 價格", [doc, {"id": "b", "content": "短"}])
+
+        self.assertIn("價格為每月 30 美元", result[0]["content"])
+        self.assertLess(len(result[0]["content"]), len(content))
+        self.assertEqual(result[1]["content"], "短")
+        self.assertEqual(doc["content"], content)  # 原始文件不受影響
+
+    def test_passage_embeddings_are_cached(self):
+        content = "第一段價格說明。" * 4 + "第二段上市時程。" * 4
+        compressor = ContextCompressor(ratio=0.5, min_chars=10, passage_chars=40)
+
+        compressor.compress("價格", [{"content": content}])
+        compressor.compress("價格", [{"content": content}])
+
+        self.assertEqual(len(self.backend.calls), 1)
+        self.assertGreater(compressor.get_stats()["cache_hits"], 0)
+
+    def test_embedding_failure_returns_original(self):
+        def fail(texts):
+            raise RuntimeError("embedding service down")
+
+        self.backend.embed = fail
+        docs = [{"content": "價格。" * 100}]
+        compressor = ContextCompressor(min_chars=10, passage_chars=20)
+
+        self.assertIs(compressor.compress("價格", docs), docs)
+        self.assertEqual(compressor.get_stats()["failures"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.tool.context_packer import TRUNCATION_MARKER, pack_context, render_document
+
+
+def _doc(content, score):
+    return {"title": "T", "content": content, "_rerank_score": score}
+
+
+def _size(doc):
+    return len(render_document(1, doc))
+
+
+@patch("src.tool.context_packer.count_tokens", side_effect=len)
+class TestContextPacker(unittest.TestCase):
+    def test_all_docs_fit(self, _count_tokens):
+        docs = [_doc("甲" * 10, 0.9), _doc("乙" * 10, 0.8)]
+        packed = pack_context(docs, 10000)
+
+        self.assertEqual([idx for idx, _ in packed["documents"]], [1, 2])
+        self.assertEqual(packed["discarded_tokens"], 0)
+        self.assertEqual(packed["packed_tokens"], sum(_size(d) for d in docs))
+
+    def test_knapsack_prefers_relevance_per_token(self, _count_tokens):
+        # 第一篇分數最高但很長；兩篇短文的總相關性較高
+        long_doc = _doc("長" * 300, 0.9)
+        short_a = _doc("短" * 100, 0.8)
+        short_b = _doc("短" * 100, 0.7)
+        budget = _size(short_a) + _size(short_b) + 10
+
+        packed = pack_context([long_doc, short_a, short_b], budget, min_truncated_tokens=50)
+
+        self.assertEqual([idx for idx, _ in packed["documents"]], [2, 3])
+        self.assertLessEqual(packed["packed_tokens"], budget)
+        self.assertEqual(packed["dropped_count"], 1)
+        self.assertGreater(packed["discarded_tokens"], 0)
+
+    def test_oversized_doc_truncated_at_sentence(self, _count_tokens):
+        doc = _doc("第一句。" * 50, 0.9)
+        budget = _size(_doc("", 0.9)) + 100
+
+        packed = pack_context([doc], budget, min_truncated_tokens=10)
+
+        self.assertEqual(packed["truncated_count"], 1)
+        content = packed["documents"][0][1]["content"]
+        self.assertTrue(content.endswith("。" + TRUNCATION_MARKER))
+        self.assertLessEqual(packed["packed_tokens"], budget)
+        self.assertEqual(len(doc["content"]), 200)  # 原始文件不受影響
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agents.srhSumAgent import SrhSumAgent
+from src.tool.deadline import Deadline
+
+
+def _agent():
+    agent = SrhSumAgent.__new__(SrhSumAgent)
+    agent.max_retries = 1
+    agent.tool = MagicMock()
+    agent.tool.search.return_value = {
+        "status": "success",
+        "results": [{"id": "a", "link": "https://example.com/a", "content": "內容"}],
+        "intent": {},
+        "degradations": ["intent_skipped"],
+    }
+    agent.tool.summarize.return_value = {
+        "status": "success",
+        "summary": {"brief_answer": "答案", "detailed_answer": "", "general_summary": ""},
+        "link_mapping": {},
+    }
+    agent._check_retry_search = MagicMock()
+    return agent
+
+
+class TestDeadline(unittest.TestCase):
+    def test_cap_and_has(self):
+        unlimited = Deadline()
+        self.assertTrue(unlimited.has(1000))
+        self.assertEqual(unlimited.cap(5), 5)
+        self.assertIsNone(unlimited.cap(None))
+
+        deadline = Deadline(3)
+        self.assertFalse(deadline.has(10))
+        self.assertLessEqual(deadline.cap(5), 3)
+        self.assertLessEqual(deadline.cap(None), 3)
+
+
+@patch("src.agents.srhSumAgent.COMBINED_RELEVANCE_SUMMARY", False)
+@patch("src.agents.srhSumAgent.STREAM_SUMMARY", False)
+class TestAgentDegradation(unittest.TestCase):
+    def test_short_deadline_returns_results_only(self):
+        agent = _agent()
+
+        steps = list(agent.run("問題", deadline=Deadline(3)))
+
+        degraded = [s["degradation"] for s in steps if s["stage"] == "degraded"]
+        self.assertEqual(degraded, ["intent_skipped", "retry_skipped", "summary_skipped"])
+        agent._check_retry_search.assert_not_called()
+        agent.tool.summarize.assert_not_called()
+        self.assertIs(agent.tool.search.call_args.kwargs["deadline"].budget, 3)
+        self.assertIsNone(steps[-1]["summary"])
+        self.assertEqual(len(steps[-1]["results"]), 1)
+        self.assertEqual(steps[-1]["degradations"], degraded)
+
+    def test_medium_deadline_skips_retry_but_summarizes(self):
+        agent = _agent()
+
+        steps = list(agent.run("問題", deadline=Deadline(10)))
+
+        agent._check_retry_search.assert_not_called()
+        self.assertLessEqual(agent.tool.summarize.call_args.kwargs["timeout"], 10)
+        self.assertEqual(steps[-1]["summary"]["brief_answer"], "答案")
+        self.assertEqual(steps[-1]["degradations"], ["intent_skipped", "retry_skipped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
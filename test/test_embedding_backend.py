@@ -0,0 +1,136 @@
+import sys
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database import vector_utils
+from src.database.vector_utils import EmbeddingBackend
+
+# 若要以真實的小模型測試，設定 EMBEDDING_TEST_MODEL
+# 例如: sentence-transformers-testing/stsb-bert-tiny-safetensors
+TEST_MODEL = os.getenv("EMBEDDING_TEST_MODEL")
+
+
+class FakeBackend(EmbeddingBackend):
+    """以文字長度產生固定向量，並可對指定文字拋出錯誤。"""
+
+    name = "fake"
+    in_process = True
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("boom")
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+class FakeRemoteBackend(EmbeddingBackend):
+    """模擬 Ollama 之類的遠端後端，記錄 aembed 收到的參數。"""
+
+    name = "fake-remote"
+    in_process = False
+
+    def __init__(self):
+        self.calls = []
+
+    async def aembed(self, texts, model=None, force_gpu=True):
+        self.calls.append((list(texts), model, force_gpu))
+        return [[float(len(t))] for t in texts]
+
+
+class TestEmbeddingBackend(unittest.TestCase):
+    def setUp(self):
+        # 失敗的 embedding 會寫入 data_logs/embedding，測試中不寫檔
+        patcher = patch("src.database.vector_utils.LogManager")
+        self.log_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        vector_utils.set_embedding_backend(None)
+
+    def test_get_embedding_uses_in_process_backend(self):
+        """設定 in-process 後端時，get_embedding 不經過 Ollama"""
+        backend = FakeBackend()
+        vector_utils.set_embedding_backend(backend)
+
+        result = vector_utils.get_embedding("hello\nworld")
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["result"], [11.0, 1.0, 0.0])
+        self.assertEqual(backend.calls, [["hello world"]])
+
+    def test_batch_keeps_order_and_sub_batches(self):
+        """批次結果順序與輸入一致，且依 sub_batch_size 分批推論"""
+        backend = FakeBackend()
+        vector_utils.set_embedding_backend(backend)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        results = asyncio.run(
+            vector_utils.get_embeddings_batch(texts, sub_batch_size=2)
+        )
+
+        self.assertEqual([r["result"][0] for r in results], [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([len(c) for c in backend.calls], [2, 2, 1])
+
+    def test_batch_isolates_failed_item(self):
+        """單筆失敗時拆批重試，只有問題文字標記為 failed"""
+        backend = FakeBackend(fail_on="bad")
+        vector_utils.set_embedding_backend(backend)
+        texts = ["ok", "bad", "fine"]
+
+        results = asyncio.run(
+            vector_utils.get_embeddings_batch(texts, sub_batch_size=3, max_retries=1)
+        )
+
+        self.assertEqual(results[0]["status"], "success")
+        self.assertEqual(results[1]["status"], "failed")
+        self.assertEqual(results[1]["stage"], "embedding_generation")
+        self.assertEqual(results[2]["status"], "success")
+        self.log_manager.log_embedding.assert_called_once()
+
+    def test_batch_routes_remote_backend_through_aembed(self):
+        """遠端後端 (Ollama) 也經由 get_embedding_backend 取得，不再直接建立 AsyncClient"""
+        backend = FakeRemoteBackend()
+        vector_utils.set_embedding_backend(backend)
+
+        results = asyncio.run(
+            vector_utils.get_embeddings_batch(
+                ["a", "bb", "ccc"], model="m", sub_batch_size=2, force_gpu=False
+            )
+        )
+
+        self.assertEqual([r["result"][0] for r in results], [1.0, 2.0, 3.0])
+        self.assertEqual(backend.calls, [(["a", "bb"], "m", False), (["ccc"], "m", False)])
+
+    @unittest.skipUnless(TEST_MODEL, "EMBEDDING_TEST_MODEL not set")
+    def test_tiny_local_model(self):
+        """以真實的小模型驗證 SentenceTransformerBackend 輸出正規化向量"""
+        backend = vector_utils.SentenceTransformerBackend(
+            model_name_or_path=TEST_MODEL,
+            runtime=os.getenv("EMBEDDING_TEST_RUNTIME", "torch"),
+            num_threads=1,
+            max_seq_length=128,
+        )
+        vector_utils.set_embedding_backend(backend)
+
+        result = vector_utils.get_embedding("Azure OpenAI 價格")
+        self.assertEqual(result["status"], "success")
+        norm = sum(v * v for v in result["result"]) ** 0.5
+        self.assertAlmostEqual(norm, 1.0, places=3)
+
+        batch = asyncio.run(vector_utils.get_embeddings_batch(["a", "b", "c"]))
+        self.assertTrue(all(r["status"] == "success" for r in batch))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import sys
+import time
+import threading
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.vector_utils import HedgedEmbeddingClient
+
+
+class ScriptedClient(HedgedEmbeddingClient):
+    """以每個端點預設的延遲 / 錯誤取代真正的 Ollama 呼叫。"""
+
+    def __init__(self, delays, errors=None, **kwargs):
+        super().__init__([f"http://host{i}" for i in range(len(delays))], **kwargs)
+        self.delays = delays
+        self.errors = errors or {}
+
+    def _call(self, client_idx, model, text, timeout):
+        time.sleep(self.delays[client_idx])
+        if client_idx in self.errors:
+            raise self.errors[client_idx]
+        return [float(client_idx)]
+
+
+class TestHedgedEmbeddingClient(unittest.TestCase):
+    def test_fast_primary_not_hedged(self):
+        """主請求在 hedge 時機前完成時不送出 hedge"""
+        client = ScriptedClient([0.0, 0.0], timeout=1.0)
+        self.assertEqual(client.embed("q"), [0.0])
+        stats = client.get_stats()
+        self.assertEqual(stats["hedged"], 0)
+        self.assertEqual(stats["cancelled"], 0)
+
+    def test_slow_primary_hedged_and_cancelled(self):
+        """主請求過慢時 hedge 至下一端點，取先完成者並放棄主請求"""
+        client = ScriptedClient([0.5, 0.0], timeout=1.0, min_hedge_delay=0.05)
+        client.hedge_delay = lambda timeout: 0.05
+
+        self.assertEqual(client.embed("q"), [1.0])
+        stats = client.get_stats()
+        self.assertEqual(stats["hedged"], 1)
+        self.assertEqual(stats["hedge_wins"], 1)
+        # 主請求已在執行，無法取消，只能放棄
+        self.assertEqual(stats["cancelled"], 0)
+        self.assertEqual(stats["abandoned"], 1)
+
+    def test_no_hedge_while_pool_saturated(self):
+        """worker pool 已滿時不送 hedge，只等主請求"""
+        client = ScriptedClient([0.2, 0.0], timeout=1.0, max_workers=1)
+        client.hedge_delay = lambda timeout: 0.02
+
+        self.assertEqual(client.embed("q"), [0.0])
+        stats = client.get_stats()
+        self.assertEqual(stats["hedged"], 0)
+        self.assertEqual(stats["hedge_skipped"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_cancelled_requests_release_pool_slots(self):
+        """排隊中被取消的請求也要歸還 in-flight 名額，否則 pool 會被視為永遠飽和"""
+        client = ScriptedClient([0.3, 0.3], timeout=0.1, max_workers=1)
+        client.hedge_delay = lambda timeout: 0.02
+        errors = []
+
+        def call():
+            try:
+                client.embed("q")
+            except TimeoutError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        time.sleep(0.4)  # 等待已在執行、被放棄的請求結束
+
+        stats = client.get_stats()
+        self.assertEqual(len(errors), 2)
+        self.assertGreaterEqual(stats["cancelled"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertFalse(client._saturated())
+
+    def test_http_timeout_bounded_by_deadline(self):
+        """ollama.Client 的 HTTP timeout 依每次呼叫的 deadline 設定，不再使用文件用的長 timeout"""
+        client = HedgedEmbeddingClient(["http://host0"], timeout=1.0)
+        self.assertIs(client._client(0, 0.3), client._client(0, 0.8))
+        self.assertEqual(client._client(0, 0.8)._client.timeout.read, 1)
+        self.assertEqual(client._client(0, 120)._client.timeout.read, 120)
+
+    def test_deadline_exceeded(self):
+        """所有請求都超過 deadline 時拋出 TimeoutError"""
+        client = ScriptedClient([0.5, 0.5], timeout=0.1)
+        client.hedge_delay = lambda timeout: 0.02
+
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            client.embed("q")
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(client.get_stats()["timeouts"], 1)
+
+    def test_failed_primary_hedges_immediately(self):
+        """主請求失敗時立即改送 hedge"""
+        client = ScriptedClient(
+            [0.0, 0.0], errors={0: RuntimeError("down")}, timeout=1.0
+        )
+        self.assertEqual(client.embed("q"), [1.0])
+        stats = client.get_stats()
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["hedged"], 1)
+
+    def test_no_hedge_for_documents(self):
+        """hedge=False 時只送一次請求且不記錄延遲樣本"""
+        client = ScriptedClient([0.0, 0.0], errors={0: RuntimeError("down")})
+        with self.assertRaises(RuntimeError):
+            client.embed("long document", hedge=False)
+        self.assertEqual(client.get_stats()["hedged"], 0)
+        self.assertIsNone(client.get_stats()["p95_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import sys
+import time
+import asyncio
+import threading
+import unittest
+import numpy as np
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database import vector_utils
+from src.database.vector_utils import EmbeddingBackend
+from src.schema.schemas import AnnouncementDoc
+from src.services.keyword_alg import KeywordSignature
+from data_update.vectorPreprocessing import VectorPreProcessor
+
+EVENTS = []
+LOCK = threading.Lock()
+
+
+def _record(name):
+    with LOCK:
+        EVENTS.append((name, time.perf_counter()))
+
+
+class SlowBackend(EmbeddingBackend):
+    name = "slow"
+    in_process = True
+
+    def embed(self, texts):
+        _record("embed_start")
+        time.sleep(0.1)
+        _record("embed_end")
+        return [[1.0, 0.0] for _ in texts]
+
+
+class SlowAdapter:
+    def __init__(self, *args, **kwargs):
+        self.uploaded = []
+
+    def upsert_documents(self, documents):
+        _record("upload_start")
+        time.sleep(0.15)
+        self.uploaded.extend(documents)
+        _record("upload_end")
+
+
+def _doc(i, content="內容"):
+    return AnnouncementDoc(
+        id=f"id{i}",
+        link=f"https://example.com/{i}",
+        year_month="2025-12",
+        title=f"title {i}",
+        main_title="main",
+        heading_link=f"https://example.com/{i}#h",
+        content=content,
+        cleaned_content=content,
+        website="Azure Updates",
+        update_time="2025-12-01-00-00",
+        token=1,
+    )
+
+
+class TestIngestPipeline(unittest.TestCase):
+    def setUp(self):
+        EVENTS.clear()
+        vector_utils.set_embedding_backend(SlowBackend())
+
+    def tearDown(self):
+        vector_utils.set_embedding_backend(None)
+
+    @patch("data_update.vectorPreprocessing.MeiliAdapter", SlowAdapter)
+    def test_embed_overlaps_upload(self):
+        """第 N+1 批的 embedding 應在第 N 批上傳完成前開始"""
+        processor = VectorPreProcessor(vector_batch_size=2, sub_batch_size=2, embedding_dims=2)
+        docs = [_doc(i) for i in range(6)]
+
+        asyncio.run(processor._process_and_sync_embeddings(docs))
+
+        self.assertEqual(len(processor.adapter.uploaded), 6)
+        first_upload_end = next(t for name, t in EVENTS if name == "upload_end")
+        embed_starts = [t for name, t in EVENTS if name == "embed_start"]
+        self.assertTrue(any(t < first_upload_end for t in embed_starts[1:]))
+
+    @patch("data_update.vectorPreprocessing.MeiliAdapter", SlowAdapter)
+    def test_empty_content_is_reported_not_embedded(self):
+        """空白內容在 load/validate 階段即被排除"""
+        processor = VectorPreProcessor(vector_batch_size=4, final_retry_count=0, embedding_dims=2)
+        docs = [_doc(0), _doc(1, content="  "), _doc(2)]
+
+        asyncio.run(processor._process_and_sync_embeddings(docs))
+
+        self.assertEqual(
+            sorted(d["id"] for d in processor.adapter.uploaded), ["id0", "id2"]
+        )
+
+    @patch("data_update.vectorPreprocessing.MeiliAdapter", SlowAdapter)
+    def test_vectors_are_float32_buffer_rows(self):
+        """向量寫入每批預先配置的 float32 矩陣，上傳文件持有的是 row view"""
+        processor = VectorPreProcessor(vector_batch_size=4, embedding_dims=2)
+        asyncio.run(processor._process_and_sync_embeddings([_doc(i) for i in range(3)]))
+
+        vectors = [d["_vectors"]["default"] for d in processor.adapter.uploaded]
+        self.assertTrue(all(isinstance(v, np.ndarray) for v in vectors))
+        self.assertTrue(all(v.dtype == np.float32 for v in vectors))
+        self.assertIs(vectors[0].base, vectors[1].base)
+
+    @patch("data_update.vectorPreprocessing.MeiliAdapter", SlowAdapter)
+    def test_uploaded_docs_carry_keyword_signature(self):
+        """上傳的文件附帶 keyword_signature，查詢時 rerank 不必再轉換全文"""
+        processor = VectorPreProcessor(vector_batch_size=4, embedding_dims=2)
+        asyncio.run(
+            processor._process_and_sync_embeddings([_doc(0, content="Multi-Cloud 方案")])
+        )
+
+        signature = KeywordSignature(processor.adapter.uploaded[0]["keyword_signature"])
+        self.assertIn("multicloud", signature)
+        self.assertIn("方案", signature)
+        self.assertNotIn("title0multi", signature)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,12 @@ import unittest
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.services.keyword_alg import ResultReranker
+from src.services.keyword_alg import (
+    KeywordMatcher,
+    KeywordSignature,
+    ResultReranker,
+    build_keyword_signature,
+)
 
 
 class TestKeywordReranker(unittest.TestCase):
@@ -123,6 +128,48 @@ class TestKeywordReranker(unittest.TestCase):
         self.assertTrue(reranked[0]["_rerank_score"] > reranked[1]["_rerank_score"])
         self.assertTrue(reranked[1]["_rerank_score"] > reranked[2]["_rerank_score"])
 
+    def test_matcher_returns_hit_set(self):
+        """測試 KeywordMatcher 一次回傳所有命中的關鍵字，正規化規則與 _check_match 相同"""
+        matcher = KeywordMatcher(["multi cloud", "multi-cloud", "azure", "gcp"])
+
+        self.assertEqual(matcher.find("Multi-Cloud strategy on AZURE"), {0, 1, 2})
+        self.assertEqual(matcher.find(""), set())
+
+    def test_keyword_does_not_span_title_and_content(self):
+        """測試關鍵字不會橫跨標題與內容而誤判命中"""
+        results = [{"title": "Power", "content": "BI report", "_rankingScore": 0.5}]
+        reranked = ResultReranker(results, ["power bi"]).rerank()
+
+        self.assertEqual(reranked[0]["has_keyword"], "0/1")
+
+    def test_precomputed_signature_is_used(self):
+        """測試有 keyword_signature 時直接查表，不再轉換標題與內容"""
+        signature = build_keyword_signature("Azure OpenAI", "")
+        results = [
+            {"title": "Other", "content": "Other", "keyword_signature": signature, "_rankingScore": 0.5}
+        ]
+        reranked = ResultReranker(results, ["Azure-OpenAI"]).rerank()
+
+        self.assertEqual(reranked[0]["has_keyword"], "1/1")
+
+    def test_signature_matches_like_full_text(self):
+        """測試 keyword_signature 與直接比對標題 / 內容的命中結果相同 (中英文混合)"""
+        title = "Power BI 2025年5月 更新"
+        content = "新的視覺效果與 Copilot 整合，Microsoft 365 E5 客戶可使用 multi-cloud 方案"
+        keywords = ["power bi", "視覺效果", "Microsoft 365", "multicloud", "E3", "bi 2025年", "更新新的"]
+        matcher = KeywordMatcher(keywords)
+
+        signature = KeywordSignature(build_keyword_signature(title, content))
+        expected = matcher.find(title) | matcher.find(content)
+
+        self.assertEqual(expected, {0, 1, 2, 3, 5})
+        self.assertEqual(matcher.find_terms(signature), expected)
+
+    def test_empty_signature_never_hits(self):
+        """測試沒有標題與內容的文件 (空 signature) 不會命中"""
+        self.assertEqual(build_keyword_signature("", ""), "")
+        self.assertEqual(KeywordMatcher(["azure"]).find_terms(KeywordSignature("")), set())
+
 
 if __name__ == "__main__":
     unittest.main()
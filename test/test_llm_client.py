@@ -0,0 +1,147 @@
+import sys
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.client import LLMClient
+from src.schema.schemas import RetrySearchDecision
+
+
+class FakeCompletions:
+    """模擬 chat.completions.with_raw_response.create"""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.contents.pop(0)))],
+            usage=None,
+        )
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+def _fake_client(contents):
+    completions = FakeCompletions(contents)
+    chat = SimpleNamespace(
+        completions=SimpleNamespace(with_raw_response=completions)
+    )
+    return SimpleNamespace(chat=chat), completions
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    """模擬 async 的 chat.completions.with_raw_response.create"""
+
+    async def create(self, **kwargs):
+        return FakeCompletions.create(self, **kwargs)
+
+
+def _fake_async_client(contents):
+    completions = FakeAsyncCompletions(contents)
+    chat = SimpleNamespace(
+        completions=SimpleNamespace(with_raw_response=completions)
+    )
+    return SimpleNamespace(chat=chat), completions
+
+
+class TestSharedLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.log_patch = patch.object(LLMClient, "_log_request")
+        self.log_patch.start()
+
+    def tearDown(self):
+        self.log_patch.stop()
+
+    def test_sync_client_is_shared(self):
+        """多個 LLMClient 共用同一個 AzureOpenAI (同一個連線池)"""
+        a = LLMClient(api_key="k")
+        b = LLMClient(api_key="k")
+        self.assertIs(a.client, b.client)
+
+    def test_async_client_per_event_loop(self):
+        """同一個 loop 內共用 async client，不同 loop 各自建立"""
+        client = LLMClient(api_key="k")
+
+        async def grab():
+            return client.aclient, LLMClient(api_key="k").aclient
+
+        first, second = asyncio.run(grab())
+        self.assertIs(first, second)
+        other, _ = asyncio.run(grab())
+        self.assertIsNot(first, other)
+
+    def test_acall_with_schema_retries_invalid_json(self):
+        client = LLMClient(api_key="k")
+        fake, completions = _fake_async_client(
+            ["not json", '{"relevant": true, "search_direction": "", "decision": "ok"}']
+        )
+        with patch("src.llm.client.get_shared_async_client", return_value=fake), patch(
+            "src.llm.client.get_response_cache", return_value=None
+        ):
+            result = asyncio.run(
+                client.acall_with_schema(
+                    [{"role": "user", "content": "q"}], RetrySearchDecision
+                )
+            )
+        self.assertEqual(result["status"], "success")
+        self.assertTrue(result["result"].relevant)
+        self.assertEqual(completions.calls, 2)
+
+    def test_call_with_schema_retries_invalid_json(self):
+        client = LLMClient(api_key="k")
+        client.client, completions = _fake_client(
+            ["not json", '{"relevant": true, "search_direction": "", "decision": "ok"}']
+        )
+        with patch("src.llm.client.get_response_cache", return_value=None):
+            result = client.call_with_schema(
+                [{"role": "user", "content": "q"}], RetrySearchDecision
+            )
+        self.assertEqual(result["status"], "success")
+        self.assertTrue(result["result"].relevant)
+        self.assertEqual(completions.calls, 2)
+
+    def test_stream_stops_at_deadline(self):
+        """串流超過時間預算時關閉連線並回傳失敗，不再退回非串流呼叫"""
+        client = LLMClient(api_key="k")
+
+        class SlowStream:
+            closed = False
+
+            def __iter__(self):
+                for part in ['{"relevant": true, ', '"search_direction": "", ', '"decision": "ok"}']:
+                    time.sleep(0.04)
+                    yield SimpleNamespace(
+                        choices=[SimpleNamespace(delta=SimpleNamespace(content=part))]
+                    )
+
+            def close(self):
+                SlowStream.closed = True
+
+        client.call_with_schema = MagicMock()
+        with patch.object(client, "_create_completion", return_value=SlowStream()):
+            stream = client.stream_with_schema(
+                [{"role": "user", "content": "q"}], RetrySearchDecision, timeout=0.06
+            )
+            while True:
+                try:
+                    next(stream)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+
+        self.assertEqual(result["stage"], "llm_deadline")
+        self.assertTrue(SlowStream.closed)
+        client.call_with_schema.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
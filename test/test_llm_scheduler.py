@@ -0,0 +1,179 @@
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from pathlib import Path
+
+import httpx
+from openai import APITimeoutError, BadRequestError, InternalServerError, RateLimitError
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.scheduler import (
+    CircuitBreaker,
+    LLMScheduler,
+    LLMUnavailableError,
+    TokenBucket,
+)
+
+REQUEST = httpx.Request("POST", "https://example.openai.azure.com/chat/completions")
+
+
+def _status_error(cls, status, headers=None):
+    response = httpx.Response(status, request=REQUEST, headers=headers or {})
+    return cls(f"HTTP {status}", response=response, body=None)
+
+
+class Scripted:
+    """依序拋出錯誤或回傳帶 headers 的 raw response"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(headers=outcome)
+
+
+def _scheduler(**kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.05)
+    return LLMScheduler(**kwargs)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_unknown_capacity_never_waits(self):
+        self.assertEqual(TokenBucket(0).reserve(10_000), 0.0)
+
+    def test_wait_when_exhausted(self):
+        """60 RPM -> 每秒補 1；用完後下一個請求需等約 1 秒"""
+        bucket = TokenBucket(60)
+        for _ in range(60):
+            self.assertEqual(bucket.reserve(1), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0, delta=0.05)
+
+    def test_sync_from_headers_is_conservative(self):
+        bucket = TokenBucket(0)
+        bucket.sync(remaining=5, limit=100)
+        self.assertEqual(bucket.capacity, 100)
+        self.assertLessEqual(bucket.tokens, 5)
+
+
+class TestLLMScheduler(unittest.TestCase):
+    def test_retries_429_with_retry_after(self):
+        scheduler = _scheduler()
+        fn = Scripted(
+            _status_error(RateLimitError, 429, {"retry-after-ms": "20"}),
+            {"x-ratelimit-remaining-requests": "9", "x-ratelimit-limit-requests": "10"},
+        )
+        start = time.monotonic()
+        scheduler.execute(fn, 100)
+        self.assertEqual(fn.calls, 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["rpm_capacity"], 10)
+        self.assertEqual(stats["circuit_state"], "closed")
+
+    def test_timeout_is_not_retried(self):
+        scheduler = _scheduler()
+        fn = Scripted(APITimeoutError(request=REQUEST), {})
+        with self.assertRaises(APITimeoutError):
+            scheduler.execute(fn, 100)
+        self.assertEqual(fn.calls, 1)
+
+    def test_capped_timeouts_do_not_open_breaker(self):
+        """呼叫端縮短的 timeout (請求 deadline / 路由預算) 逾時不計入熔斷"""
+        scheduler = _scheduler(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        for _ in range(3):
+            with self.assertRaises(APITimeoutError):
+                scheduler.execute(
+                    Scripted(APITimeoutError(request=REQUEST)), 100, timeout_capped=True
+                )
+        self.assertTrue(scheduler.available())
+        self.assertEqual(scheduler.get_stats()["capped_timeouts"], 3)
+
+        with self.assertRaises(APITimeoutError):
+            scheduler.execute(Scripted(APITimeoutError(request=REQUEST)), 100)
+        self.assertFalse(scheduler.available())
+
+    def test_client_error_is_not_retried(self):
+        scheduler = _scheduler()
+        fn = Scripted(_status_error(BadRequestError, 400), {})
+        with self.assertRaises(BadRequestError):
+            scheduler.execute(fn, 100)
+        self.assertEqual(scheduler.get_stats()["retries"], 0)
+
+    def test_breaker_opens_and_rejects_immediately(self):
+        """連續 5xx 達門檻後熔斷，後續呼叫不送出請求就失敗"""
+        scheduler = _scheduler(
+            max_attempts=2, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+        fn = Scripted(*[_status_error(InternalServerError, 500)] * 2)
+        with self.assertRaises(InternalServerError):
+            scheduler.execute(fn, 100)
+        self.assertFalse(scheduler.available())
+
+        blocked = Scripted({})
+        with self.assertRaises(LLMUnavailableError):
+            scheduler.execute(blocked, 100)
+        self.assertEqual(blocked.calls, 0)
+
+    def test_half_open_probe_closes_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # 同時只放行一個試探請求
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_probe_fails_with_client_error(self):
+        """試探請求遇到 400 不可卡住 half-open 名額：服務有回應，熔斷應關閉"""
+        scheduler = _scheduler(
+            max_attempts=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        )
+        with self.assertRaises(RateLimitError):
+            scheduler.execute(Scripted(_status_error(RateLimitError, 429)), 100)
+        self.assertFalse(scheduler.available())
+        time.sleep(0.06)
+
+        with self.assertRaises(BadRequestError):
+            scheduler.execute(Scripted(_status_error(BadRequestError, 400)), 100)
+        self.assertEqual(scheduler.breaker.state, "closed")
+
+        fn = Scripted({})
+        scheduler.execute(fn, 100)
+        self.assertEqual(fn.calls, 1)
+
+    def test_half_open_probe_released_on_other_errors(self):
+        scheduler = _scheduler(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+        scheduler.breaker.record_failure()
+        time.sleep(0.06)
+
+        with self.assertRaises(ValueError):
+            scheduler.execute(Scripted(ValueError("bad payload")), 100)
+
+        fn = Scripted({})
+        scheduler.execute(fn, 100)
+        self.assertEqual(fn.calls, 1)
+        self.assertEqual(scheduler.breaker.state, "closed")
+
+    def test_queue_wait_limit(self):
+        scheduler = _scheduler(rpm=60, max_queue_wait=0.5)
+        for _ in range(60):
+            scheduler.execute(Scripted({}), 0)
+        with self.assertRaises(LLMUnavailableError):
+            scheduler.execute(Scripted({}), 0)
+        self.assertEqual(scheduler.get_stats()["queue_rejections"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.client import LLMClient
+from src.llm.telemetry import LLMTelemetry
+
+
+class FakeCompletions:
+    """模擬 chat.completions.with_raw_response.create，回傳帶 usage 的回應"""
+
+    def __init__(self, content):
+        self.content = content
+
+    def create(self, **kwargs):
+        usage = SimpleNamespace(
+            prompt_tokens=1200,
+            completion_tokens=80,
+            total_tokens=1280,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+        )
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))],
+            usage=usage,
+        )
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+class TestLLMTelemetry(unittest.TestCase):
+    def test_stage_summary(self):
+        """依 stage 彙總延遲百分位數、直方圖、token 與結果"""
+        telemetry = LLMTelemetry()
+        for ms in range(1, 101):
+            telemetry.record(
+                "SearchIntent",
+                "mini",
+                ms / 100,
+                "success",
+                ttfb=ms / 200,
+                usage={"prompt_tokens": 100, "completion_tokens": 10, "cached_tokens": 50},
+            )
+        telemetry.record("SearchIntent", "mini", 5.0, "timeout", attempts=2)
+        telemetry.count("SearchIntent", "invalid_response")
+
+        stage = telemetry.get_stats()["stages"]["SearchIntent"]
+        self.assertEqual(stage["calls"], 101)
+        self.assertEqual(
+            stage["outcomes"], {"success": 100, "timeout": 1, "invalid_response": 1}
+        )
+        self.assertEqual(stage["latency"]["p50_ms"], 510.0)
+        self.assertEqual(stage["latency"]["buckets"]["le_inf"], 101)
+        self.assertEqual(stage["latency"]["buckets"]["le_1000"], 100)
+        self.assertEqual(stage["ttfb"]["count"], 100)
+        self.assertEqual(stage["tokens"]["cached"], 5000)
+        self.assertEqual(
+            telemetry.get_stats()["prompt_cache"]["mini"]["cached_ratio"], 0.5
+        )
+
+    def test_client_records_usage_and_log_fields(self):
+        telemetry = LLMTelemetry()
+        client = LLMClient(api_key="k")
+        client.client = SimpleNamespace(
+            chat=SimpleNamespace(
+                completions=SimpleNamespace(with_raw_response=FakeCompletions("hi"))
+            )
+        )
+        with patch("src.llm.client.get_llm_telemetry", return_value=telemetry), patch.object(
+            LLMClient, "_log_request"
+        ) as log_request:
+            self.assertEqual(client.call_gemini([{"role": "user", "content": "x"}]), "hi")
+
+        stage = telemetry.get_stats()["stages"]["text"]
+        self.assertEqual(stage["outcomes"], {"success": 1})
+        self.assertEqual(stage["tokens"]["prompt"], 1200)
+        self.assertEqual(stage["avg_attempts"], 1)
+        logged = log_request.call_args.args[-1]
+        self.assertEqual(logged["usage"]["cached_tokens"], 1024)
+        self.assertEqual(logged["attempts"], 1)
+        self.assertEqual(logged["outcome"], "success")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 from src.services.search_service import SearchService
 from src.agents.srhSumAgent import SrhSumAgent
+from src.services.merged_results import MergedResults
 
 
 def test_merging_logic():
@@ -44,7 +45,7 @@ def test_merging_logic():
 
     # 2. 模擬 SrhSumAgent 的跨回合合併
     agent = SrhSumAgent()
-    collected_results = {}
+    collected_results = MergedResults()
     all_seen_ids = set()
 
     print("[測試 2] SrhSumAgent 跨回合合併 (Round 1)")
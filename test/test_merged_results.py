@@ -0,0 +1,47 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.merged_results import CHUNK_SEPARATOR, MergedDocument, MergedResults
+
+
+def _doc(chunk_id, content, token=5):
+    return {"id": chunk_id, "link": "https://example.com/a", "content": content, "token": token}
+
+
+class TestMergedResults(unittest.TestCase):
+    def test_dedup_by_id_and_text(self):
+        merged = MergedDocument(_doc("a1", "區塊1"))
+        merged.merge(_doc("a2", "區塊2"))
+        merged.merge(_doc("a2", "區塊2"))  # 重複 id
+        merged.merge(_doc("a3", "區塊1"))  # 新 id、重複內容
+
+        self.assertEqual(merged["content"], "區塊1")  # 尚未組合
+        merged.materialize()
+        self.assertEqual(merged["all_ids"], ["a1", "a2", "a3"])
+        self.assertEqual(merged["content"], CHUNK_SEPARATOR.join(["區塊1", "區塊2"]))
+        self.assertEqual(merged["token"], 10)
+
+    def test_cross_round_merge_keeps_original_untouched(self):
+        first = MergedDocument(_doc("a1", "區塊1"))
+        first.merge(_doc("a2", "區塊2"))
+        collected = MergedResults()
+        collected.add("https://example.com/a", first.materialize())
+
+        later = MergedDocument(_doc("a2", "區塊2"))
+        later.merge(_doc("a3", "區塊3"))
+        _, is_new = collected.add("https://example.com/a", later.materialize())
+
+        self.assertFalse(is_new)
+        doc = collected["https://example.com/a"]
+        self.assertEqual(doc["all_ids"], ["a1", "a2", "a3"])
+        self.assertEqual(doc["content"].split(CHUNK_SEPARATOR), ["區塊1", "區塊2", "區塊3"])
+        self.assertEqual(first["all_ids"], ["a1", "a2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
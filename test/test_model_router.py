@@ -0,0 +1,75 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+import httpx
+from openai import APITimeoutError
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.client import LLMClient
+from src.llm.router import ModelRouter
+from src.schema.schemas import RetrySearchDecision
+
+ROUTES = {
+    "StructuredSummary": {"deployment": "big", "budget": 1.0, "fallback": "fast"},
+    "SearchIntent": {"deployment": "fast", "budget": 1.0, "fallback": None},
+}
+
+
+class TestModelRouter(unittest.TestCase):
+    def test_plan_with_and_without_fallback(self):
+        router = ModelRouter(ROUTES)
+        self.assertEqual(
+            router.plan("StructuredSummary", "default"), [("big", 1.0), ("fast", None)]
+        )
+        self.assertEqual(router.plan("SearchIntent", "default"), [("fast", None)])
+        self.assertEqual(router.plan("Unknown", "default"), [("default", None)])
+
+    def test_slow_preferred_is_demoted_with_probes(self):
+        """偏好模型 p90 超過預算後直接走 fallback，並定期試探"""
+        router = ModelRouter(ROUTES, min_samples=3, probe_every=4)
+        for _ in range(3):
+            router.record("StructuredSummary", "big", 1.5, "budget_exceeded")
+
+        plans = [router.plan("StructuredSummary", "default") for _ in range(4)]
+        self.assertEqual(plans[0], [("fast", None)])
+        self.assertEqual(plans[3], [("big", 1.0), ("fast", None)])
+        stats = router.get_stats()["StructuredSummary"]["deployments"]
+        self.assertEqual(stats["big"]["budget_exceeded"], 3)
+        self.assertEqual(stats["fast"]["routed_direct"], 3)
+
+
+class TestRoutedCalls(unittest.TestCase):
+    def test_budget_timeout_falls_back(self):
+        router = ModelRouter(
+            {"RetrySearchDecision": {"deployment": "big", "budget": 0.5, "fallback": "fast"}}
+        )
+        timeout_error = APITimeoutError(request=httpx.Request("POST", "https://example.com"))
+        calls = []
+
+        def fake_call_text(self, messages, temperature, response_format, model, timeout=None):
+            calls.append((model, timeout))
+            if model == "big":
+                return None, timeout_error
+            return '{"relevant": true, "search_direction": "", "decision": "ok"}', None
+        with patch("src.llm.client.get_model_router", return_value=router), patch.object(
+            LLMClient, "_call_text", fake_call_text
+        ), patch("src.llm.client.get_response_cache", return_value=None):
+            client = LLMClient(api_key="k")
+            result = client.call_with_schema(
+                [{"role": "user", "content": "q"}], RetrySearchDecision
+            )
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(calls, [("big", 0.5), ("fast", None)])
+        stats = router.get_stats()["RetrySearchDecision"]["deployments"]
+        self.assertEqual(stats["big"]["budget_exceeded"], 1)
+        self.assertEqual(stats["fast"]["calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import sys
+import json
+import unittest
+from pathlib import Path
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.db_adapter_meili import serialize_documents_ndjson
+
+
+class TestNdjsonSerialization(unittest.TestCase):
+    def test_round_trip_float32(self):
+        """由 float32 buffer 格式化的向量可無損還原，metadata 保留非 ASCII 字元"""
+        vectors = np.random.default_rng(0).normal(size=(2, 8)).astype(np.float32)
+        docs = [
+            {"id": f"id{i}", "title": "公告", "_vectors": {"default": vectors[i]}}
+            for i in range(2)
+        ]
+        payload = serialize_documents_ndjson(docs)
+
+        lines = payload.decode("utf-8").strip().split("\n")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("公告", lines[0])
+        parsed = [json.loads(line) for line in lines]
+        self.assertEqual(parsed[1]["id"], "id1")
+        restored = np.asarray([p["_vectors"]["default"] for p in parsed], dtype=np.float32)
+        np.testing.assert_array_equal(restored, vectors)
+
+    def test_list_vectors_and_missing_vectors(self):
+        """list 向量 (重試路徑) 與無向量文件也能序列化"""
+        docs = [
+            {"id": "a", "_vectors": {"default": [0.5, 0.25]}},
+            {"id": "b"},
+        ]
+        parsed = [json.loads(l) for l in serialize_documents_ndjson(docs).splitlines()]
+        self.assertEqual(parsed[0]["_vectors"]["default"], [0.5, 0.25])
+        self.assertEqual(parsed[1], {"id": "b"})
+
+    def test_rejects_non_finite(self):
+        docs = [{"id": "a", "_vectors": {"default": np.array([np.nan], dtype=np.float32)}}]
+        with self.assertRaises(ValueError):
+            serialize_documents_ndjson(docs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.search_service import SearchService
+from src.services.rag_service import RAGService
+from src.llm.prompts.rag_answer import RAG_CHAT_PROMPT
+
+
+def _captured_messages(llm_client):
+    return llm_client.call_with_schema.call_args.kwargs["messages"]
+
+
+class TestPromptPrefix(unittest.TestCase):
+    def test_intent_system_prompt_is_static(self):
+        """不同查詢 / 歷史 / 方向的 intent 請求共用相同的 system prompt，變動資料只出現在 user message"""
+        service = SearchService()
+        service.llm_client = MagicMock()
+
+        service.parse_intent("Copilot 價格")
+        first = _captured_messages(service.llm_client)
+        service.parse_intent("Azure 更新", history=["a", "b"], direction="找價格", website=["M365 Roadmap"])
+        second = _captured_messages(service.llm_client)
+
+        self.assertEqual(first[0], second[0])
+        self.assertNotIn("{", first[0]["content"].split("# Output Format")[0])
+        self.assertIn("找價格", second[1]["content"])
+        self.assertIn("M365 Roadmap", second[1]["content"])
+        self.assertTrue(second[1]["content"].rstrip().endswith("Azure 更新"))
+
+    @patch("src.services.rag_service.LLMClient")
+    @patch("src.tool.context_packer.count_tokens", side_effect=len)
+    @patch("src.services.rag_service.count_tokens_batch", side_effect=lambda texts: [len(t) for t in texts])
+    def test_chat_context_follows_static_instructions(self, _count_tokens, _pack_count, _llm_client):
+        # 不建立真正的 Azure OpenAI client，測試不需要 API key
+        service = RAGService()
+        service.llm_client.call_with_schema.return_value = {"status": "failed"}
+        docs = [{"title": "T", "content": "內容", "_rerank_score": 0.9}]
+
+        service.chat("問題", provided_context=docs, history=[{"role": "user", "content": "先前"}])
+        messages = _captured_messages(service.llm_client)
+
+        self.assertEqual(messages[0], {"role": "system", "content": RAG_CHAT_PROMPT})
+        self.assertEqual(messages[1]["role"], "system")
+        self.assertIn("<title>T</title>", messages[1]["content"])
+        self.assertEqual([m["content"] for m in messages[2:]], ["先前", "問題"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.rank_fusion import AdaptiveFetchTuner, fuse_result_sets
+from src.services.search_service import SearchService
+
+
+def _hit(doc_id, score):
+    return {"id": doc_id, "title": doc_id, "content": "", "_rankingScore": score}
+
+
+class TestRankFusion(unittest.TestCase):
+    def test_single_result_set_keeps_scores(self):
+        fused = fuse_result_sets([[_hit("a", 0.9), _hit("b", 0.7)]])
+
+        self.assertEqual([d["id"] for d in fused], ["a", "b"])
+        self.assertAlmostEqual(fused[0]["_rankingScore"], 0.9)
+        self.assertAlmostEqual(fused[1]["_rankingScore"], 0.7)
+        self.assertEqual(fused[1]["_best_rank"], 2)
+
+    def test_doc_found_by_several_subqueries_moves_up(self):
+        sets = [
+            [_hit("a", 0.80), _hit("b", 0.78)],
+            [_hit("b", 0.75), _hit("c", 0.70)],
+            [_hit("b", 0.60), _hit("d", 0.50)],
+        ]
+
+        fused = fuse_result_sets(sets, k=60, boost=0.3)
+
+        self.assertEqual(fused[0]["id"], "b")
+        self.assertEqual(fused[0]["_fusion_hits"], 3)
+        self.assertEqual(fused[0]["_meili_score"], 0.78)
+        self.assertGreater(fused[0]["_rankingScore"], 0.80)
+        # 只出現一次的文件分數不變
+        a = next(d for d in fused if d["id"] == "a")
+        self.assertAlmostEqual(a["_rankingScore"], 0.80)
+        self.assertEqual(len(fused), 4)
+
+    def test_keeps_highest_scoring_hit(self):
+        fused = fuse_result_sets([[_hit("a", 0.4)], [{**_hit("a", 0.9), "content": "best"}]])
+
+        self.assertEqual(len(fused), 1)
+        self.assertEqual(fused[0]["content"], "best")
+        self.assertEqual(fused[0]["_best_rank"], 1)
+
+    def test_search_service_fuses_result_sets(self):
+        raw = [{"hits": [_hit("a", 0.8)]}, {"hits": [_hit("a", 0.8), _hit("b", 0.7)]}, {"hits": []}]
+
+        fused = SearchService()._fuse_hits(raw)
+
+        self.assertEqual([d["id"] for d in fused], ["a", "b"])
+        self.assertEqual(fuse_result_sets([]), [])
+
+
+class TestAdaptiveFetchTuner(unittest.TestCase):
+    def test_shrinks_when_tail_unused_and_grows_back(self):
+        tuner = AdaptiveFetchTuner(enabled=True, min_samples=5, min_scale=0.5, step=0.25)
+        self.assertEqual(tuner.fetch_limit(80, 20), 80)
+
+        for _ in range(5):
+            tuner.record(80, 10)
+        self.assertEqual(tuner.scale, 0.75)
+        self.assertEqual(tuner.fetch_limit(80, 20), 60)
+
+        for _ in range(5):
+            tuner.record(60, 10)
+        # 不低於 min_scale，也不低於結果數的兩倍
+        self.assertEqual(tuner.scale, 0.5)
+        self.assertEqual(tuner.fetch_limit(80, 30), 60)
+
+        for _ in range(5):
+            tuner.record(40, 39)
+        self.assertEqual(tuner.scale, 0.75)
+        self.assertEqual(tuner.get_stats()["shrinks"], 2)
+        self.assertEqual(tuner.get_stats()["grows"], 1)
+
+    def test_disabled_keeps_base_limit(self):
+        tuner = AdaptiveFetchTuner(enabled=False, min_samples=1)
+        tuner.record(80, 1)
+        self.assertEqual(tuner.fetch_limit(80, 20), 80)
+        self.assertEqual(tuner.get_stats()["samples"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import sys
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agents.srhSumAgent import SrhSumAgent
+from src.agents.tool import SearchTool
+from src.llm.stream_parser import IncrementalJSONFieldParser
+from src.tool.context_packer import render_document
+from src.schema.schemas import RelevanceSummary
+from src.tool.deadline import Deadline
+
+DOCS = [{"id": "a", "link": "https://example.com/a", "title": "A", "content": "內容", "token": 10}]
+
+
+def _fake_stream(payload: dict):
+    """模擬 LLMClient.stream_with_schema：逐段 yield 解析事件，回傳驗證後的結果"""
+
+    def stream(**kwargs):
+        text = json.dumps(payload, ensure_ascii=False)
+        parser = IncrementalJSONFieldParser()
+        for i in range(0, len(text), 7):
+            yield from parser.feed(text[i : i + 7])
+        return {"status": "success", "result": RelevanceSummary.model_validate(payload)}
+
+    return stream
+
+
+def _tool(payload: dict) -> SearchTool:
+    tool = SearchTool.__new__(SearchTool)
+    tool.llm_client = MagicMock()
+    tool.llm_client.stream_with_schema.side_effect = _fake_stream(payload)
+    return tool
+
+
+def _drain(gen):
+    events = []
+    while True:
+        try:
+            events.append(next(gen))
+        except StopIteration as stop:
+            return events, stop.value
+
+
+@patch("src.tool.context_packer.count_tokens", side_effect=len)
+class TestRelevanceSummary(unittest.TestCase):
+    def test_relevant_verdict_streams_summary(self, _count_tokens):
+        tool = _tool(
+            {
+                "decision": "內容足以回答",
+                "relevant": True,
+                "search_direction": "",
+                "brief_answer": "答案【1】",
+                "detailed_answer": "細節",
+                "general_summary": "總結",
+            }
+        )
+        events, result = _drain(tool.judge_and_summarize_stream("問題", DOCS))
+
+        self.assertEqual(events[0], {"relevant": True, "decision": "內容足以回答"})
+        self.assertEqual(events[1]["value"], "答案[1]")
+        self.assertIn("link_mapping", events[1])
+        self.assertTrue(result["relevant"])
+        self.assertEqual(result["summary_response"]["summary"]["detailed_answer"], "細節")
+
+    def test_irrelevant_verdict_suppresses_summary(self, _count_tokens):
+        tool = _tool(
+            {
+                "decision": "缺少價格資訊",
+                "relevant": False,
+                "search_direction": "搜尋價格",
+                "brief_answer": "",
+                "detailed_answer": "",
+                "general_summary": "",
+            }
+        )
+        events, result = _drain(tool.judge_and_summarize_stream("問題", DOCS))
+
+        self.assertEqual(events, [{"relevant": False, "decision": "缺少價格資訊"}])
+        self.assertFalse(result["relevant"])
+        self.assertEqual(result["search_direction"], "搜尋價格")
+        self.assertIsNone(result["summary_response"])
+
+    @patch("src.agents.srhSumAgent.COMBINED_RELEVANCE_SUMMARY", True)
+    def test_agent_skips_separate_check_and_summary(self, _count_tokens):
+        agent = SrhSumAgent.__new__(SrhSumAgent)
+        agent.max_retries = 1
+        agent.tool = _tool(
+            {
+                "decision": "足以回答",
+                "relevant": True,
+                "search_direction": "",
+                "brief_answer": "答案",
+                "detailed_answer": "細節",
+                "general_summary": "總結",
+            }
+        )
+        agent.tool.search = MagicMock(
+            return_value={"status": "success", "results": [dict(d) for d in DOCS], "intent": {}}
+        )
+        agent._check_retry_search = MagicMock()
+        agent.tool.summarize_stream = MagicMock()
+
+        steps = list(agent.run("問題"))
+
+        agent._check_retry_search.assert_not_called()
+        agent.tool.summarize_stream.assert_not_called()
+        self.assertEqual(agent.tool.llm_client.stream_with_schema.call_count, 1)
+        self.assertEqual(steps[-1]["stage"], "complete")
+        self.assertEqual(steps[-1]["summary"]["brief_answer"], "答案")
+
+    @patch("src.agents.srhSumAgent.COMBINED_RELEVANCE_SUMMARY", True)
+    def test_partial_stream_failure_resets_before_fallback_summary(self, _count_tokens):
+        """合併串流在送出部分總結後失敗時，先送 summary_reset 再串流另外產生的總結"""
+
+        def failing_stream(**kwargs):
+            parser = IncrementalJSONFieldParser()
+            yield from parser.feed('{"decision": "足以回答", "relevant": true, "brief_answer": "半')
+            yield from parser.feed('段答案", "detailed_answer": "不完整')
+            return {"status": "failed", "error": "stream broken", "stage": "llm_stream"}
+
+        agent = SrhSumAgent.__new__(SrhSumAgent)
+        agent.max_retries = 1
+        agent.tool = _tool({})
+        agent.tool.llm_client.stream_with_schema.side_effect = failing_stream
+        agent.tool.search = MagicMock(
+            return_value={"status": "success", "results": [dict(d) for d in DOCS], "intent": {}}
+        )
+
+        def fallback_summary(query, results, timeout=None):
+            yield {"field": "brief_answer", "value": "新答案"}
+            return {"status": "success", "summary": {"brief_answer": "新答案"}, "link_mapping": {}}
+
+        agent.tool.summarize_stream = MagicMock(side_effect=fallback_summary)
+
+        stages = [step["stage"] for step in agent.run("問題")]
+
+        first_delta = stages.index("summary_delta")
+        reset = stages.index("summary_reset")
+        self.assertLess(first_delta, reset)
+        # 重新產生的總結只在 reset 之後送出
+        self.assertIn("summary_delta", stages[reset + 1 :])
+        self.assertEqual(stages[-1], "complete")
+        agent.tool.summarize_stream.assert_called_once()
+
+    def test_no_reset_when_nothing_was_streamed(self, _count_tokens):
+        agent = SrhSumAgent.__new__(SrhSumAgent)
+        agent.tool = _tool({})
+
+        def failed(**kwargs):
+            return {"status": "failed", "error": "down"}
+            yield
+
+        agent.tool.llm_client.stream_with_schema.side_effect = failed
+        events, result = _drain(agent._judge_and_summarize("問題", DOCS, Deadline()))
+
+        self.assertEqual(events, [])
+        self.assertIsNone(result["summary_response"])
+
+    def test_tiny_budget_truncates_first_doc(self, _count_tokens):
+        """預算小於最小截斷長度時，第一篇截斷到預算內，token 統計與實際送出的內容一致"""
+        tool = _tool({})
+        docs = [
+            {"title": "A", "content": "第一句。" * 50, "_rerank_score": 0.9},
+            {"title": "B", "content": "另一篇。" * 50, "_rerank_score": 0.8},
+        ]
+        total = sum(len(render_document(i, d)) for i, d in enumerate(docs, 1))
+        budget = len(render_document(1, {"title": "A", "content": ""})) + 20
+
+        with patch("src.config.SUMMARIZE_TOKEN_LIMIT", budget):
+            messages, _, packing = tool._build_summary_request("q", docs)
+
+        self.assertEqual(packing["summarized_count"], 1)
+        self.assertGreater(packing["total_tokens"], 0)
+        self.assertLessEqual(packing["total_tokens"], budget)
+        self.assertEqual(packing["total_tokens"] + packing["discarded_tokens"], total)
+        self.assertNotIn("第一句。" * 50, messages[1]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
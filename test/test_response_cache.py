@@ -0,0 +1,88 @@
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.client import LLMClient
+from src.llm.response_cache import ResponseCache, make_cache_key
+from src.schema.schemas import RetrySearchDecision
+
+DECISION = RetrySearchDecision(relevant=True, search_direction="", decision="ok")
+MESSAGES = [{"role": "user", "content": "Azure OpenAI 價格"}]
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_depends_on_all_inputs(self):
+        base = make_cache_key("m", MESSAGES, None, 0.0)
+        self.assertEqual(base, make_cache_key("m", list(MESSAGES), None, 0.0))
+        self.assertNotEqual(base, make_cache_key("m2", MESSAGES, None, 0.0))
+        self.assertNotEqual(base, make_cache_key("m", MESSAGES, {"type": "json"}, 0.0))
+
+    def test_lru_eviction_and_copy(self):
+        """超過容量時淘汰最久未使用者；取出的是複本"""
+        cache = ResponseCache(max_entries=2, ttl=60, disk_dir=None)
+        for key in ("a", "b"):
+            cache.set(key, DECISION)
+        cache.get("a", RetrySearchDecision)
+        cache.set("c", DECISION)
+        self.assertIsNone(cache.get("b", RetrySearchDecision))
+
+        hit = cache.get("a", RetrySearchDecision)
+        hit.decision = "mutated"
+        self.assertEqual(cache.get("a", RetrySearchDecision).decision, "ok")
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_ttl_and_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(max_entries=8, ttl=60, disk_dir=tmp)
+            cache.set("k" * 64, DECISION)
+
+            fresh = ResponseCache(max_entries=8, ttl=60, disk_dir=tmp)
+            self.assertEqual(fresh.get("k" * 64, RetrySearchDecision), DECISION)
+            self.assertEqual(fresh.get_stats()["disk_hits"], 1)
+
+            expired = ResponseCache(max_entries=8, ttl=-1, disk_dir=tmp)
+            expired.set("e" * 64, DECISION)
+            self.assertIsNone(expired.get("e" * 64, RetrySearchDecision))
+
+
+class TestLLMClientCaching(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(max_entries=8, ttl=60, disk_dir=None)
+        self.patches = [
+            patch("src.llm.client.get_response_cache", return_value=self.cache),
+            patch.object(
+                LLMClient,
+                "_call_text",
+                return_value=('{"relevant": true, "search_direction": "", "decision": "ok"}', None),
+            ),
+        ]
+        self.call_text = [p.start() for p in self.patches][1]
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_temperature_zero_hit_skips_network(self):
+        client = LLMClient(api_key="k")
+        first = client.call_with_schema(MESSAGES, RetrySearchDecision, temperature=0.0)
+        second = client.call_with_schema(MESSAGES, RetrySearchDecision, temperature=0.0)
+        self.assertEqual(self.call_text.call_count, 1)
+        self.assertTrue(second.get("cached"))
+        self.assertEqual(first["result"], second["result"])
+
+    def test_nonzero_temperature_not_cached(self):
+        client = LLMClient(api_key="k")
+        client.call_with_schema(MESSAGES, RetrySearchDecision, temperature=0.1)
+        client.call_with_schema(MESSAGES, RetrySearchDecision, temperature=0.1)
+        self.assertEqual(self.call_text.call_count, 2)
+        self.assertEqual(self.cache.get_stats()["stores"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
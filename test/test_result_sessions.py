@@ -0,0 +1,77 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.result_sessions import ResultSessionStore
+
+RESULTS = [
+    {"id": "a", "title": "A", "link": "https://example.com/a", "content": "內容 A"},
+    {"id": "b", "title": "B", "link": "https://example.com/b", "content": "內容 B"},
+]
+
+
+class TestResultSessionStore(unittest.TestCase):
+    def test_select_keeps_requested_order_and_rank(self):
+        store = ResultSessionStore()
+        result_set_id = store.register(RESULTS)
+
+        selected = store.select(result_set_id, ["b", "missing", "a"])
+
+        self.assertEqual([(rank, doc["id"]) for rank, doc in selected], [(2, "b"), (1, "a")])
+
+    def test_lru_and_ttl(self):
+        store = ResultSessionStore(max_entries=1)
+        first = store.register(RESULTS)
+        second = store.register(RESULTS)
+        self.assertIsNone(store.get(first))
+        self.assertIsNotNone(store.get(second))
+
+        store = ResultSessionStore(ttl=-1)
+        self.assertIsNone(store.get(store.register(RESULTS)))
+        self.assertEqual(store.get_stats()["expired"], 1)
+
+
+class TestChatEndpoint(unittest.TestCase):
+    def setUp(self):
+        from src import app as app_module
+
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+        self.store = ResultSessionStore()
+        patcher = patch.object(app_module, "get_result_session_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_chat_resolves_result_set(self):
+        result_set_id = self.store.register(RESULTS)
+        with patch.object(self.app_module, "RAGService") as rag, patch.object(
+            self.app_module.LogManager, "log_chat"
+        ) as log_chat:
+            rag.return_value.chat.return_value = {"answer": "答", "references": RESULTS}
+            response = self.client.post(
+                "/api/chat",
+                json={"message": "問題", "result_set_id": result_set_id, "doc_ids": ["b"]},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        context = rag.return_value.chat.call_args.kwargs["provided_context"]
+        self.assertEqual(context[0]["title"], "[No.2] B")
+        self.assertEqual(context[0]["content"], "內容 B")
+        logged = log_chat.call_args.kwargs["response_data"]["references"]
+        self.assertEqual(logged[0], {"title": "A", "link": "https://example.com/a"})
+
+    def test_unknown_result_set_returns_410(self):
+        response = self.client.post(
+            "/api/chat", json={"message": "問題", "result_set_id": "gone", "doc_ids": ["a"]}
+        )
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.get_json()["error_stage"], "result_set_expired")
+
+
+if __name__ == "__main__":
+    unittest.main()
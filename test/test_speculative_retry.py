@@ -0,0 +1,69 @@
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agents.srhSumAgent import SrhSumAgent
+
+
+def _agent(relevant: bool):
+    retry_started = threading.Event()
+    agent = SrhSumAgent.__new__(SrhSumAgent)
+    agent.max_retries = 1
+    agent.tool = MagicMock()
+
+    def search(**kwargs):
+        if kwargs.get("is_retry_search"):
+            retry_started.set()
+            doc = {"id": "b", "link": "https://example.com/b", "content": "重搜"}
+        else:
+            doc = {"id": "a", "link": "https://example.com/a", "content": "初搜"}
+        return {"status": "success", "results": [doc], "intent": {"keyword_query": "kw"}}
+
+    def check(query, results, deadline=None):
+        # 重搜索必須在判斷尚未結束時就已經開始
+        assert retry_started.wait(2), "speculative retry was not started concurrently"
+        return {"relevant": relevant, "search_direction": "方向", "decision": "判斷"}
+
+    agent.tool.search.side_effect = search
+    agent._check_retry_search = MagicMock(side_effect=check)
+    agent.tool.summarize.return_value = {
+        "status": "success",
+        "summary": {"brief_answer": "答案", "detailed_answer": "", "general_summary": ""},
+        "link_mapping": {},
+    }
+    return agent
+
+
+@patch("src.agents.srhSumAgent.SPECULATIVE_RETRY_SEARCH", True)
+@patch("src.agents.srhSumAgent.COMBINED_RELEVANCE_SUMMARY", False)
+@patch("src.agents.srhSumAgent.STREAM_SUMMARY", False)
+class TestSpeculativeRetry(unittest.TestCase):
+    def test_irrelevant_check_uses_speculative_results(self):
+        agent = _agent(False)
+
+        steps = list(agent.run("問題", limit=10))
+
+        retry_calls = [c for c in agent.tool.search.call_args_list if c.kwargs["is_retry_search"]]
+        self.assertEqual(len(retry_calls), 1)
+        self.assertEqual(retry_calls[0].kwargs["exclude_ids"], ["a"])
+        self.assertEqual(retry_calls[0].kwargs["limit"], 15)
+        self.assertEqual(steps[-1]["stage"], "complete")
+        self.assertEqual(len(steps[-1]["results"]), 2)
+
+    def test_relevant_check_discards_speculative_results(self):
+        agent = _agent(True)
+
+        steps = list(agent.run("問題", limit=10))
+
+        self.assertEqual(steps[-1]["stage"], "complete")
+        self.assertEqual([r["id"] for r in steps[-1]["results"]], ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
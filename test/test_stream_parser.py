@@ -0,0 +1,59 @@
+import sys
+import json
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.llm.stream_parser import IncrementalJSONFieldParser
+
+
+def _feed_in_chunks(text, size):
+    parser = IncrementalJSONFieldParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i : i + size]))
+    return parser, events
+
+
+class TestIncrementalJSONFieldParser(unittest.TestCase):
+    SAMPLE = {
+        "brief_answer": "可以使用 [1]",
+        "detailed_answer": "第一行\n第二行 \"引號\" \\ 😀 tab\t",
+        "general_summary": "總結",
+    }
+
+    def test_any_chunking_yields_same_fields(self):
+        """不論 chunk 怎麼切 (含跳脫序列與 surrogate pair)，解析結果都與 json.loads 一致"""
+        for ensure_ascii in (True, False):
+            text = json.dumps(self.SAMPLE, ensure_ascii=ensure_ascii)
+            for size in (1, 2, 3, 7, len(text)):
+                parser, events = _feed_in_chunks(text, size)
+                self.assertEqual(parser.fields, self.SAMPLE)
+                self.assertTrue(parser.finished)
+                streamed = "".join(
+                    t for kind, f, t in events if kind == "delta" and f == "detailed_answer"
+                )
+                self.assertEqual(streamed, self.SAMPLE["detailed_answer"])
+
+    def test_field_done_order(self):
+        """brief_answer 的 done 事件在 detailed_answer 任何 delta 之前送出"""
+        _, events = _feed_in_chunks(json.dumps(self.SAMPLE, ensure_ascii=False), 4)
+        done_brief = events.index(("done", "brief_answer", self.SAMPLE["brief_answer"]))
+        first_detail = next(
+            i for i, e in enumerate(events) if e[0] == "delta" and e[1] == "detailed_answer"
+        )
+        self.assertLess(done_brief, first_detail)
+
+    def test_non_string_values_are_skipped(self):
+        text = '{"relevant": true, "scores": [1, {"a": "}"}], "decision": "ok"}'
+        parser, _ = _feed_in_chunks(text, 3)
+        self.assertEqual(parser.fields, {"decision": "ok"})
+        self.assertEqual(parser.values, {"relevant": True})
+        self.assertTrue(parser.finished)
+
+
+if __name__ == "__main__":
+    unittest.main()
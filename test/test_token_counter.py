@@ -0,0 +1,119 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.rag_service import RAGService
+from src.tool import token_counter
+from src.tool.context_packer import render_document
+from src.tool.token_counter import TokenCounter, estimate_tokens
+
+
+class FakeEncoding:
+    """每個字元一個 token，記錄 encode 呼叫次數"""
+
+    def __init__(self):
+        self.single_calls = 0
+        self.batch_calls = 0
+
+    def encode_ordinary(self, text):
+        self.single_calls += 1
+        return list(text)
+
+    def encode_ordinary_batch(self, texts):
+        self.batch_calls += 1
+        return [list(t) for t in texts]
+
+
+class TestTokenCounter(unittest.TestCase):
+    def setUp(self):
+        self.encoding = FakeEncoding()
+        patcher = patch.dict(token_counter._encodings, {"fake": self.encoding})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.counter = TokenCounter("fake", memo_size=2, memo_min_chars=5)
+
+    def test_long_texts_are_memoized_by_content(self):
+        self.assertEqual(self.counter.count("abcdefgh"), 8)
+        self.assertEqual(self.counter.count("abcdefgh"), 8)
+        self.assertEqual(self.counter.count("abc"), 3)
+        self.assertEqual(self.counter.count("abc"), 3)
+
+        # 短文字不進記憶
+        self.assertEqual(self.encoding.single_calls, 3)
+        stats = self.counter.get_stats()
+        self.assertEqual(stats["memo_hits"], 1)
+        self.assertEqual(stats["memo_size"], 1)
+
+    def test_batch_encodes_only_missing_texts(self):
+        self.counter.count("memoized")
+
+        counts = self.counter.count_batch(["memoized", "", "xy", "another one"])
+
+        self.assertEqual(counts, [8, 0, 2, 11])
+        self.assertEqual(self.encoding.batch_calls, 1)
+        self.assertEqual(self.counter.get_stats()["encoded_texts"], 3)
+
+    def test_memo_evicts_least_recently_used(self):
+        for text in ["aaaaaa", "bbbbbb", "aaaaaa", "cccccc"]:
+            self.counter.count(text)
+        self.counter.count("bbbbbb")
+
+        self.assertEqual(self.encoding.single_calls, 4)
+
+    def test_exceeds_skips_encoding_far_below_limit(self):
+        self.assertFalse(self.counter.exceeds("short text", 100))
+        self.assertEqual(self.encoding.single_calls, 0)
+
+        self.assertTrue(self.counter.exceeds("甲" * 120, 100))
+        self.assertEqual(self.encoding.single_calls, 1)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("ab 中文"), 3)
+
+
+class TestChatTokenUsage(unittest.TestCase):
+    def setUp(self):
+        # 不建立真正的 Azure OpenAI client，測試不需要 API key
+        patcher = patch("src.services.rag_service.LLMClient")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("src.tool.context_packer.count_tokens", side_effect=len)
+    @patch("src.services.rag_service.count_tokens_batch", side_effect=lambda texts: [len(t) for t in texts])
+    def test_exact_count_reuses_packed_tokens(self, _count_batch, _pack_count):
+        service = RAGService()
+        service.llm_client.call_with_schema.return_value = {"status": "failed"}
+        docs = [{"title": "T", "content": "內容" * 50, "_rerank_score": 0.9}]
+
+        with patch("src.services.rag_service.LLM_TOKEN_LIMIT", 100000), patch(
+            "src.services.rag_service.TOKEN_ESTIMATE_SAFE_RATIO", 0.0
+        ):
+            result = service.chat("問題", provided_context=docs)
+
+        usage = result["token_usage"]
+        self.assertFalse(usage["estimated"])
+        self.assertEqual(_count_batch.call_count, 1)
+        # context 的 token 數直接使用 pack_context 的結果，不再對組合後的字串重新計算
+        self.assertEqual(usage["context"], len(render_document(1, docs[0])))
+        self.assertEqual(len(result["references"]), 1)
+
+    @patch("src.services.rag_service.count_tokens_batch")
+    def test_far_below_limit_is_estimated(self, count_batch):
+        service = RAGService()
+        service.llm_client.call_with_schema.return_value = {"status": "failed"}
+
+        result = service.chat("問題", provided_context=[{"title": "T", "content": "內容", "_rerank_score": 0.9}])
+
+        self.assertTrue(result["token_usage"]["estimated"])
+        count_batch.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
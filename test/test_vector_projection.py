@@ -0,0 +1,114 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.db_adapter_meili import MeiliAdapter
+from src.database.vector_projection import (
+    PCAProjection,
+    embedding_version,
+    recall_at_k,
+    project_vector,
+)
+
+
+def _low_rank_corpus(n=400, dims=64, rank=8, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(rank, dims))
+    return (rng.normal(size=(n, rank)) @ basis + 0.01 * rng.normal(size=(n, dims))).astype(
+        np.float32
+    )
+
+
+class TestPCAProjection(unittest.TestCase):
+    def test_fit_and_transform_shape(self):
+        """投影後維度正確且輸出已正規化"""
+        corpus = _low_rank_corpus()
+        projection = PCAProjection.fit(corpus, 16)
+
+        projected = projection.transform(corpus)
+        self.assertEqual(projected.shape, (400, 16))
+        self.assertEqual(projected.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(projected, axis=1), 1.0, atol=1e-5)
+        self.assertEqual(len(projection.transform(corpus[0])), 16)
+
+    def test_recall_on_low_rank_corpus(self):
+        """資料本身是低秩時，投影幾乎不損失 top-k"""
+        corpus = _low_rank_corpus()
+        projection = PCAProjection.fit(corpus, 16)
+        self.assertGreater(recall_at_k(corpus, corpus[:50], projection, k=10), 0.95)
+        self.assertGreater(float(projection.explained_variance_ratio.sum()), 0.99)
+
+    def test_save_load_keeps_version(self):
+        """存檔後重新載入，version 與投影結果一致"""
+        corpus = _low_rank_corpus()
+        projection = PCAProjection.fit(corpus, 16)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "idx_pca16.npz")
+            projection.save(path)
+            loaded = PCAProjection.load(path)
+        self.assertEqual(loaded.version, projection.version)
+        np.testing.assert_allclose(
+            loaded.transform(corpus[:5]), projection.transform(corpus[:5]), atol=1e-6
+        )
+
+    def test_dimension_mismatch(self):
+        projection = PCAProjection.fit(_low_rank_corpus(), 16)
+        with self.assertRaises(ValueError):
+            projection.transform(np.zeros(10))
+
+    def test_project_vector_disabled_by_default(self):
+        """未設定 EMBEDDING_PROJECTION_DIMS 時向量原樣回傳"""
+        vector = [0.1, 0.2, 0.3]
+        self.assertEqual(project_vector(vector), vector)
+
+
+class FakeIndex:
+    def __init__(self, hits):
+        self.hits = hits
+        self.searches = 0
+
+    def search(self, query, params):
+        self.searches += 1
+        return {"hits": self.hits}
+
+
+def _adapter(hits):
+    adapter = MeiliAdapter.__new__(MeiliAdapter)
+    adapter.collection_name = "idx"
+    adapter.index = FakeIndex(hits)
+    adapter._embedding_version_checked = False
+    adapter._embedding_version_error = None
+    return adapter
+
+
+class TestEmbeddingVersion(unittest.TestCase):
+    def test_version_without_projection(self):
+        self.assertEqual(embedding_version(), "full1024")
+
+    def test_matching_index_passes_and_is_checked_once(self):
+        adapter = _adapter([{"embedding_version": "full1024"}])
+        self.assertIsNone(adapter.check_embedding_version())
+        self.assertIsNone(adapter.check_embedding_version())
+        self.assertEqual(adapter.index.searches, 1)
+
+    def test_index_written_with_other_projection_fails(self):
+        """索引以不同投影寫入時，查詢端回報錯誤而不是送出不同空間的向量"""
+        adapter = _adapter([{"embedding_version": "pca384-0123456789ab"}])
+        error = adapter.check_embedding_version()
+        self.assertIn("pca384-0123456789ab", error)
+        self.assertIn("full1024", error)
+
+    def test_unversioned_index_is_allowed(self):
+        self.assertIsNone(_adapter([{}]).check_embedding_version())
+        self.assertIsNone(_adapter([]).check_embedding_version())
+
+
+if __name__ == "__main__":
+    unittest.main()
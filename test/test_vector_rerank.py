@@ -0,0 +1,57 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.schema.schemas import SearchIntent
+from src.services.search_service import SearchService
+from src.services.vector_rerank import vector_rerank
+
+
+def _hit(doc_id, score, vector):
+    hit = {"id": doc_id, "link": f"https://example.com/{doc_id}", "title": doc_id, "content": "", "_rankingScore": score}
+    if vector is not None:
+        hit["_vectors"] = {"default": {"embeddings": [vector], "regenerate": False}}
+    return hit
+
+
+class TestVectorRerank(unittest.TestCase):
+    def test_blends_cosine_and_strips_vectors(self):
+        hits = [
+            {**_hit("a", 0.8, [0.0, 1.0]), "_rerank_score": 0.8},
+            {**_hit("b", 0.6, [1.0, 0.0]), "_rerank_score": 0.6},
+            {**_hit("c", 0.7, None), "_rerank_score": 0.7},
+        ]
+
+        count = vector_rerank(hits, [2.0, 0.0], weight=0.5)
+
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(hits[0]["_rerank_score"], 0.4)
+        self.assertAlmostEqual(hits[1]["_rerank_score"], 0.8)
+        self.assertEqual(hits[1]["_vector_score"], 1.0)
+        self.assertEqual(hits[2]["_rerank_score"], 0.7)
+        self.assertTrue(all("_vectors" not in h for h in hits))
+
+    @patch("src.services.search_service.VECTOR_RERANK_WEIGHT", 0.5)
+    @patch("src.services.search_service.VECTOR_RERANK", True)
+    def test_search_service_reorders_by_vector(self):
+        service = SearchService()
+        intent = SearchIntent(keyword_query="q", semantic_query="q")
+        hits = [_hit("a", 0.8, [0.0, 1.0]), _hit("b", 0.7, [1.0, 0.0])]
+        traces = []
+
+        results = service._rerank_and_merge_results(
+            hits, intent, limit=2, enable_llm=True, query_vector=[1.0, 0.0], traces=traces
+        )
+
+        self.assertEqual([r["id"] for r in results], ["b", "a"])
+        self.assertIn("Vector rerank applied to 2 candidates.", traces)
+        self.assertTrue(all("_vectors" not in r for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()